@@ -2,13 +2,28 @@ from flask import Flask, render_template, Response, jsonify, request
 import cv2
 import threading
 import logging
+import math
 import os
-
-# Comment out face recognition import
-# from face_utils import load_known_faces, identify_faces
+import functools
 import motor_control
-from sensors import read_ultrasonic_distance, read_temperature, read_ir_sensor
+from motor_executor import MotorExecutor
+from sensors import read_ultrasonic_distance, read_ir_sensor, TemperaturePoller
 from smart_patrol import SmartPatrol
+from patrol_trace import TraceRecorder
+from pose import PoseTracker
+from sensor_hub import SensorHub
+from config import Config
+from camera_stream import FrameBroadcaster, JpegCache, StreamController, stream_mjpeg
+from motion import MotionDetector
+from event_stream import StatusPublisher, sse_events
+from clip_recorder import ClipRecorder
+
+# Face recognition needs face_recognition (dlib), so it is only imported when enabled
+if Config.FACE_RECOGNITION:
+    from face_utils import encode_images, identify_faces
+    from face_store import GalleryWatcher, UNKNOWN
+    from face_tracker import track_faces
+    from recognition_worker import RecognitionWorker, draw_faces
 
 app = Flask(__name__)
 
@@ -24,6 +39,7 @@ try:
     camera.framerate = 30
     camera.rotation = 180  # Rotate camera 180 degrees
     raw_capture = PiRGBArray(camera, size=(640, 480))
+    picamera_stream = camera.capture_continuous(raw_capture, format="bgr", use_video_port=True)
     use_picamera = True
     logging.info("Successfully initialized Raspberry Pi camera")
 except (ImportError, Exception) as e:
@@ -32,65 +48,159 @@ except (ImportError, Exception) as e:
     use_picamera = False
     logging.info("Falling back to USB webcam")
 
-# Comment out face recognition loading
-# known_encodings, known_names = load_known_faces('known_faces')
+gallery = None
+recognize_faces = None
+if Config.FACE_RECOGNITION:
+    # Re-encodes only added/changed images and swaps the gallery in place, so
+    # newly enrolled people are recognised without a restart
+    gallery = GalleryWatcher('known_faces', encode_images, interval=Config.FACE_GALLERY_POLL_INTERVAL)
+    if Config.FACE_RECOGNITION_MODE == 'thread':
+        gallery.start()
+    # else the worker process gets its own copy, which rechecks known_faces
+    # from current() every interval
+    # Full recognition every few frames, tracking in between; built from
+    # partials of module-level functions so process mode can pickle it
+    recognize_faces = functools.partial(track_faces, functools.partial(
+        identify_faces, known_encodings=gallery,
+        detection_scale=Config.FACE_DETECTION_SCALE, roi=Config.FACE_DETECTION_ROI))
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def read_all_sensors():
+    """Read each sensor on its own, so one that fails doesn't blank the others"""
+    readings = {}
+    for name, read in (('distance', read_ultrasonic_distance), ('ir_triggered', read_ir_sensor)):
+        try:
+            readings[name] = read()
+        except Exception as e:
+            logger.error(f"Error reading {name}: {str(e)}")
+            readings[name] = None
+    return readings
+
+# Sample the sensors in the background; handlers and patrol read snapshots
+sensor_hub = SensorHub(read_all_sensors, {'distance': float, 'ir_triggered': bool},
+                       rate_hz=Config.SENSOR_SAMPLE_HZ, capacity=Config.SENSOR_BUFFER_SIZE)
+sensor_hub.start()
+
+# DS18B20 conversions are slow, so /sensors serves the cached value
+temperature_poller = TemperaturePoller(interval=Config.TEMPERATURE_POLL_INTERVAL)
+temperature_poller.start()
+
 # Initialize SmartPatrol
 def get_sensor_data():
+    snapshot = sensor_hub.latest()
+    distance = snapshot['distance']
     return {
-        'center': read_ultrasonic_distance() < 30,  # True if obstacle within 30cm
+        'center': distance is not None and distance < 30,  # True if obstacle within 30cm
         'left': False,  # Will be updated with side sensors
         'right': False,  # Will be updated with side sensors
-        'ir': read_ir_sensor()
+        'ir': snapshot['ir_triggered']
     }
 
-patrol_instance = SmartPatrol(motor_control, get_sensor_data)
-
-def gen_frames():
-    while running:
-        if use_picamera:
-            try:
-                # Use PiCamera
-                for frame in camera.capture_continuous(raw_capture, format="bgr", use_video_port=True):
-                    image = frame.array
-                    # Comment out face recognition processing
-                    # face_data = identify_faces(image, known_encodings, known_names)
-                    # for (top, right, bottom, left, name) in face_data:
-                    #     cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), 2)
-                    #     cv2.putText(image, name, (left, top - 10),
-                    #                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
-                    ret, buffer = cv2.imencode('.jpg', image)
-                    if not ret:
-                        continue
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                    raw_capture.truncate(0)
-            except Exception as e:
-                logging.error(f"Error in PiCamera capture: {str(e)}")
-                break
-        else:
-            # Use standard webcam
-            success, frame = camera.read()
-            if not success:
-                logging.error("Failed to capture frame from camera.")
-                break
-            # Comment out face recognition processing
-            # face_data = identify_faces(frame, known_encodings, known_names)
-            # for (top, right, bottom, left, name) in face_data:
-            #     cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            #     cv2.putText(frame, name, (left, top - 10),
-            #                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+# Dead-reckoned pose from every executed motor command
+pose_tracker = PoseTracker()
+motor_control.add_motion_listener(pose_tracker.on_motion)
+
+# Optionally record each patrol session for offline replay
+patrol_trace = None
+if Config.PATROL_TRACE_DIR:
+    patrol_trace = TraceRecorder(motor_control, get_sensor_data, directory=Config.PATROL_TRACE_DIR)
+    patrol_instance = SmartPatrol(patrol_trace.motors, patrol_trace.read_sensors, pose_tracker=pose_tracker)
+else:
+    patrol_instance = SmartPatrol(motor_control, get_sensor_data, pose_tracker=pose_tracker)
+
+def pose_state():
+    x, y, heading = pose_tracker.pose()
+    # Centimetre / degree resolution so the event stream isn't flooded
+    return {"x": round(x, 2), "y": round(y, 2), "heading": round(math.degrees(heading))}
+
+def patrol_state():
+    return {
+        "is_patrolling": patrol_instance.is_patrolling,
+        "state": patrol_instance.state.value,
+        "last_turn": patrol_instance.last_turn.value if patrol_instance.last_turn else None,
+        "consecutive_blocks": patrol_instance.consecutive_blocks
+    }
+
+# Manual moves run on the executor thread so requests return immediately
+motor_executor = MotorExecutor(motor_control)
+motor_executor.start()
+
+def sensor_state():
+    snapshot = sensor_hub.latest()
+    distance = snapshot['distance']
+    return {
+        # Rounded so sub-millimetre jitter isn't pushed as a change
+        "distance": None if distance is None else round(distance, 1),
+        "ir_triggered": snapshot['ir_triggered']
+    }
+
+# One poll loop feeds every /events dashboard from the in-memory snapshots
+status_publisher = StatusPublisher({
+    'sensors': sensor_state,
+    'temperature': lambda: temperature_poller.latest()[0],
+    'patrol': patrol_state,
+    'pose': pose_state
+})
+status_publisher.start()
+
+def read_camera_frame():
+    """Grab one BGR frame from whichever camera is in use"""
+    if use_picamera:
+        frame = next(picamera_stream)
+        image = frame.array
+        raw_capture.truncate(0)
+        return image
+    # Use standard webcam
+    success, frame = camera.read()
+    # FrameBroadcaster logs and backs off on failed reads
+    return frame if success else None
+
+# Cheap motion score on every captured frame; gates the expensive stages
+motion_detector = MotionDetector(min_score=Config.MOTION_MIN_SCORE, hold=Config.MOTION_HOLD)
+
+# One capture thread shared by every /video_feed client
+broadcaster = FrameBroadcaster(read_camera_frame, motion_detector=motion_detector)
+broadcaster.start()  # At import, like the other services, so WSGI servers get frames too
+jpeg_cache = JpegCache()
+
+recognition_worker = None
+clip_triggers = [
+    ('ir', lambda: sensor_hub.latest()['ir_triggered']),
+    ('motion', motion_detector.active)
+]
+if Config.FACE_RECOGNITION:
+    # Recognises the newest frame off the streaming path; streams overlay
+    # whatever it published last
+    recognition_worker = RecognitionWorker(broadcaster, recognize_faces, mode=Config.FACE_RECOGNITION_MODE,
+                                           gate=motion_detector.active)
+    recognition_worker.start()
+    clip_triggers.append(('unknown_face', lambda: any(
+        face[4] == UNKNOWN for face in recognition_worker.latest()[1])))
+
+# Keeps a few seconds of encoded frames in memory and writes a clip to disk
+# when the IR sensor fires, motion is seen or an unknown face shows up
+clip_recorder = ClipRecorder(broadcaster, jpeg_cache, clip_dir=Config.CLIP_DIR,
+                             pre_roll=Config.CLIP_PRE_ROLL, post_roll=Config.CLIP_POST_ROLL,
+                             fps=Config.CLIP_FPS, triggers=clip_triggers)
+clip_recorder.start()
+
+def annotated_frames():
+    for seq, image in broadcaster.frames():
+        if not running:
+            break
+        if recognition_worker is not None:
+            _, face_data = recognition_worker.latest()
+            image = draw_faces(image, face_data)
+        yield seq, image
+
+def gen_frames(controller):
+    # Overlaid frames are cached apart from the clip recorder's raw ones
+    variant = 'raw' if recognition_worker is None else 'annotated'
+    return stream_mjpeg(annotated_frames(), jpeg_cache, controller, motion=motion_detector,
+                        variant=variant)
 
 @app.route('/')
 def index():
@@ -98,40 +208,91 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Optional ?quality=&scale=&max_fps=&adaptive=1 per client
+    controller = StreamController.from_request_args(request.args)
+    return Response(gen_frames(controller), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_feed/stats')
+def video_feed_stats():
+    """JPEG encodes vs. frames served across all viewers"""
+    return jsonify(jpeg_cache.stats())
+
+@app.route('/clips')
+def list_clips():
+    """Recently saved event clips and recorder counters"""
+    return jsonify({"clips": clip_recorder.clips(), "stats": clip_recorder.stats()})
+
+@app.route('/clips/trigger', methods=['POST'])
+def trigger_clip():
+    """Record a clip now, e.g. from the web interface"""
+    clip_recorder.trigger(request.form.get('reason', 'manual'))
+    return jsonify({"status": "ok", "recording": clip_recorder.recording})
+
+@app.route('/motion')
+def motion_status():
+    """Latest motion score and whether the expensive stages are running"""
+    return jsonify(motion_detector.stats())
+
+@app.route('/recognition/stats')
+def recognition_stats():
+    """Frames recognised and dropped by the recognition worker"""
+    if recognition_worker is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(recognition_worker.stats(), enabled=True))
 
 @app.route('/sensors')
 def sensor_data():
+    snapshot = sensor_hub.latest()
+    temperature, temperature_age = temperature_poller.latest()
     data = {
-        "temperature": read_temperature(),
-        "distance": read_ultrasonic_distance(),
-        "ir_triggered": read_ir_sensor()
+        "temperature": temperature,
+        "temperature_age": temperature_age,
+        "distance": snapshot['distance'],
+        "ir_triggered": snapshot['ir_triggered']
     }
     return jsonify(data)
 
+@app.route('/events')
+def events():
+    """Server-Sent Events: sensor, temperature and patrol changes as they happen"""
+    return Response(sse_events(status_publisher), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/move', methods=['POST'])
 def move():
     direction = request.form.get('direction', 'stop')
-    speed = int(request.form.get('speed', 50))
+    speed = int(request.form.get('speed', motor_control.DEFAULT_SPEED))
     duration = float(request.form.get('duration', 1.0))
+    steer = float(request.form.get('steer', 0.0))  # -1..1, arcs forward/backward moves
 
-    if direction == 'forward':
-        motor_control.forward(speed, duration)
-    elif direction == 'backward':
-        motor_control.backward(speed, duration)
-    elif direction == 'left':
-        motor_control.turn_left(speed, duration)
-    elif direction == 'right':
-        motor_control.turn_right(speed, duration)
+    # Queue the move; a new command or stop preempts the running one
+    if direction in ('forward', 'backward', 'left', 'right'):
+        command_id = motor_executor.submit(direction, speed, duration, steer=steer)
     else:
-        motor_control.stop()
-    return jsonify({"status": "ok", "direction": direction})
+        command_id = motor_executor.stop()
+    return jsonify({"status": "ok", "direction": direction, "command_id": command_id})
+
+@app.route('/move/status')
+def move_status():
+    """Status of a queued move, or of the running one if no id is given"""
+    command_id = request.args.get('id', type=int)
+    command = motor_executor.status(command_id)
+    if command_id is not None and command is None:
+        return jsonify({"status": "error", "message": "Unknown command id"}), 404
+    return jsonify(command)
+
+@app.route('/motors/stats')
+def motor_stats():
+    """Batched GPIO write counters for motor direction changes"""
+    return jsonify(motor_control.gpio_stats())
 
 @app.route('/patrol/start', methods=['POST'])
 def start_patrol():
     """Start the smart patrol"""
     global patrol_instance
     try:
+        if patrol_trace and not patrol_instance.is_patrolling:
+            patrol_trace.start(patrol_instance)
         if patrol_instance.start_patrol():
             return jsonify({"status": "success", "message": "Smart patrol started"})
         else:
@@ -146,6 +307,8 @@ def stop_patrol():
     global patrol_instance
     try:
         patrol_instance.stop_patrol()
+        if patrol_trace:
+            patrol_trace.stop()
         return jsonify({"status": "success", "message": "Smart patrol stopped"})
     except Exception as e:
         logger.error(f"Error stopping patrol: {str(e)}")
@@ -154,25 +317,44 @@ def stop_patrol():
 @app.route('/patrol/status', methods=['GET'])
 def patrol_status():
     """Get the current patrol status"""
-    global patrol_instance
     try:
-        status = {
-            "is_patrolling": patrol_instance.is_patrolling,
-            "last_turn": patrol_instance.last_turn.value if patrol_instance.last_turn else None,
-            "consecutive_blocks": patrol_instance.consecutive_blocks
-        }
-        return jsonify(status)
+        return jsonify(patrol_state())
     except Exception as e:
         logger.error(f"Error getting patrol status: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/pose', methods=['GET'])
+def pose():
+    """Dead-reckoned x, y (m), heading (rad) and their covariance"""
+    return jsonify(pose_tracker.to_dict())
+
+@app.route('/patrol/coverage', methods=['GET'])
+def patrol_coverage():
+    """Area covered and coverage per minute; ?grid=1 adds the visit/obstacle grids"""
+    stats = patrol_instance.coverage_stats()
+    if request.args.get('grid', '0') in ('1', 'true', 'yes'):
+        stats.update(patrol_instance.coverage_map.grid())
+    return jsonify(stats)
+
 def cleanup():
     global running, patrol_instance
     running = False
+    if recognition_worker:
+        recognition_worker.stop()
+    if gallery:
+        gallery.stop()
+    clip_recorder.stop()
+    broadcaster.stop()
     if not use_picamera:
         camera.release()
     if patrol_instance:
         patrol_instance.stop_patrol()
+    if patrol_trace:
+        patrol_trace.stop()
+    status_publisher.stop()
+    sensor_hub.stop()
+    temperature_poller.stop()
+    motor_executor.shutdown()
     motor_control.cleanup()
 
 if __name__ == '__main__':
@@ -0,0 +1,295 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+import cv2
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUALITY = 95  # Same as cv2.imencode's own default
+IDLE_QUALITY = 50  # Cap used while the motion detector sees nothing happening
+
+class FrameBroadcaster:
+    """Single camera capture thread that fans the latest frame out to every viewer.
+
+    ``capture_frame`` is a callable returning one BGR frame (or ``None`` on a
+    failed read). Viewers never touch the camera; they wait on the shared
+    latest-frame slot and skip any frames they were too slow to see. An
+    optional ``motion_detector`` scores every frame on the capture thread
+    before it is published.
+
+    Failed reads are retried after ``retry_delay``, doubling up to
+    ``max_retry_delay`` while they keep failing. The first failure is
+    logged, then a summary every ``failure_log_interval`` seconds, and
+    the recovery once.
+    """
+
+    def __init__(self, capture_frame, retry_delay=0.1, motion_detector=None, max_retry_delay=5.0,
+                 failure_log_interval=60.0, clock=time.monotonic):
+        self.capture_frame = capture_frame
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.failure_log_interval = failure_log_interval
+        self.clock = clock
+        self.failed_reads = 0  # Consecutive failed reads
+        self.motion_detector = motion_detector
+        self.running = False
+        self.capture_thread = None
+        self._condition = threading.Condition()
+        self._frame = None
+        self._seq = 0  # Increases by one for every captured frame
+        self._timestamp = 0.0
+
+    def start(self):
+        """Start the capture thread if not already running"""
+        if self.running:
+            return False
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+        logger.info("Frame capture started")
+        return True
+
+    def stop(self):
+        """Stop the capture thread and release any waiting viewers"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.capture_thread:
+            self.capture_thread.join(timeout=1.0)
+        logger.info("Frame capture stopped")
+
+    def _capture_loop(self):
+        """Producer loop: read from the camera as fast as it delivers frames"""
+        last_report = None
+        while self.running:
+            error = None
+            try:
+                frame = self.capture_frame()
+            except Exception as e:
+                error = str(e)
+                frame = None
+            if frame is None:
+                self.failed_reads += 1
+                now = self.clock()
+                if self.failed_reads == 1:
+                    logger.error(f"Failed to capture frame from camera: {error or 'no frame returned'}")
+                    last_report = now
+                elif now - last_report >= self.failure_log_interval:
+                    logger.warning(f"Camera still failing: {self.failed_reads} failed reads in a row")
+                    last_report = now
+                delay = min(self.retry_delay * 2 ** min(self.failed_reads - 1, 30), self.max_retry_delay)
+                with self._condition:
+                    # Waiting on the condition lets stop() cut a long backoff short
+                    self._condition.wait_for(lambda: not self.running, delay)
+                continue
+            if self.failed_reads:
+                logger.info(f"Camera recovered after {self.failed_reads} failed reads")
+                self.failed_reads = 0
+            if self.motion_detector is not None:
+                try:
+                    self.motion_detector.update(frame)
+                except Exception as e:
+                    logger.error(f"Error detecting motion: {str(e)}")
+            with self._condition:
+                self._seq += 1
+                self._frame = frame
+                self._timestamp = time.time()
+                self._condition.notify_all()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def latest(self):
+        """Return (seq, frame) for the most recent frame without waiting"""
+        with self._condition:
+            return self._seq, self._frame
+
+    def wait_for_frame(self, last_seq=0, timeout=1.0):
+        """Wait for a frame newer than last_seq.
+
+        Returns (seq, frame), or (last_seq, None) if nothing new arrived
+        within the timeout or the broadcaster was stopped.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > last_seq or not self.running, timeout)
+            if self._seq > last_seq:
+                return self._seq, self._frame
+            return last_seq, None
+
+    def frames(self):
+        """Yield (seq, frame) for one viewer, always jumping to the newest frame"""
+        seq = 0
+        while self.running:
+            seq, frame = self.wait_for_frame(seq)
+            if frame is not None:
+                yield seq, frame
+
+class JpegCache:
+    """Encode-once JPEG cache keyed by frame sequence number and stream settings.
+
+    Every viewer asking for the same frame at the same quality and scale gets
+    the very same ``bytes`` object back, so the cost of a frame is one
+    ``cv2.imencode`` per distinct setting no matter how many streams are open.
+    ``variant`` names what was drawn on the frame (e.g. 'raw', 'annotated'),
+    so differently processed copies of one captured frame never share an entry.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (seq, variant, quality, scale) -> encoded JPEG bytes
+        self.frames_encoded = 0
+        self.frames_served = 0
+
+    def get(self, seq, frame, quality=DEFAULT_QUALITY, scale=1.0, variant='raw'):
+        """Return the JPEG bytes for frame seq, encoding it on first request"""
+        key = (seq, variant, quality, scale)
+        with self._lock:
+            # Encoding under the lock is deliberate: viewers racing for the
+            # same new frame wait for one encode instead of each doing it
+            jpeg = self._entries.get(key)
+            if jpeg is None:
+                if scale != 1.0:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if not ret:
+                    return None
+                jpeg = buffer.tobytes()
+                self.frames_encoded += 1
+                self._entries[key] = jpeg
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self.frames_served += 1
+            return jpeg
+
+    def stats(self):
+        """Return encode vs. serve counters"""
+        with self._lock:
+            return {
+                "frames_encoded": self.frames_encoded,
+                "frames_served": self.frames_served,
+                "encodes_saved": self.frames_served - self.frames_encoded
+            }
+
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+FRAME_FOOTER = b'\r\n'
+
+def multipart_chunks(jpeg):
+    """Split one multipart part into chunks so the JPEG bytes are never copied"""
+    return (FRAME_HEADER, jpeg, FRAME_FOOTER)
+
+class StreamController:
+    """Per-client quality and frame-rate control for one MJPEG stream.
+
+    Fixed mode just applies the requested quality, scale and max_fps. In
+    adaptive mode the time the server spends writing each frame to the
+    client socket is tracked; when it goes over ``write_budget`` the stream
+    steps down quality, then resolution, and spaces frames further apart,
+    and steps back up once the link has headroom again.
+    """
+
+    QUALITY_STEPS = [95, 80, 65, 50, 35]
+    SCALE_STEPS = [1.0, 0.75, 0.5, 0.35]
+
+    def __init__(self, quality=DEFAULT_QUALITY, scale=1.0, max_fps=None,
+                 adaptive=False, write_budget=0.1):
+        self.quality = min(max(int(quality), 5), 100)
+        self.scale = min(max(float(scale), 0.1), 1.0)
+        self.max_fps = max_fps if max_fps and max_fps > 0 else None
+        self.adaptive = adaptive
+        self.write_budget = write_budget
+        self.avg_write_time = 0.0
+        self.frames_skipped = 0
+        self._min_interval = 1.0 / self.max_fps if self.max_fps else 0.0
+        self._last_sent = None
+        # Adaptive mode starts from the requested settings and walks these ladders
+        self._quality_steps = [q for q in self.QUALITY_STEPS if q < self.quality]
+        self._scale_steps = [sc for sc in self.SCALE_STEPS if sc < self.scale]
+        self._quality_level = 0
+        self._scale_level = 0
+        self._requested = (self.quality, self.scale)
+
+    @classmethod
+    def from_request_args(cls, args):
+        """Build a controller from /video_feed query parameters"""
+        return cls(
+            quality=args.get('quality', DEFAULT_QUALITY, type=int),
+            scale=args.get('scale', 1.0, type=float),
+            max_fps=args.get('max_fps', None, type=float),
+            adaptive=args.get('adaptive', '0') in ('1', 'true', 'yes')
+        )
+
+    def should_send(self, now):
+        """Return True if a frame may be sent at time now"""
+        if self._last_sent is not None and now - self._last_sent < self._current_interval():
+            self.frames_skipped += 1
+            return False
+        self._last_sent = now
+        return True
+
+    def _current_interval(self):
+        if not self.adaptive or self.avg_write_time <= self.write_budget:
+            return self._min_interval
+        # Link is saturated: leave it idle long enough to drain
+        return max(self._min_interval, 2 * self.avg_write_time)
+
+    def record_write(self, seconds):
+        """Feed back how long writing the last frame to the socket took"""
+        self.avg_write_time = 0.7 * self.avg_write_time + 0.3 * seconds
+        if not self.adaptive:
+            return
+        if self.avg_write_time > self.write_budget:
+            self._step_down()
+        elif self.avg_write_time < self.write_budget / 4:
+            self._step_up()
+
+    def _step_down(self):
+        if self._quality_level < len(self._quality_steps):
+            self._quality_level += 1
+        elif self._scale_level < len(self._scale_steps):
+            self._scale_level += 1
+        self._apply_levels()
+
+    def _step_up(self):
+        if self._scale_level > 0:
+            self._scale_level -= 1
+        elif self._quality_level > 0:
+            self._quality_level -= 1
+        self._apply_levels()
+
+    def _apply_levels(self):
+        quality, scale = self._requested
+        if self._quality_level:
+            quality = self._quality_steps[self._quality_level - 1]
+        if self._scale_level:
+            scale = self._scale_steps[self._scale_level - 1]
+        self.quality, self.scale = quality, scale
+
+def stream_mjpeg(frames, cache, controller, clock=time.monotonic, motion=None, variant='raw'):
+    """Generate multipart MJPEG chunks for one client.
+
+    ``frames`` yields (seq, frame) pairs, normally FrameBroadcaster.frames();
+    ``variant`` is the JpegCache variant they are cached under, so frames
+    with an overlay need their own (e.g. 'annotated').
+    The WSGI server writes each yielded chunk before asking for the next, so
+    the time spent suspended at the yields is the socket write time. With a
+    ``motion`` detector, quality is capped at IDLE_QUALITY while the scene
+    is still.
+    """
+    for seq, frame in frames:
+        if not controller.should_send(clock()):
+            continue
+        quality = controller.quality
+        if motion is not None and not motion.active():
+            quality = min(quality, IDLE_QUALITY)
+        jpeg = cache.get(seq, frame, quality, controller.scale, variant)
+        if jpeg is None:
+            continue
+        start = clock()
+        yield from multipart_chunks(jpeg)
+        controller.record_write(clock() - start)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import queue
+import threading
+import logging
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ClipRecorder:
+    """Event-triggered MJPEG clip recorder with an in-memory pre-roll.
+
+    A recording thread samples the newest broadcaster frame at ``fps``,
+    encodes it through the shared JpegCache and keeps the last
+    ``pre_roll`` seconds in a bounded ring buffer. trigger() (called
+    directly, or by one of the polled ``triggers``) starts a clip with that
+    pre-roll and keeps it open until ``post_roll`` seconds after the last
+    event, up to ``max_clip`` seconds. Disk I/O happens only on the writer
+    thread and only while a clip is open; if the disk falls behind, frames
+    are dropped rather than held up. Only frames count towards
+    ``queue_size``, so opening and closing a clip never waits on the disk.
+
+    ``triggers`` is a list of (reason, callable) pairs checked once per
+    sampled frame, e.g. ('motion', motion_detector.active). Clips are
+    written as concatenated JPEGs (``.mjpeg``) with a ``.json`` sidecar.
+    """
+
+    def __init__(self, broadcaster, cache, clip_dir='clips', pre_roll=5.0, post_roll=5.0,
+                 fps=10.0, quality=70, scale=1.0, max_clip=60.0, triggers=None,
+                 queue_size=256, clock=time.monotonic):
+        self.broadcaster = broadcaster
+        self.cache = cache
+        self.clip_dir = clip_dir
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.quality = quality
+        self.scale = scale
+        self.max_clip = max_clip
+        self.triggers = list(triggers or [])
+        self.clock = clock
+        self.running = False
+        self.record_thread = None
+        self.writer_thread = None
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=max(int(pre_roll * fps), 1))  # (time, jpeg)
+        self.queue_size = queue_size
+        self._writer_queue = queue.Queue()  # Unbounded; _enqueue() caps the frames
+        self._clip = None  # Clip currently being recorded
+        self._next_sample = None
+        self._clip_count = 0
+        self.finished_clips = deque(maxlen=50)
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        """Start the recording and writer threads if not already running"""
+        if self.running:
+            return False
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._write_loop)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+        self.record_thread = threading.Thread(target=self._record_loop)
+        self.record_thread.daemon = True
+        self.record_thread.start()
+        logger.info(f"Clip recorder started ({self.pre_roll}s pre-roll, {self.post_roll}s post-roll)")
+        return True
+
+    def stop(self):
+        """Close any open clip and wait for the writer to flush it"""
+        self.running = False
+        if self.record_thread:
+            self.record_thread.join(timeout=1.0)
+        with self._lock:
+            if self._clip is not None:
+                self._close_clip()
+        self._writer_queue.put_nowait(None)
+        if self.writer_thread:
+            self.writer_thread.join(timeout=5.0)
+        logger.info("Clip recorder stopped")
+
+    @property
+    def recording(self):
+        return self._clip is not None
+
+    def trigger(self, reason):
+        """Start a clip for reason, or extend the one being recorded"""
+        with self._lock:
+            now = self.clock()
+            if self._clip is None:
+                self._open_clip(reason, now)
+            else:
+                clip = self._clip
+                if reason not in clip["reasons"]:
+                    clip["reasons"].append(reason)
+                clip["end"] = min(max(clip["end"], now + self.post_roll),
+                                  clip["start"] + self.max_clip)
+
+    def add_frame(self, seq, frame, now=None):
+        """Sample one frame into the pre-roll buffer or the open clip"""
+        now = self.clock() if now is None else now
+        interval = 1.0 / self.fps
+        # Allow a little camera jitter so a 30 fps source still yields 10 fps
+        if self._next_sample is not None and now < self._next_sample - interval / 4:
+            return
+        if self._next_sample is None or now - self._next_sample >= interval:
+            self._next_sample = now + interval  # Fell behind: resynchronise
+        else:
+            self._next_sample += interval
+        jpeg = self.cache.get(seq, frame, self.quality, self.scale)
+        if jpeg is None:
+            return
+        for reason, check in self.triggers:
+            try:
+                if check():
+                    self.trigger(reason)
+            except Exception as e:
+                logger.error(f"Error checking {reason} trigger: {str(e)}")
+        with self._lock:
+            clip = self._clip
+            if clip is not None and now > clip["end"]:
+                self._close_clip()
+                clip = None
+            if clip is None:
+                self._buffer.append((now, jpeg))
+            else:
+                self._enqueue(("frame", jpeg))
+
+    def _open_clip(self, reason, now):
+        self._clip_count += 1
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        name = f"clip_{stamp}_{self._clip_count:04d}_{reason}"
+        self._clip = {
+            "name": name,
+            "path": os.path.join(self.clip_dir, name + '.mjpeg'),
+            "started_at": time.time(),
+            "start": now,
+            "end": now + self.post_roll,
+            "reasons": [reason]
+        }
+        logger.info(f"Recording clip {name} ({reason})")
+        self._writer_queue.put_nowait(("open", self._clip["path"]))
+        for timestamp, jpeg in self._buffer:
+            if now - timestamp <= self.pre_roll:
+                self._enqueue(("frame", jpeg))
+        self._buffer.clear()
+
+    def _close_clip(self):
+        clip = self._clip
+        self._clip = None
+        info = {
+            "name": clip["name"],
+            "path": clip["path"],
+            "started_at": clip["started_at"],
+            "reasons": list(clip["reasons"])
+        }
+        self._writer_queue.put_nowait(("close", info))
+
+    def _enqueue(self, item):
+        # Frames are dropped once the writer is queue_size items behind, which
+        # leaves the open/close items, queued unconditionally, room to get in
+        if self._writer_queue.qsize() >= self.queue_size:
+            self.frames_dropped += 1
+        else:
+            self._writer_queue.put_nowait(item)
+
+    def _record_loop(self):
+        for seq, frame in self.broadcaster.frames():
+            if not self.running:
+                break
+            try:
+                self.add_frame(seq, frame)
+            except Exception as e:
+                logger.error(f"Error recording frame: {str(e)}")
+
+    def _write_loop(self):
+        """Writer thread: the only place clip files are touched"""
+        clip_file = None
+        frames = 0
+        while True:
+            item = self._writer_queue.get()
+            if item is None:
+                break
+            kind, payload = item
+            try:
+                if kind == "open":
+                    os.makedirs(os.path.dirname(payload) or '.', exist_ok=True)
+                    clip_file = open(payload, 'wb')
+                    frames = 0
+                elif kind == "frame" and clip_file is not None:
+                    clip_file.write(payload)
+                    frames += 1
+                    self.frames_written += 1
+                elif kind == "close" and clip_file is not None:
+                    clip_file.close()
+                    clip_file = None
+                    payload["frames"] = frames
+                    with open(os.path.splitext(payload["path"])[0] + '.json', 'w') as f:
+                        json.dump(payload, f)
+                    self.finished_clips.append(payload)
+                    logger.info(f"Saved clip {payload['name']} ({frames} frames)")
+            except OSError as e:
+                logger.error(f"Error writing clip: {str(e)}")
+        if clip_file is not None:
+            clip_file.close()
+
+    def clips(self):
+        """Most recent finished clips, newest last"""
+        return list(self.finished_clips)
+
+    def stats(self):
+        return {
+            "recording": self.recording,
+            "clips": self._clip_count,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "buffered_frames": len(self._buffer)
+        }
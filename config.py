@@ -4,4 +4,39 @@ class Config:
     TRIG_PIN = int(os.getenv('TRIG_PIN', 23))
     ECHO_PIN = int(os.getenv('ECHO_PIN', 24))
     IR_PIN = int(os.getenv('IR_PIN', 17))
-    # Add other configurations as needed 
\ No newline at end of file
+    # GPIO backend: 'rpi', 'sim' (in-process simulated pins) or 'auto'
+    GPIO_BACKEND = os.getenv('GPIO_BACKEND', 'auto')
+    # Background sensor sampling; the HC-SR04 needs ~60 ms between pings, so
+    # read_ultrasonic_distance() holds faster rates down to about 16 Hz
+    SENSOR_SAMPLE_HZ = float(os.getenv('SENSOR_SAMPLE_HZ', 16))
+    SENSOR_BUFFER_SIZE = int(os.getenv('SENSOR_BUFFER_SIZE', 256))
+    TEMPERATURE_POLL_INTERVAL = float(os.getenv('TEMPERATURE_POLL_INTERVAL', 5.0))
+    # Face detection runs on the frame shrunk by this factor (1.0 = full size)
+    FACE_DETECTION_SCALE = float(os.getenv('FACE_DETECTION_SCALE', 0.5))
+    # Optional "x,y,width,height" region of the frame to search for faces
+    FACE_DETECTION_ROI = tuple(int(v) for v in os.getenv('FACE_DETECTION_ROI').split(',')) \
+        if os.getenv('FACE_DETECTION_ROI') else None
+    # Face recognition needs the face_recognition package (dlib), so it is off
+    # unless enabled here
+    FACE_RECOGNITION = os.getenv('FACE_RECOGNITION', '0').lower() in ('1', 'true', 'yes', 'on')
+    # Run face recognition in a 'thread' or a separate 'process' (sidesteps the GIL)
+    FACE_RECOGNITION_MODE = os.getenv('FACE_RECOGNITION_MODE', 'process')
+    # Seconds between checks of known_faces/ for added, changed or removed images
+    FACE_GALLERY_POLL_INTERVAL = float(os.getenv('FACE_GALLERY_POLL_INTERVAL', 2.0))
+    # Fraction of changed pixels that counts as motion, and how long (s) it keeps
+    # recognition and full-quality streaming running afterwards
+    MOTION_MIN_SCORE = float(os.getenv('MOTION_MIN_SCORE', 0.01))
+    MOTION_HOLD = float(os.getenv('MOTION_HOLD', 2.0))
+    # Event clips: seconds kept before and after an event, and recording rate
+    CLIP_DIR = os.getenv('CLIP_DIR', 'clips')
+    CLIP_PRE_ROLL = float(os.getenv('CLIP_PRE_ROLL', 5.0))
+    CLIP_POST_ROLL = float(os.getenv('CLIP_POST_ROLL', 5.0))
+    CLIP_FPS = float(os.getenv('CLIP_FPS', 10.0))
+    # Dead-reckoning calibration: ground speed (m/s) at 100% duty going straight,
+    # and spin rate (rad/s) at 100% duty turning on the spot
+    POSE_SPEED = float(os.getenv('POSE_SPEED', 0.25))
+    POSE_TURN_RATE = float(os.getenv('POSE_TURN_RATE', 1.57))
+    # Directory for patrol traces (sensor readings and motor commands) that
+    # patrol_trace.py can replay; unset to disable recording
+    PATROL_TRACE_DIR = os.getenv('PATROL_TRACE_DIR')
+    # Add other configurations as needed
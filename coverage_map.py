@@ -0,0 +1,135 @@
+import math
+import time
+import threading
+import logging
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CoverageMap:
+    """Fixed-size visit-count and obstacle grid around the patrol start point.
+
+    The grid is ``size`` metres square at ``resolution`` metres per cell,
+    with (0, 0) at its centre, x forward and y to the left of the start
+    heading. ``visits`` counts how often the robot entered each cell and
+    ``obstacles`` how many separate sightings put an obstacle in it. Poses
+    outside the grid are ignored rather than growing it.
+    """
+
+    def __init__(self, size=10.0, resolution=0.25, clock=time.monotonic):
+        self.resolution = resolution
+        self.cells = int(round(size / resolution))
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.visits = np.zeros((self.cells, self.cells), dtype=np.int32)
+        self.obstacles = np.zeros((self.cells, self.cells), dtype=np.int32)
+        self._last_cell = None
+        self._sightings = {}  # Sensor -> cell it is currently seeing an obstacle in
+        self._session_start = None
+        self._session_cells = 0  # Distinct cells visited when the session started
+
+    def cell(self, x, y):
+        """(row, col) of the cell holding world point (x, y), or None if off the grid"""
+        col = int(math.floor(x / self.resolution)) + self.cells // 2
+        row = self.cells // 2 - 1 - int(math.floor(y / self.resolution))
+        if 0 <= row < self.cells and 0 <= col < self.cells:
+            return row, col
+        return None
+
+    def start_session(self):
+        """Start timing coverage, e.g. when a patrol starts"""
+        with self._lock:
+            self._session_start = self.clock()
+            self._session_cells = int(np.count_nonzero(self.visits))
+            self._last_cell = None
+            self._sightings.clear()
+
+    def mark_visit(self, x, y):
+        """Count a visit if (x, y) lies in a different cell than the last one"""
+        cell = self.cell(x, y)
+        with self._lock:
+            if cell is None or cell == self._last_cell:
+                return
+            self._last_cell = cell
+            self.visits[cell] += 1
+
+    def mark_path(self, x0, y0, x1, y1):
+        """Mark every cell along a straight move from (x0, y0) to (x1, y1)"""
+        steps = max(int(math.ceil(math.hypot(x1 - x0, y1 - y0) / (self.resolution / 2))), 1)
+        for t in np.linspace(0.0, 1.0, steps + 1)[1:]:
+            self.mark_visit(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+
+    def mark_obstacle(self, x, y, heading, distance, sensor=None):
+        """Record an obstacle seen distance metres ahead of pose (x, y, heading).
+
+        A sensor that keeps seeing the obstacle in the same cell counts once,
+        like mark_visit(), until end_sighting(sensor) is called.
+        """
+        cell = self.cell(x + distance * math.cos(heading), y + distance * math.sin(heading))
+        if cell is None:
+            return
+        with self._lock:
+            if sensor is not None:
+                if self._sightings.get(sensor) == cell:
+                    return
+                self._sightings[sensor] = cell
+            self.obstacles[cell] += 1
+
+    def end_sighting(self, sensor):
+        """The sensor no longer sees an obstacle; its next one counts again"""
+        with self._lock:
+            self._sightings.pop(sensor, None)
+
+    def score_direction(self, x, y, heading, lookahead=1.5):
+        """Visits plus weighted obstacle hits along a ray; lower is more worth exploring.
+
+        Cells off the grid count as obstacles so the robot doesn't head for
+        areas it cannot map.
+        """
+        score = 0.0
+        for d in np.arange(self.resolution, lookahead + 1e-9, self.resolution):
+            cell = self.cell(x + d * math.cos(heading), y + d * math.sin(heading))
+            if cell is None:
+                score += 5.0
+                continue
+            score += self.visits[cell] + 5.0 * self.obstacles[cell]
+        return score
+
+    def preferred_turn(self, x, y, heading, margin=1.0):
+        """Return 'left' or 'right', whichever side is less visited, or None on a tie"""
+        with self._lock:
+            left = self.score_direction(x, y, heading + math.pi / 2)
+            right = self.score_direction(x, y, heading - math.pi / 2)
+        if left + margin <= right:
+            return 'left'
+        if right + margin <= left:
+            return 'right'
+        return None
+
+    def stats(self):
+        """Covered area and how fast new area was covered since start_session()"""
+        with self._lock:
+            visited = int(np.count_nonzero(self.visits))
+            obstacle_cells = int(np.count_nonzero(self.obstacles))
+            session_start, session_cells = self._session_start, self._session_cells
+        cell_area = self.resolution ** 2
+        stats = {
+            "cells_visited": visited,
+            "area_covered_m2": visited * cell_area,
+            "obstacle_cells": obstacle_cells,
+            "grid_cells": self.cells * self.cells,
+            "resolution_m": self.resolution,
+            "coverage_per_minute_m2": None
+        }
+        if session_start is not None:
+            minutes = (self.clock() - session_start) / 60.0
+            if minutes > 0:
+                stats["coverage_per_minute_m2"] = (visited - session_cells) * cell_area / minutes
+        return stats
+
+    def grid(self):
+        """Copies of the visit and obstacle grids as nested lists for JSON"""
+        with self._lock:
+            return {"visits": self.visits.tolist(), "obstacles": self.obstacles.tolist()}
@@ -0,0 +1,95 @@
+import os
+import shutil
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from face_store import FaceEncodingStore, CACHE_DIRNAME, FAILED, single_face
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4  # One per Raspberry Pi 4 core
+
+def face_encodings_in(path):
+    """Return every face encoding found in an image file.
+
+    Runs inside the pool workers; face_recognition is imported there so
+    each process loads dlib's models once.
+    """
+    import face_recognition
+    image = face_recognition.load_image_file(path)
+    return face_recognition.face_encodings(image)
+
+def encode_parallel(paths, workers=DEFAULT_WORKERS, encode=face_encodings_in, progress=None):
+    """Encode images across a process pool.
+
+    ``encode(path)`` must be a module-level function returning the list of
+    face encodings in that image. Each result goes through single_face(),
+    so images with no face or several give None, and images that raise
+    give FAILED. ``progress(done, total, path, outcome)`` is called as each
+    image finishes. Returns (encodings in path order, summary counts).
+    """
+    summary = {"encoded": 0, "no_face": 0, "multiple_faces": 0, "failed": 0}
+    results = [FAILED] * len(paths)
+    if not paths:
+        return results, summary
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(encode, path): idx for idx, path in enumerate(paths)}
+        for done, future in enumerate(as_completed(futures), 1):
+            idx = futures[future]
+            path = paths[idx]
+            try:
+                encodings = future.result()
+            except Exception as e:
+                logger.error(f"Failed to encode {path}: {str(e)}")
+                outcome = "failed"
+            else:
+                results[idx], outcome = single_face(encodings, path)
+            summary[outcome] += 1
+            if progress:
+                progress(done, len(paths), path, outcome)
+    return results, summary
+
+def log_progress(done, total, path, outcome):
+    logger.info(f"[{done}/{total}] {path}: {outcome}")
+
+def enroll(known_faces_dir='known_faces', cache_dir=None, workers=DEFAULT_WORKERS,
+           rebuild=False, encode=face_encodings_in, progress=log_progress):
+    """Encode known_faces/<name>/ images in parallel into the encoding store.
+
+    Only new or changed images are encoded unless rebuild is True, which
+    discards the store first. Returns a summary combining the store changes
+    with the encoding outcomes.
+    """
+    store_dir = cache_dir or os.path.join(known_faces_dir, CACHE_DIRNAME)
+    if rebuild and os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+    store = FaceEncodingStore(store_dir)
+    summary = {"encoded": 0, "no_face": 0, "multiple_faces": 0, "failed": 0}
+
+    def encode_many(paths):
+        logger.info(f"Encoding {len(paths)} images with {workers} workers")
+        encodings, counts = encode_parallel(paths, workers, encode, progress)
+        summary.update(counts)
+        return encodings
+
+    matrix, names, changes = store.sync(known_faces_dir, encode_many)
+    summary.update(changes)
+    summary["people"] = len(set(names))
+    summary["faces"] = len(names)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enroll known faces into the encoding store")
+    parser.add_argument('known_faces_dir', nargs='?', default='known_faces')
+    parser.add_argument('--cache-dir', default=None, help="Encoding store directory")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--rebuild', action='store_true', help="Re-encode every image")
+    args = parser.parse_args(argv)
+    summary = enroll(args.known_faces_dir, args.cache_dir, args.workers, args.rebuild)
+    logger.info(f"Enrollment finished: {summary}")
+    return summary
+
+if __name__ == '__main__':
+    main()
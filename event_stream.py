@@ -0,0 +1,116 @@
+import json
+import threading
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class StatusPublisher:
+    """Single polling thread that turns status snapshots into change events.
+
+    ``sources`` maps a name to a cheap callable returning a JSON-serialisable
+    snapshot (the sensor hub's latest sample, patrol status, ...). They are
+    read every ``interval`` seconds no matter how many dashboards are open;
+    when a snapshot differs from the last one the version is bumped and
+    every waiting stream wakes up with just the changed entries.
+    """
+
+    def __init__(self, sources, interval=0.02):
+        self.sources = dict(sources)
+        self.interval = interval
+        self.running = False
+        self.poll_thread = None
+        self._condition = threading.Condition()
+        self._state = {}
+        self._changed_at = {}  # name -> version at which it last changed
+        self._version = 0
+
+    def start(self):
+        """Take a first snapshot, then keep polling on a background thread"""
+        if self.running:
+            return False
+        self.poll()
+        self.running = True
+        self.poll_thread = threading.Thread(target=self._poll_loop)
+        self.poll_thread.daemon = True
+        self.poll_thread.start()
+        logger.info("Status publisher started")
+        return True
+
+    def stop(self):
+        """Stop polling and release any waiting streams"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.poll_thread:
+            self.poll_thread.join(timeout=1.0)
+        logger.info("Status publisher stopped")
+
+    def _poll_loop(self):
+        while self.running:
+            self.poll()
+            self._wait(self.interval)
+
+    def _wait(self, seconds):
+        with self._condition:
+            self._condition.wait_for(lambda: not self.running, seconds)
+
+    def poll(self):
+        """Read every source once; returns True if anything changed"""
+        changes = {}
+        for name, read in self.sources.items():
+            try:
+                value = read()
+            except Exception as e:
+                logger.error(f"Error reading {name} status: {str(e)}")
+                continue
+            if value != self._state.get(name, _MISSING):
+                changes[name] = value
+        if not changes:
+            return False
+        with self._condition:
+            self._version += 1
+            self._state.update(changes)
+            for name in changes:
+                self._changed_at[name] = self._version
+            self._condition.notify_all()
+        return True
+
+    def snapshot(self):
+        """Return (version, full state)"""
+        with self._condition:
+            return self._version, dict(self._state)
+
+    def wait_for_change(self, last_version, timeout=15.0):
+        """Wait for a version newer than last_version.
+
+        Returns (version, {name: value} changed since last_version); the
+        dict is empty if nothing changed within the timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._version > last_version or not self.running, timeout)
+            changes = {name: self._state[name] for name, version in self._changed_at.items()
+                       if version > last_version}
+            return self._version, changes
+
+def sse_events(publisher, heartbeat=15.0):
+    """Generate an SSE stream: the full state first, then only changes.
+
+    A comment line is sent after ``heartbeat`` quiet seconds so proxies
+    keep the connection open and a closed client is noticed.
+    """
+    version, state = publisher.snapshot()
+    yield format_sse('status', state)
+    while publisher.running:
+        version, changes = publisher.wait_for_change(version, heartbeat)
+        if changes:
+            yield format_sse('status', changes)
+        else:
+            yield ": keepalive\n\n"
@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import threading
+import logging
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ENCODING_SIZE = 128  # Length of a face_recognition encoding
+STORE_VERSION = 2  # 2: encodings stored as float32
+UNKNOWN = "Unknown"
+CACHE_DIRNAME = '.encodings'  # Encoding store kept inside known_faces by default
+FAILED = object()  # encode_many result for an image that could not be read; not cached
+RETRY_DELAY = 30.0  # Seconds before an unchanged image that failed to encode is tried again
+MAX_RETRY_DELAY = 3600.0  # The delay doubles with each failure up to this
+
+def single_face(encodings, path):
+    """Apply the enrollment rule to the face encodings found in one image.
+
+    Only an image with exactly one face is enrolled: with none there is
+    nothing to learn and with several the wrong person could be. Returns
+    (encoding or None, outcome), outcome being "encoded", "no_face" or
+    "multiple_faces".
+    """
+    if len(encodings) == 1:
+        return encodings[0], "encoded"
+    if not len(encodings):
+        logger.warning(f"No face found in {path}, skipping")
+        return None, "no_face"
+    logger.warning(f"{len(encodings)} faces found in {path}, skipping")
+    return None, "multiple_faces"
+
+def scan_images(known_faces_dir):
+    """List every enrolled image as a dict with path, name, size and mtime.
+
+    Paths are relative to known_faces_dir; the name is the person directory.
+    """
+    images = []
+    for name in sorted(os.listdir(known_faces_dir)):
+        person_dir = os.path.join(known_faces_dir, name)
+        if name.startswith('.') or not os.path.isdir(person_dir):
+            continue
+        for filename in sorted(os.listdir(person_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                stat = os.stat(os.path.join(person_dir, filename))
+                images.append({
+                    "path": os.path.join(name, filename),
+                    "name": name,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime
+                })
+    return images
+
+class FaceEncodingStore:
+    """On-disk cache of face encodings for a known_faces directory.
+
+    The encodings live in one float32 ``encodings.npy`` matrix, loaded memory-mapped,
+    and ``index.json`` records for every image its path, size and mtime, its
+    person name and its row in the matrix (None when the image has no usable
+    face, so it is not re-encoded on every start either). Images that
+    failed to encode are left out of the index. They are remembered in
+    memory by path, size and mtime, and retried once the file changes or
+    after a backoff of RETRY_DELAY doubling up to MAX_RETRY_DELAY.
+    """
+
+    def __init__(self, store_dir, clock=time.monotonic):
+        self.store_dir = store_dir
+        self.matrix_path = os.path.join(store_dir, 'encodings.npy')
+        self.index_path = os.path.join(store_dir, 'index.json')
+        self.clock = clock
+        self.updates = 0  # Increases whenever sync() changes the stored encodings
+        self._failures = {}  # path -> {"size", "mtime", "attempts", "retry_at"}
+
+    def retry_due(self):
+        """True if an image that failed to encode is due another try"""
+        now = self.clock()
+        return any(now >= failure["retry_at"] for failure in self._failures.values())
+
+    def load(self):
+        """Return (matrix, entries); an empty store if missing or unreadable"""
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("version") != STORE_VERSION:
+                raise ValueError(f"unsupported store version {index.get('version')}")
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+            entries = index["entries"]
+            rows = sum(1 for entry in entries if entry["row"] is not None)
+            if matrix.ndim != 2 or matrix.shape[0] != rows:
+                raise ValueError("index and matrix disagree")
+            return matrix, entries
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable face encoding store: {str(e)}")
+        return np.empty((0, ENCODING_SIZE), dtype=np.float32), []
+
+    def save(self, matrix, entries):
+        """Write matrix and index, replacing the old files atomically.
+
+        Returns False, leaving the old store in place, if the directory is
+        not writable (e.g. a read-only known_faces).
+        """
+        matrix_tmp = self.matrix_path + '.tmp.npy'
+        index_tmp = self.index_path + '.tmp'
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            np.save(matrix_tmp, np.ascontiguousarray(matrix, dtype=np.float32))
+            with open(index_tmp, 'w') as f:
+                json.dump({"version": STORE_VERSION, "entries": entries}, f)
+            os.replace(matrix_tmp, self.matrix_path)
+            os.replace(index_tmp, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not save face encoding store to {self.store_dir}: {str(e)}")
+            return False
+        return True
+
+    def sync(self, known_faces_dir, encode_many):
+        """Bring the store up to date with known_faces_dir.
+
+        ``encode_many(paths)`` is called once with the full paths of new or
+        changed images only and returns one result per path: an encoding,
+        None (no usable face) or FAILED. Returns (matrix, names, changes)
+        where matrix is memory-mapped from the store (held in memory if the
+        store could not be written) and changes counts
+        added/changed/removed/unchanged images, plus those that failed.
+        """
+        matrix, entries = self.load()
+        cached = {entry["path"]: entry for entry in entries}
+        images = scan_images(known_faces_dir)
+        now = self.clock()
+        self._failures = {image["path"]: self._failures[image["path"]]
+                          for image in images if image["path"] in self._failures}
+
+        changes = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0, "failed": 0}
+        todo = []
+        for image in images:
+            entry = cached.pop(image["path"], None)
+            failure = self._failures.get(image["path"])
+            if (entry is None and failure is not None and now < failure["retry_at"]
+                    and (failure["size"], failure["mtime"]) == (image["size"], image["mtime"])):
+                changes["failed"] += 1  # Still unreadable: wait for the backoff or a new file
+            elif entry is None:
+                changes["added"] += 1
+                todo.append(image)
+            elif entry["size"] != image["size"] or entry["mtime"] != image["mtime"]:
+                changes["changed"] += 1
+                todo.append(image)
+            else:
+                changes["unchanged"] += 1
+        changes["removed"] = len(cached)
+
+        if todo or cached:
+            logger.info(f"Updating face encoding store: {changes}")
+            encoded = encode_many([os.path.join(known_faces_dir, image["path"]) for image in todo])
+            fresh = {image["path"]: encoding for image, encoding in zip(todo, encoded)}
+            for image in todo:
+                if fresh[image["path"]] is FAILED:
+                    self._record_failure(image, now)
+                else:
+                    self._failures.pop(image["path"], None)
+            if not cached and all(encoding is FAILED for encoding in encoded):
+                # Only failures: the stored encodings are unchanged, so don't rewrite them
+                changes["failed"] += len(todo)
+                names = [entry["name"] for entry in entries if entry["row"] is not None]
+                return matrix, names, changes
+            old_rows = {entry["path"]: entry["row"] for entry in entries}
+            new_entries, rows = [], []
+            for image in images:
+                if image["path"] in fresh:
+                    encoding = fresh[image["path"]]
+                    if encoding is FAILED:
+                        changes["failed"] += 1
+                        continue
+                elif image["path"] in old_rows:
+                    row = old_rows[image["path"]]
+                    encoding = None if row is None else matrix[row]
+                else:
+                    continue  # Failed earlier and waiting to be retried
+                entry = dict(image, row=None)
+                if encoding is not None:
+                    entry["row"] = len(rows)
+                    rows.append(np.asarray(encoding, dtype=np.float32))
+                new_entries.append(entry)
+            new_matrix = np.array(rows) if rows else np.empty((0, ENCODING_SIZE), dtype=np.float32)
+            if self.save(new_matrix, new_entries):
+                matrix, entries = self.load()
+            else:
+                matrix, entries = new_matrix, new_entries  # Use them unsaved; re-encoded next time
+            self.updates += 1
+
+        names = [entry["name"] for entry in entries if entry["row"] is not None]
+        return matrix, names, changes
+
+    def _record_failure(self, image, now):
+        failure = self._failures.get(image["path"])
+        attempts = 1
+        if failure is not None and (failure["size"], failure["mtime"]) == (image["size"], image["mtime"]):
+            attempts = failure["attempts"] + 1
+        delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        self._failures[image["path"]] = {"size": image["size"], "mtime": image["mtime"],
+                                         "attempts": attempts, "retry_at": now + delay}
+        logger.warning(f"Will retry {image['path']} in {delay:.0f} s unless it changes")
+
+class FaceGallery:
+    """Known faces held as one contiguous float32 matrix for batched matching.
+
+    match() compares every detected face against every known face in a
+    single (faces x known) distance computation, so its cost grows with one
+    matrix product rather than a Python loop per enrolled image.
+    """
+
+    def __init__(self, encodings, names):
+        self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        self.names = list(names)
+        if len(self.names) != len(self.encodings):
+            raise ValueError("Need exactly one name per encoding")
+        # |k|^2 per known face, reused for every frame
+        self._sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, face_encodings):
+        """Euclidean distance from each face (rows) to each known face (columns)"""
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        # |f - k|^2 = |f|^2 + |k|^2 - 2 f.k, with the cross terms as one matmul
+        sq = np.einsum('ij,ij->i', faces, faces)[:, None] + self._sq_norms[None, :]
+        sq -= 2.0 * (faces @ self.encodings.T)
+        np.maximum(sq, 0.0, out=sq)  # Rounding can dip just below zero
+        return np.sqrt(sq, out=sq)
+
+    def match(self, face_encodings, tolerance=0.6):
+        """Return (name, distance) of the closest known face for each face.
+
+        Faces further than tolerance from everyone are named "Unknown";
+        distance is None when the gallery is empty.
+        """
+        count = len(face_encodings)
+        if count == 0:
+            return []
+        if not len(self):
+            return [(UNKNOWN, None)] * count
+        distances = self.distances(face_encodings)
+        best = np.argmin(distances, axis=1)
+        best_distances = distances[np.arange(count), best]
+        return [(self.names[idx] if distance <= tolerance else UNKNOWN, float(distance))
+                for idx, distance in zip(best, best_distances)]
+
+class GalleryWatcher:
+    """Keeps a FaceGallery in step with the known_faces directory while running.
+
+    Each check stats the enrolled images and, only if any were added,
+    changed or removed, syncs the encoding store (encoding just those
+    images with ``encode_many``) and swaps in a new FaceGallery. Readers
+    take current() and keep using the gallery they got, so a swap never
+    disturbs a match in progress.
+
+    start() checks from a background thread. Without it, current() checks
+    itself whenever the interval has passed, which also works inside a
+    recognition worker process that received a pickled copy.
+    """
+
+    def __init__(self, known_faces_dir, encode_many, store_dir=None, interval=2.0,
+                 clock=time.monotonic):
+        self.known_faces_dir = known_faces_dir
+        self.encode_many = encode_many
+        self.store = FaceEncodingStore(store_dir or os.path.join(known_faces_dir, CACHE_DIRNAME),
+                                       clock=clock)
+        self.interval = interval
+        self.clock = clock
+        self.version = 0  # Increases by one for every gallery swap
+        self.last_changes = None
+        self.running = False
+        self.watch_thread = None
+        self._lock = threading.Lock()  # Serialises checks; readers never take it
+        self._gallery = FaceGallery(np.empty((0, ENCODING_SIZE), dtype=np.float32), [])
+        self._signature = None
+        self._last_check = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_lock=None, watch_thread=None, running=False)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def gallery(self):
+        return self._gallery
+
+    def current(self):
+        """Return the newest gallery, checking the directory first if due"""
+        if not self.running and (self._last_check is None
+                                 or self.clock() - self._last_check >= self.interval):
+            self.check()
+        return self._gallery
+
+    def check(self):
+        """Reload if any image changed since the last check; True if swapped"""
+        with self._lock:
+            self._last_check = self.clock()
+            try:
+                signature = [(image["path"], image["size"], image["mtime"])
+                             for image in scan_images(self.known_faces_dir)]
+            except OSError as e:
+                logger.error(f"Error scanning known faces: {str(e)}")
+                return False
+            unchanged = signature == self._signature
+            if unchanged and not self.store.retry_due():
+                return False
+            updates = self.store.updates
+            matrix, names, changes = self.store.sync(self.known_faces_dir, self.encode_many)
+            self._signature = signature
+            if unchanged and self.store.updates == updates:
+                return False  # Retried a failed image and it failed again
+            self._gallery = FaceGallery(matrix, names)
+            self.version += 1
+            self.last_changes = changes
+        logger.info(f"Face gallery reloaded ({len(names)} faces): {changes}")
+        return True
+
+    def start(self):
+        """Load the gallery now and keep checking from a background thread"""
+        if self.running:
+            return False
+        self.check()
+        self.running = True
+        self.watch_thread = threading.Thread(target=self._watch_loop)
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.watch_thread:
+            self.watch_thread.join(timeout=1.0)
+
+    def _watch_loop(self):
+        while self.running:
+            time.sleep(self.interval)
+            if not self.running:
+                break
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error reloading face gallery: {str(e)}")
@@ -0,0 +1,159 @@
+import itertools
+import logging
+import cv2
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    inter = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+class Track:
+    """One face followed across frames, keeping the identity it was given"""
+
+    def __init__(self, track_id, box, name, distance=None):
+        self.id = track_id
+        self.box = box  # (top, right, bottom, left) in full-frame pixels
+        self.name = name
+        self.distance = distance
+        self.template = None  # Downscaled grayscale patch used for matching
+        self.score = 1.0
+
+class FaceTracker:
+    """Runs full recognition every few frames and tracks faces in between.
+
+    ``recognize(frame)`` is the expensive stage, normally a wrapper around
+    face_utils.identify_faces, returning (top, right, bottom, left, name
+    [, distance]) tuples. It runs on the first frame, every
+    ``detect_every`` frames after that, and as soon as any track is lost.
+    In between, each face box is moved by normalised template matching on a
+    downscaled grayscale frame, searching only near its last position.
+    """
+
+    def __init__(self, recognize, detect_every=10, track_scale=0.5, search_margin=0.5,
+                 min_score=0.5, iou_threshold=0.3):
+        self.recognize = recognize
+        self.detect_every = detect_every
+        self.track_scale = track_scale
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self.recognitions = 0
+        self.tracked_frames = 0
+        self._frames_since_recognition = None
+        self._track_lost = False
+        self._ids = itertools.count(1)
+
+    def update(self, frame):
+        """Process one BGR frame and return face tuples like identify_faces"""
+        gray = self._prepare(frame)
+        if (self._frames_since_recognition is None or self._track_lost
+                or self._frames_since_recognition + 1 >= self.detect_every):
+            self._run_recognition(frame, gray)
+        else:
+            self._frames_since_recognition += 1
+            self.tracked_frames += 1
+            for track in self.tracks:
+                self._follow(track, gray)
+        return [track.box + (track.name,) for track in self.tracks]
+
+    def _prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.track_scale != 1.0:
+            gray = cv2.resize(gray, (0, 0), fx=self.track_scale, fy=self.track_scale,
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _run_recognition(self, frame, gray):
+        self.recognitions += 1
+        self._frames_since_recognition = 0
+        self._track_lost = False
+        unmatched = list(self.tracks)
+        tracks = []
+        for result in self.recognize(frame):
+            box, name = tuple(result[:4]), result[4]
+            distance = result[5] if len(result) > 5 else None
+            # Keep the id of the existing track this detection overlaps most
+            best = max(unmatched, key=lambda t: box_iou(t.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= self.iou_threshold:
+                unmatched.remove(best)
+                best.box, best.name, best.distance = box, name, distance
+                track = best
+            else:
+                track = Track(next(self._ids), box, name, distance)
+            track.template = self._crop(gray, box)
+            track.score = 1.0
+            tracks.append(track)
+        self.tracks = tracks
+
+    def _scaled(self, box):
+        top, right, bottom, left = box
+        s = self.track_scale
+        return int(top * s), int(right * s), int(bottom * s), int(left * s)
+
+    def _crop(self, gray, box):
+        top, right, bottom, left = self._scaled(box)
+        return gray[max(top, 0):bottom, max(left, 0):right].copy()
+
+    def _follow(self, track, gray):
+        template = track.template
+        if template is None or template.shape[0] < 4 or template.shape[1] < 4:
+            self._track_lost = True
+            return
+        top, right, bottom, left = self._scaled(track.box)
+        margin_y = int((bottom - top) * self.search_margin) + 1
+        margin_x = int((right - left) * self.search_margin) + 1
+        y0, x0 = max(top - margin_y, 0), max(left - margin_x, 0)
+        y1 = min(bottom + margin_y, gray.shape[0])
+        x1 = min(right + margin_x, gray.shape[1])
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            self._track_lost = True
+            return
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        track.score = score
+        if not score >= self.min_score:  # Also catches NaN from flat windows
+            # Keep the last box for this frame; recognition runs on the next
+            self._track_lost = True
+            return
+        s = self.track_scale
+        new_top = int(round((y0 + dy) / s))
+        new_left = int(round((x0 + dx) / s))
+        height = track.box[2] - track.box[0]
+        width = track.box[1] - track.box[3]
+        track.box = (new_top, new_left + width, new_top + height, new_left)
+        track.template = gray[y0 + dy:y0 + dy + template.shape[0], x0 + dx:x0 + dx + template.shape[1]].copy()
+
+    def stats(self):
+        return {
+            "recognitions": self.recognitions,
+            "tracked_frames": self.tracked_frames,
+            "tracks": len(self.tracks)
+        }
+
+# Trackers created by track_faces, one per recognizer in each process
+_trackers = {}
+
+def track_faces(recognize, frame, **options):
+    """FaceTracker(recognize, **options).update(frame) on a tracker kept per recognizer.
+
+    A module-level stand-in for a bound FaceTracker.update, which
+    RecognitionWorker's process mode can't ship to its worker: pass
+    functools.partial(track_faces, recognize) and the tracker is built on
+    the first frame inside whichever process runs it.
+    """
+    tracker = _trackers.get(recognize)
+    if tracker is None:
+        tracker = _trackers[recognize] = FaceTracker(recognize, **options)
+    return tracker.update(frame)
@@ -1,37 +1,98 @@
 import os
+import logging
 import face_recognition
-import numpy as np
+import cv2
+from face_store import FaceEncodingStore, FaceGallery, GalleryWatcher, CACHE_DIRNAME, FAILED, single_face
+
+logger = logging.getLogger(__name__)
+
+def encode_image(filepath):
+    """Return the encoding of the only face in an image file, or None.
+
+    Uses the same rule as enroll.py (see single_face), so an image with
+    several faces is skipped whichever path enrolls it.
+    """
+    image = face_recognition.load_image_file(filepath)
+    encoding, _ = single_face(face_recognition.face_encodings(image), filepath)
+    return encoding
+
+def encode_images(paths):
+    """encode_many for FaceEncodingStore.sync: an encoding, None or FAILED per path"""
+    results = []
+    for path in paths:
+        try:
+            results.append(encode_image(path))
+        except Exception as e:
+            logger.error(f"Failed to encode {path}: {str(e)}")
+            results.append(FAILED)
+    return results
 
 # Function to load known faces from a directory
-def load_known_faces(known_faces_dir='known_faces'):
-    known_encodings = []
-    known_names = []
-    for name in os.listdir(known_faces_dir):
-        person_dir = os.path.join(known_faces_dir, name)
-        if not os.path.isdir(person_dir):
-            continue
-        for filename in os.listdir(person_dir):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                filepath = os.path.join(person_dir, filename)
-                image = face_recognition.load_image_file(filepath)
-                encodings = face_recognition.face_encodings(image)
-                if len(encodings) > 0:
-                    known_encodings.append(encodings[0])
-                    known_names.append(name)
+def load_known_faces(known_faces_dir='known_faces', cache_dir=None):
+    """Load encodings for every image under known_faces/<name>/.
+
+    Encodings are cached on disk keyed by path, size and mtime, so only new
+    or changed images are encoded; the rest are memory-mapped from the
+    cache. Returns (encodings, names) with encodings as an N x 128 array.
+    """
+    store = FaceEncodingStore(cache_dir or os.path.join(known_faces_dir, CACHE_DIRNAME))
+    known_encodings, known_names, _ = store.sync(known_faces_dir, encode_images)
     return known_encodings, known_names
 
+def locate_faces(rgb_frame, detection_scale=1.0, roi=None):
+    """Detect faces on a reduced image and return full-resolution boxes.
+
+    roi is an optional (x, y, width, height) region to search; detection
+    runs on that region shrunk by detection_scale, and the boxes are mapped
+    back to (top, right, bottom, left) in rgb_frame coordinates.
+    """
+    frame_height, frame_width = rgb_frame.shape[:2]
+    x0, y0 = 0, 0
+    region = rgb_frame
+    if roi is not None:
+        x, y, width, height = roi
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        region = rgb_frame[y0:min(y0 + int(height), frame_height), x0:min(x0 + int(width), frame_width)]
+    if detection_scale != 1.0:
+        region = cv2.resize(region, (0, 0), fx=detection_scale, fy=detection_scale,
+                            interpolation=cv2.INTER_AREA)
+    locations = []
+    for (top, right, bottom, left) in face_recognition.face_locations(region):
+        locations.append((
+            max(int(round(top / detection_scale)) + y0, 0),
+            min(int(round(right / detection_scale)) + x0, frame_width),
+            min(int(round(bottom / detection_scale)) + y0, frame_height),
+            max(int(round(left / detection_scale)) + x0, 0)
+        ))
+    return locations
+
 # Function to identify faces in a given frame
-def identify_faces(frame, known_encodings, known_names):
-    rgb_frame = frame[:, :, ::-1]
-    face_locations = face_recognition.face_locations(rgb_frame)
+def identify_faces(frame, known_encodings, known_names=None, tolerance=0.6, with_distance=False,
+                   detection_scale=1.0, roi=None):
+    """Find faces in a BGR frame and name each after its closest known face.
+
+    known_encodings may be a FaceGallery or a GalleryWatcher (known_names
+    is then ignored); passing one avoids rebuilding the matrix on every
+    frame, and a watcher picks up newly enrolled faces without a restart. Detection can
+    run on a downscaled image and/or a region of interest (see
+    locate_faces); encodings are always computed from the full-resolution
+    frame. Returns (top, right, bottom, left, name) tuples, with the match
+    distance appended when with_distance is True.
+    """
+    gallery = known_encodings
+    if isinstance(gallery, GalleryWatcher):
+        gallery = gallery.current()
+    elif not isinstance(gallery, FaceGallery):
+        gallery = FaceGallery(known_encodings, known_names)
+    # Contiguous RGB copy; dlib would otherwise copy the [:, :, ::-1] view itself
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    face_locations = locate_faces(rgb_frame, detection_scale, roi)
     face_encs = face_recognition.face_encodings(rgb_frame, face_locations)
     face_identities = []
 
-    for face_enc, (top, right, bottom, left) in zip(face_encs, face_locations):
-        matches = face_recognition.compare_faces(known_encodings, face_enc, tolerance=0.6)
-        name = "Unknown"
-        if True in matches:
-            match_idx = np.argmax(matches)
-            name = known_names[match_idx]
-        face_identities.append((top, right, bottom, left, name))
+    for (name, distance), (top, right, bottom, left) in zip(gallery.match(face_encs, tolerance), face_locations):
+        if with_distance:
+            face_identities.append((top, right, bottom, left, name, distance))
+        else:
+            face_identities.append((top, right, bottom, left, name))
     return face_identities
@@ -0,0 +1,211 @@
+import time
+import threading
+import logging
+from collections import deque
+from config import Config
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SimulatedPWM:
+    """In-process stand-in for RPi.GPIO.PWM that records duty cycle changes"""
+
+    def __init__(self, gpio, channel, frequency):
+        self.gpio = gpio
+        self.channel = channel
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.gpio.duty_cycles[self.channel] = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+        self.ChangeDutyCycle(0.0)
+
+class SimulatedGPIO:
+    """Simulated pin bank with the parts of the RPi.GPIO API this project uses.
+
+    Inputs are scripted with set_input() (fires edge callbacks like the real
+    interrupt thread would) or input_script() (a callable polled on every
+    read). Every output write is recorded in output_log, and on_output()
+    hooks let a test or simulator react to writes, e.g. to answer an
+    ultrasonic trigger with an echo pulse.
+    """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, log_size=10000):
+        self._lock = threading.RLock()
+        self.mode = None
+        self.functions = {}  # pin -> IN / OUT
+        self.levels = {}  # pin -> current level
+        self.duty_cycles = {}  # EN pin -> PWM duty cycle
+        self.output_log = deque(maxlen=log_size)  # (timestamp, pin, level)
+        self.output_calls = 0
+        self._input_scripts = {}
+        self._edge_callbacks = {}  # pin -> (edge, callback)
+        self._output_hooks = {}  # pin -> [callback(pin, level)]
+
+    # --- RPi.GPIO API ---
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def getmode(self):
+        return self.mode
+
+    def setup(self, channels, direction, pull_up_down=None, initial=None):
+        with self._lock:
+            for channel in self._channels(channels):
+                self.functions[channel] = direction
+                if direction == self.OUT:
+                    self.levels[channel] = self.LOW if initial is None else initial
+                else:
+                    self.levels.setdefault(channel, self.LOW)
+
+    def PWM(self, channel, frequency):
+        return SimulatedPWM(self, channel, frequency)
+
+    def gpio_function(self, channel):
+        return self.functions.get(channel, self.IN)
+
+    def output(self, channels, values):
+        channels = self._channels(channels)
+        if isinstance(values, (list, tuple)):
+            values = list(values)
+        else:
+            values = [values] * len(channels)
+        hooks = []
+        with self._lock:
+            self.output_calls += 1
+            now = time.monotonic()
+            for channel, value in zip(channels, values):
+                level = self.HIGH if value else self.LOW
+                self.levels[channel] = level
+                self.output_log.append((now, channel, level))
+                hooks.extend((hook, channel, level) for hook in self._output_hooks.get(channel, ()))
+        for hook, channel, level in hooks:
+            hook(channel, level)
+
+    def input(self, channel):
+        script = self._input_scripts.get(channel)
+        if script is not None:
+            return self.HIGH if script() else self.LOW
+        return self.levels.get(channel, self.LOW)
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        with self._lock:
+            self._edge_callbacks[channel] = (edge, callback)
+
+    def remove_event_detect(self, channel):
+        with self._lock:
+            self._edge_callbacks.pop(channel, None)
+
+    def cleanup(self, channels=None):
+        with self._lock:
+            targets = list(self.functions) if channels is None else self._channels(channels)
+            for channel in targets:
+                self.functions.pop(channel, None)
+                self._edge_callbacks.pop(channel, None)
+            if channels is None:
+                self.mode = None
+
+    # --- Simulation helpers ---
+
+    def set_input(self, channel, level):
+        """Drive an input pin, firing any edge callback for the transition"""
+        level = self.HIGH if level else self.LOW
+        with self._lock:
+            previous = self.levels.get(channel, self.LOW)
+            self.levels[channel] = level
+            edge, callback = self._edge_callbacks.get(channel, (None, None))
+        if callback is None or previous == level:
+            return
+        if edge == self.BOTH or (edge == self.RISING) == (level == self.HIGH):
+            callback(channel)
+
+    def input_script(self, channel, script):
+        """Answer input() on channel by calling script(); None removes it"""
+        if script is None:
+            self._input_scripts.pop(channel, None)
+        else:
+            self._input_scripts[channel] = script
+
+    def on_output(self, channel, hook):
+        """Call hook(channel, level) after every write to channel"""
+        with self._lock:
+            self._output_hooks.setdefault(channel, []).append(hook)
+
+    def simulate_ultrasonic(self, trig_pin, echo_pin, distance_cm):
+        """Answer each trigger pulse with an echo for distance_cm().
+
+        distance_cm returns the distance to report, or None for no echo.
+        """
+        def on_trigger(channel, level):
+            if level != self.LOW:
+                return
+            distance = distance_cm()
+            if distance is None:
+                return
+            self.set_input(echo_pin, self.HIGH)
+            # Spin rather than sleep: sleep() can overshoot a pulse this short
+            # by milliseconds, i.e. by tens of centimetres
+            end = time.perf_counter() + 2 * distance / 34300.0
+            while time.perf_counter() < end:
+                pass
+            self.set_input(echo_pin, self.LOW)
+        self.on_output(trig_pin, on_trigger)
+
+    def _channels(self, channels):
+        if isinstance(channels, (list, tuple)):
+            return list(channels)
+        return [channels]
+
+def load_gpio(backend=None):
+    """Return the GPIO module for backend: 'rpi', 'sim' or 'auto'.
+
+    'auto' uses RPi.GPIO when it can be imported and falls back to the
+    simulated pin bank everywhere else.
+    """
+    backend = (backend or Config.GPIO_BACKEND).lower()
+    if backend == 'sim':
+        return SimulatedGPIO()
+    try:
+        import RPi.GPIO as gpio
+        return gpio
+    except (ImportError, RuntimeError) as e:
+        if backend == 'rpi':
+            raise
+        logger.warning(f"RPi.GPIO unavailable ({str(e)}), using simulated GPIO")
+        return SimulatedGPIO()
+
+def is_simulated():
+    return isinstance(GPIO, SimulatedGPIO)
+
+# Shared by motor_control, sensors and the apps
+GPIO = load_gpio()
@@ -0,0 +1,72 @@
+import time
+import logging
+import numpy as np
+import cv2
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MotionDetector:
+    """Cheap frame-differencing motion detector used to gate expensive stages.
+
+    Each frame is shrunk to ``width`` pixels wide, converted to blurred
+    grayscale and compared against a slowly updated background. The score
+    is the fraction of pixels that differ by more than ``threshold``.
+    active() stays True for ``hold`` seconds after the last frame scoring at
+    least ``min_score``, so recognition and recording don't flicker off
+    between the frames of one movement.
+    """
+
+    def __init__(self, width=160, threshold=25, min_score=0.01, hold=2.0,
+                 learning_rate=0.05, clock=time.monotonic):
+        self.width = width
+        self.threshold = threshold
+        self.min_score = min_score
+        self.hold = hold
+        self.learning_rate = learning_rate
+        self.clock = clock
+        self.score = 0.0
+        self.frames_analyzed = 0
+        self.frames_with_motion = 0
+        self._background = None  # float32 running average of the small frames
+        self._last_motion = None
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.width:
+            size = (self.width, max(int(round(height * self.width / float(width))), 1))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(frame, (5, 5), 0)
+
+    def update(self, frame):
+        """Analyse one BGR (or grayscale) frame and return its motion score"""
+        gray = self._prepare(frame)
+        self.frames_analyzed += 1
+        if self._background is None or self._background.shape != gray.shape:
+            # Nothing to compare with yet; count the first frame as activity
+            self._background = gray.astype(np.float32)
+            self._last_motion = self.clock()
+            self.score = 0.0
+            return self.score
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        self.score = np.count_nonzero(diff > self.threshold) / float(diff.size)
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        if self.score >= self.min_score:
+            self.frames_with_motion += 1
+            self._last_motion = self.clock()
+        return self.score
+
+    def active(self):
+        """True if motion was seen within the last ``hold`` seconds"""
+        return self._last_motion is not None and self.clock() - self._last_motion <= self.hold
+
+    def stats(self):
+        return {
+            "score": self.score,
+            "active": self.active(),
+            "frames_analyzed": self.frames_analyzed,
+            "frames_with_motion": self.frames_with_motion
+        }
@@ -1,6 +1,7 @@
-import RPi.GPIO as GPIO
+from hardware import GPIO
 import time
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,23 +18,188 @@ ALL_PINS = [M1_IN1, M1_IN2, M1_EN,
             M3_IN1, M3_IN2, M3_EN,
             M4_IN1, M4_IN2, M4_EN]
 
-# Setup GPIO
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(ALL_PINS, GPIO.OUT)
+# --- Speed Control ---
 
-# Enable all motors
-GPIO.output(M1_EN, GPIO.HIGH)
-GPIO.output(M2_EN, GPIO.HIGH)
-GPIO.output(M3_EN, GPIO.HIGH)
-GPIO.output(M4_EN, GPIO.HIGH)
+PWM_FREQUENCY = 1000  # Hz on the EN pins
+DEFAULT_SPEED = 100  # % duty cycle; full speed, as before the EN pins were PWM driven
+RAMP_TIME = 0.3  # Seconds to accelerate from standstill to full speed
+RAMP_INTERVAL = 0.02  # Seconds between duty cycle steps while ramping
 
-# --- Movement Functions ---
+EN_PINS = [M1_EN, M2_EN, M3_EN, M4_EN]
+LEFT_MOTORS = (0, 2)  # Indexes into MOTOR_PINS / EN_PINS
+RIGHT_MOTORS = (1, 3)
 
-def forward(speed=None, duration=None):  # Keep speed param for compatibility but don't use it
-    logging.info("Moving forward")
-    for (IN1, IN2) in [(M1_IN1, M1_IN2), (M2_IN1, M2_IN2), (M3_IN1, M3_IN2), (M4_IN1, M4_IN2)]:
-        GPIO.output(IN1, GPIO.HIGH)
-        GPIO.output(IN2, GPIO.LOW)
+_pwms = []  # PWM on the enable pins, created by setup()
+_setup_lock = threading.Lock()
+_is_setup = False
+
+def setup():
+    """Configure the motor pins and start PWM idle; safe to call repeatedly.
+
+    Done on first use rather than at import, so the module can be imported
+    (and profiled) without touching hardware.
+    """
+    global _is_setup
+    with _setup_lock:
+        if _is_setup:
+            return
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(ALL_PINS, GPIO.OUT)
+        _pwms[:] = [GPIO.PWM(EN, PWM_FREQUENCY) for EN in EN_PINS]
+        for pwm in _pwms:
+            pwm.start(0)
+        _is_setup = True
+
+# --- Motor State ---
+
+# (IN1, IN2) per motor: front left, front right, rear left, rear right
+MOTOR_PINS = [(M1_IN1, M1_IN2), (M2_IN1, M2_IN2), (M3_IN1, M3_IN2), (M4_IN1, M4_IN2)]
+
+# Per-motor direction for each move, in MOTOR_PINS order:
+# 1 = forward, -1 = backward, 0 = stopped
+DIRECTION_TABLE = {
+    'forward':  (1, 1, 1, 1),
+    'backward': (-1, -1, -1, -1),
+    'left':     (-1, 1, -1, 1),  # Left motors backward, right motors forward
+    'right':    (1, -1, 1, -1),  # Left motors forward, right motors backward
+    'stop':     (0, 0, 0, 0),
+}
+
+# (IN1, IN2) levels for each motor direction
+_LEVELS = {1: (GPIO.HIGH, GPIO.LOW), -1: (GPIO.LOW, GPIO.HIGH), 0: (GPIO.LOW, GPIO.LOW)}
+
+_state_lock = threading.Lock()
+_ramp_cond = threading.Condition(_state_lock)
+_ramp_thread = None
+_pin_levels = {}  # pin -> level last written; empty means unknown, so everything is written
+_directions = [0, 0, 0, 0]  # Current direction per motor
+_duty = [0.0, 0.0, 0.0, 0.0]  # Duty cycle currently applied per motor
+_target_duty = [0.0, 0.0, 0.0, 0.0]  # Duty cycle the ramp is heading for
+gpio_writes = 0  # GPIO.output calls made for direction changes
+pins_written = 0  # Individual pin levels changed by those calls
+_motion_listeners = []  # callback(timestamp, left_duty, right_duty) on every speed change
+
+def side_speeds(speed=None, steer=0.0):
+    """Split speed into (left, right) duty cycles.
+
+    steer runs from -1 (pivot on the left side) to 1 (pivot on the right);
+    the inside of the arc is slowed, the outside keeps the full speed.
+    """
+    speed = DEFAULT_SPEED if speed is None else min(max(float(speed), 0.0), 100.0)
+    steer = min(max(float(steer), -1.0), 1.0)
+    return speed * (1.0 + min(steer, 0.0)), speed * (1.0 - max(steer, 0.0))
+
+def _set_duty(index, duty):
+    _duty[index] = duty
+    _pwms[index].ChangeDutyCycle(duty)
+
+def add_motion_listener(callback):
+    """Call callback(timestamp, left_duty, right_duty) whenever wheel speeds change.
+
+    Duties are signed (-100..100, negative is backward), averaged per side,
+    and reflect the ramp as it happens. Callbacks run with the motor state
+    lock held, so they must be quick and must not call back into this module.
+    """
+    with _state_lock:
+        _motion_listeners.append(callback)
+
+def remove_motion_listener(callback):
+    with _state_lock:
+        if callback in _motion_listeners:
+            _motion_listeners.remove(callback)
+
+def _side_duties():
+    # Caller holds _state_lock
+    left = sum(_directions[i] * _duty[i] for i in LEFT_MOTORS) / len(LEFT_MOTORS)
+    right = sum(_directions[i] * _duty[i] for i in RIGHT_MOTORS) / len(RIGHT_MOTORS)
+    return left, right
+
+def wheel_speeds():
+    """(left, right) duty cycles applied right now, as motion listeners get them"""
+    with _state_lock:
+        return _side_duties()
+
+def _notify_motion():
+    # Caller holds _state_lock
+    if not _motion_listeners:
+        return
+    now = time.monotonic()
+    left, right = _side_duties()
+    for callback in _motion_listeners:
+        try:
+            callback(now, left, right)
+        except Exception as e:
+            logging.error(f"Error in motion listener: {str(e)}")
+
+def _apply(directions, left_duty=0.0, right_duty=0.0):
+    """Move every motor to its target direction and speed.
+
+    Direction pins go out in one batched GPIO.output call, writing only the
+    pins whose level actually changes. Slowing down is immediate; speeding
+    up is handed to the ramp thread.
+    """
+    global gpio_writes, pins_written
+    setup()
+    with _state_lock:
+        targets = [left_duty if i in LEFT_MOTORS else right_duty for i in range(len(MOTOR_PINS))]
+        pins, levels = [], []
+        for i, ((IN1, IN2), direction) in enumerate(zip(MOTOR_PINS, directions)):
+            if direction == 0:
+                targets[i] = 0.0
+            if direction != _directions[i] and _duty[i]:
+                _set_duty(i, 0.0)  # Never reverse a motor under power
+            for pin, level in zip((IN1, IN2), _LEVELS[direction]):
+                if _pin_levels.get(pin) != level:
+                    pins.append(pin)
+                    levels.append(level)
+        if pins:
+            GPIO.output(pins, levels)
+            _pin_levels.update(zip(pins, levels))
+            gpio_writes += 1
+            pins_written += len(pins)
+        _directions[:] = directions
+        for i, target in enumerate(targets):
+            _target_duty[i] = target
+            if target < _duty[i]:
+                _set_duty(i, target)
+        _notify_motion()
+        _start_ramp()
+
+def _start_ramp():
+    # Caller holds _state_lock
+    global _ramp_thread
+    if _duty == _target_duty:
+        return
+    if _ramp_thread is None:
+        _ramp_thread = threading.Thread(target=_ramp_loop)
+        _ramp_thread.daemon = True
+        _ramp_thread.start()
+    _ramp_cond.notify()
+
+def _ramp_loop():
+    """Step duty cycles towards their targets so the motors accelerate smoothly"""
+    step = 100.0 * RAMP_INTERVAL / RAMP_TIME
+    with _ramp_cond:
+        while True:
+            if _duty == _target_duty:
+                _ramp_cond.wait()
+                continue
+            for i, target in enumerate(_target_duty):
+                if _duty[i] < target:
+                    _set_duty(i, min(_duty[i] + step, target))
+            _notify_motion()
+            _ramp_cond.wait(RAMP_INTERVAL)
+
+def gpio_stats():
+    """Counters for the direction-change GPIO writes"""
+    return {"gpio_writes": gpio_writes, "pins_written": pins_written}
+
+def motor_state():
+    """Current direction and duty cycle per motor"""
+    with _state_lock:
+        return {"directions": list(_directions), "duty": list(_duty), "target_duty": list(_target_duty)}
+
+def _hold(duration):
     if duration:
         time.sleep(duration)
         stop()
@@ -41,59 +207,52 @@ def forward(speed=None, duration=None):  # Keep speed param for compatibility bu
         time.sleep(2.0)  # Default duration of 2 seconds
         stop()
 
-def backward(speed=None, duration=None):  # Keep speed param for compatibility but don't use it
+# --- Movement Functions ---
+
+def forward(speed=None, duration=None, steer=0.0):
+    logging.info("Moving forward")
+    _apply(DIRECTION_TABLE['forward'], *side_speeds(speed, steer))
+    _hold(duration)
+
+def backward(speed=None, duration=None, steer=0.0):
     logging.info("Moving backward")
-    for (IN1, IN2) in [(M1_IN1, M1_IN2), (M2_IN1, M2_IN2), (M3_IN1, M3_IN2), (M4_IN1, M4_IN2)]:
-        GPIO.output(IN1, GPIO.LOW)
-        GPIO.output(IN2, GPIO.HIGH)
-    if duration:
-        time.sleep(duration)
-        stop()
-    else:
-        time.sleep(2.0)  # Default duration of 2 seconds
-        stop()
+    _apply(DIRECTION_TABLE['backward'], *side_speeds(speed, steer))
+    _hold(duration)
 
-def turn_left(speed=None, duration=None):  # Keep speed param for compatibility but don't use it
+def turn_left(speed=None, duration=None):
     logging.info("Turning left")
-    # Left motors backward, right motors forward
-    for (IN1, IN2) in [(M1_IN1, M1_IN2), (M3_IN1, M3_IN2)]:
-        GPIO.output(IN1, GPIO.LOW)
-        GPIO.output(IN2, GPIO.HIGH)
-    for (IN1, IN2) in [(M2_IN1, M2_IN2), (M4_IN1, M4_IN2)]:
-        GPIO.output(IN1, GPIO.HIGH)
-        GPIO.output(IN2, GPIO.LOW)
-    if duration:
-        time.sleep(duration)
-        stop()
-    else:
-        time.sleep(2.0)  # Default duration of 2 seconds
-        stop()
+    _apply(DIRECTION_TABLE['left'], *side_speeds(speed))
+    _hold(duration)
 
-def turn_right(speed=None, duration=None):  # Keep speed param for compatibility but don't use it
+def turn_right(speed=None, duration=None):
     logging.info("Turning right")
-    # Left motors forward, right motors backward
-    for (IN1, IN2) in [(M1_IN1, M1_IN2), (M3_IN1, M3_IN2)]:
-        GPIO.output(IN1, GPIO.HIGH)
-        GPIO.output(IN2, GPIO.LOW)
-    for (IN1, IN2) in [(M2_IN1, M2_IN2), (M4_IN1, M4_IN2)]:
-        GPIO.output(IN1, GPIO.LOW)
-        GPIO.output(IN2, GPIO.HIGH)
-    if duration:
-        time.sleep(duration)
-        stop()
-    else:
-        time.sleep(2.0)  # Default duration of 2 seconds
+    _apply(DIRECTION_TABLE['right'], *side_speeds(speed))
+    _hold(duration)
+
+def drive(direction, speed=None, steer=0.0):
+    """Start moving in direction and return immediately; call stop() to end the move."""
+    if direction == 'stop':
         stop()
+        return
+    logging.info(f"Driving {direction}")
+    _apply(DIRECTION_TABLE[direction], *side_speeds(speed, steer))
 
 def stop():
     logging.info("Stopping")
-    for (IN1, IN2) in [(M1_IN1, M1_IN2), (M2_IN1, M2_IN2), (M3_IN1, M3_IN2), (M4_IN1, M4_IN2)]:
-        GPIO.output(IN1, GPIO.LOW)
-        GPIO.output(IN2, GPIO.LOW)
+    _apply(DIRECTION_TABLE['stop'])
 
 def cleanup():
+    global _is_setup
+    if not _is_setup:
+        return
     stop()
-    GPIO.cleanup()
+    with _setup_lock:
+        for pwm in _pwms:
+            pwm.stop()
+        GPIO.cleanup()
+        with _state_lock:
+            _pin_levels.clear()
+        _is_setup = False
 
 # --- Test Block ---
 if __name__ == "__main__":
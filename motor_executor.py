@@ -0,0 +1,147 @@
+import time
+import threading
+import logging
+import itertools
+from collections import deque, OrderedDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION = 2.0  # Same default as the blocking motor_control functions
+
+class MotorCommand:
+    """One queued move and its lifecycle"""
+
+    def __init__(self, command_id, direction, speed=None, duration=None, preempt=True, steer=0.0):
+        self.id = command_id
+        self.direction = direction
+        self.speed = speed
+        self.steer = steer
+        self.duration = duration if duration else DEFAULT_DURATION
+        self.preempt = preempt
+        self.state = 'queued'  # queued -> running -> done / preempted / failed, or queued -> cancelled
+        self.started_at = None
+        self.finished_at = None
+        self.deadline = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "direction": self.direction,
+            "speed": self.speed,
+            "steer": self.steer,
+            "duration": self.duration,
+            "state": self.state,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+class MotorExecutor:
+    """Runs motor commands on one thread so callers never sleep through a move.
+
+    submit() returns a command id straight away. By default a new command
+    preempts whatever is running and drops anything still queued; pass
+    preempt=False to queue behind it instead. stop() always preempts.
+    """
+
+    def __init__(self, motor_control, tick=0.05, history=50, clock=time.monotonic):
+        self.motor_control = motor_control
+        self.tick = tick
+        self.history = history
+        self.clock = clock
+        self.running = False
+        self.executor_thread = None
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._current = None
+        self._commands = OrderedDict()  # id -> MotorCommand, most recent last
+        self._ids = itertools.count(1)
+
+    def start(self):
+        """Start the executor thread if not already running"""
+        if self.running:
+            return False
+        self.running = True
+        self.executor_thread = threading.Thread(target=self._run)
+        self.executor_thread.daemon = True
+        self.executor_thread.start()
+        return True
+
+    def shutdown(self):
+        """Stop the executor thread, then the motors"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.executor_thread:
+            self.executor_thread.join(timeout=1.0)
+        self.motor_control.stop()
+
+    def submit(self, direction, speed=None, duration=None, preempt=True, steer=0.0):
+        """Queue a move and return its command id without waiting"""
+        with self._cond:
+            command = MotorCommand(next(self._ids), direction, speed, duration, preempt, steer)
+            self._commands[command.id] = command
+            while len(self._commands) > self.history:
+                self._commands.popitem(last=False)
+            if preempt:
+                while self._pending:
+                    self._pending.popleft().state = 'cancelled'
+            self._pending.append(command)
+            self._cond.notify_all()
+            return command.id
+
+    def stop(self):
+        """Preempt everything and stop the motors"""
+        return self.submit('stop', duration=0)
+
+    def status(self, command_id=None):
+        """Return a dict for command_id, or for the running command if None"""
+        with self._cond:
+            if command_id is None:
+                command = self._current
+            else:
+                command = self._commands.get(command_id)
+            return command.to_dict() if command else None
+
+    def _run(self):
+        with self._cond:
+            while self.running:
+                now = self.clock()
+                current = self._current
+                if current is not None and now >= current.deadline:
+                    self.motor_control.stop()
+                    self._finish(current, 'done', now)
+                    current = None
+                if self._pending and (current is None or self._pending[0].preempt):
+                    command = self._pending.popleft()
+                    if current is not None:
+                        self._finish(current, 'preempted', now)
+                    self._begin(command, now)
+                    continue
+                timeout = None
+                if self._current is not None:
+                    timeout = min(self.tick, max(self._current.deadline - now, 0))
+                self._cond.wait(timeout)
+
+    def _begin(self, command, now):
+        command.state = 'running'
+        command.started_at = now
+        try:
+            self.motor_control.drive(command.direction, command.speed, command.steer)
+        except Exception as e:
+            logger.error(f"Error running motor command {command.id}: {str(e)}")
+            self.motor_control.stop()
+            self._finish(command, 'failed', now)
+            return
+        if command.direction == 'stop':
+            self._finish(command, 'done', now)
+            return
+        command.deadline = now + command.duration
+        self._current = command
+
+    def _finish(self, command, state, now):
+        command.state = state
+        command.finished_at = now
+        if self._current is command:
+            self._current = None
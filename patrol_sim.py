@@ -0,0 +1,404 @@
+import math
+import time
+import random
+import argparse
+import logging
+import numpy as np
+from config import Config
+from coverage_map import CoverageMap
+from pose import PoseTracker
+from smart_patrol import SmartPatrol, PatrolState, OBSTACLE_RANGE
+from motor_control import DIRECTION_TABLE, side_speeds
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CELL_SIZE = 0.25  # Metres per floor plan character
+ROBOT_RADIUS = 0.12  # Metres
+ULTRASONIC_RANGE = 4.0  # Metres
+PHYSICS_STEP = 0.02  # Longest single integration step, seconds
+
+class SimClock:
+    """Virtual time for the simulator.
+
+    Pass the clock as ``clock`` and its sleep() as ``sleep`` wherever the
+    real code takes them. sleep() returns at once after moving time on and
+    stepping every callback registered with on_advance(), so a patrol runs
+    as fast as the CPU allows.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self._callbacks = []
+
+    def __call__(self):
+        return self.now
+
+    def on_advance(self, callback):
+        """Call callback(start, end) every time the clock moves on"""
+        self._callbacks.append(callback)
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        start = self.now
+        self.now += seconds
+        for callback in self._callbacks:
+            callback(start, self.now)
+
+class FloorPlan:
+    """Walls and obstacles from a text grid, one character per cell.
+
+    ``#`` is a wall, ``R`` the robot's start cell (facing east) and any
+    other character free floor. x runs east along a row and y north up the
+    file; everything outside the grid counts as wall.
+    """
+
+    def __init__(self, lines, cell_size=CELL_SIZE):
+        lines = [line.rstrip('\n') for line in lines if line.strip()]
+        if not lines:
+            raise ValueError("Floor plan is empty")
+        width = max(len(line) for line in lines)
+        self.cell_size = cell_size
+        self.rows = len(lines)
+        self.cols = width
+        self.walls = np.zeros((self.rows, self.cols), dtype=bool)
+        self.start = None
+        for row, line in enumerate(lines):
+            for col, char in enumerate(line.ljust(width)):
+                if char == '#':
+                    self.walls[row, col] = True
+                elif char == 'R':
+                    self.start = self.centre(row, col)
+        self._wall_rows = self.walls.tolist()  # Plain lists index faster per point
+        if self.start is None:
+            free = np.argwhere(~self.walls)
+            if not len(free):
+                raise ValueError("Floor plan has no free cells")
+            self.start = self.centre(*free[0])
+
+    @classmethod
+    def from_text(cls, text, cell_size=CELL_SIZE):
+        return cls(text.splitlines(), cell_size)
+
+    @classmethod
+    def load(cls, path, cell_size=CELL_SIZE):
+        with open(path) as f:
+            return cls(f.readlines(), cell_size)
+
+    def centre(self, row, col):
+        """World (x, y) of the centre of cell (row, col)"""
+        return (col + 0.5) * self.cell_size, (self.rows - row - 0.5) * self.cell_size
+
+    def cell(self, x, y):
+        """(row, col) holding world point (x, y); may lie off the grid"""
+        return self.rows - 1 - int(math.floor(y / self.cell_size)), int(math.floor(x / self.cell_size))
+
+    def blocked(self, x, y):
+        row = self.rows - 1 - int(math.floor(y / self.cell_size))
+        col = int(math.floor(x / self.cell_size))
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self._wall_rows[row][col]
+        return True
+
+    def distance(self, x, y, heading, max_range):
+        """Distance from (x, y) to the first wall along heading, or None beyond max_range.
+
+        Walks the grid cell by cell along the ray, so a long ultrasonic
+        reading costs one step per cell crossed.
+        """
+        size = self.cell_size
+        dx, dy = math.cos(heading), math.sin(heading)
+        col = int(math.floor(x / size))
+        row = int(math.floor(y / size))  # Counted up from the bottom edge here
+        step_col = 1 if dx > 0 else -1
+        step_row = 1 if dy > 0 else -1
+        next_x = ((col + (dx > 0)) * size - x) / dx if abs(dx) > 1e-12 else math.inf
+        next_y = ((row + (dy > 0)) * size - y) / dy if abs(dy) > 1e-12 else math.inf
+        delta_x = size / abs(dx) if abs(dx) > 1e-12 else math.inf
+        delta_y = size / abs(dy) if abs(dy) > 1e-12 else math.inf
+        walls, rows, cols = self._wall_rows, self.rows, self.cols
+        while True:
+            if next_x < next_y:
+                t = next_x
+                next_x += delta_x
+                col += step_col
+            else:
+                t = next_y
+                next_y += delta_y
+                row += step_row
+            if t > max_range:
+                return None
+            r = rows - 1 - row
+            if not (0 <= r < rows and 0 <= col < cols) or walls[r][col]:
+                return t
+
+    def free_cells(self):
+        return int(np.count_nonzero(~self.walls))
+
+class SimMotors:
+    """Stands in for the motor_control module by moving a virtual robot.
+
+    drive()/stop(), the timed moves and add_motion_listener() behave like
+    motor_control's, except that speed changes are instant and the timed
+    moves wait on the simulator clock. The robot's true speed differs from
+    the commanded one by ``slip`` (relative, Gaussian) so dead reckoning
+    drifts as it does on carpet. A move into a wall leaves the robot where
+    it is, or slides it along the wall when only one axis is blocked, and
+    counts one collision per contact.
+    """
+
+    def __init__(self, floor, clock, speed=None, turn_rate=None, radius=ROBOT_RADIUS, slip=0.05,
+                 rng=None):
+        self.floor = floor
+        self.clock = clock
+        self.speed = Config.POSE_SPEED if speed is None else speed
+        self.turn_rate = Config.POSE_TURN_RATE if turn_rate is None else turn_rate
+        self.radius = radius
+        self.slip = slip
+        self.rng = rng or random.Random()
+        self.x, self.y = floor.start
+        self.heading = 0.0
+        self.left = 0.0  # Signed duty cycles, -100 to 100
+        self.right = 0.0
+        self.collisions = 0
+        self.in_contact = False
+        self.wedged_time = 0.0  # Seconds spent pushing into a wall without moving
+        self.distance = 0.0
+        self._rim = [(radius * math.cos(a), radius * math.sin(a)) for a in np.arange(0.0, 2 * math.pi, math.pi / 4)]
+        self._listeners = []
+        clock.on_advance(self._advance)
+
+    def add_motion_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_motion_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def wheel_speeds(self):
+        return self.left, self.right
+
+    def _set(self, left, right):
+        if (left, right) == (self.left, self.right):
+            return
+        self.left, self.right = left, right
+        for callback in self._listeners:
+            callback(self.clock(), left, right)
+
+    def drive(self, direction, speed=None, steer=0.0):
+        if direction == 'stop':
+            self.stop()
+            return
+        directions = DIRECTION_TABLE[direction]
+        left, right = side_speeds(speed, steer)
+        self._set(directions[0] * left, directions[1] * right)
+
+    def stop(self):
+        self._set(0.0, 0.0)
+
+    def _hold(self, duration):
+        self.clock.sleep(duration or 2.0)
+        self.stop()
+
+    def forward(self, speed=None, duration=None, steer=0.0):
+        self.drive('forward', speed, steer)
+        self._hold(duration)
+
+    def backward(self, speed=None, duration=None, steer=0.0):
+        self.drive('backward', speed, steer)
+        self._hold(duration)
+
+    def turn_left(self, speed=None, duration=None):
+        self.drive('left', speed)
+        self._hold(duration)
+
+    def turn_right(self, speed=None, duration=None):
+        self.drive('right', speed)
+        self._hold(duration)
+
+    def _advance(self, start, end):
+        if not self.left and not self.right:
+            return
+        factor = 1.0 + self.rng.gauss(0.0, self.slip) if self.slip else 1.0
+        v = factor * self.speed * (self.left + self.right) / 200.0
+        w = factor * self.turn_rate * (self.right - self.left) / 200.0
+        steps = max(int(math.ceil((end - start) / PHYSICS_STEP)), 1)
+        dt = (end - start) / steps
+        for _ in range(steps):
+            self.heading += w * dt
+            if not v:
+                continue
+            x = self.x + v * dt * math.cos(self.heading)
+            y = self.y + v * dt * math.sin(self.heading)
+            if self._touches_wall(x, y):
+                if not self.in_contact:
+                    self.collisions += 1
+                    self.in_contact = True
+                # Slide along the wall if only one axis is blocked
+                if x != self.x and not self._touches_wall(x, self.y):
+                    y = self.y
+                elif y != self.y and not self._touches_wall(self.x, y):
+                    x = self.x
+                else:
+                    self.wedged_time += dt
+                    continue
+            else:
+                self.in_contact = False
+            self.distance += math.hypot(x - self.x, y - self.y)
+            self.x, self.y = x, y
+        self.heading = math.atan2(math.sin(self.heading), math.cos(self.heading))
+
+    def _touches_wall(self, x, y):
+        blocked = self.floor.blocked
+        return any(blocked(x + dx, y + dy) for dx, dy in self._rim)
+
+class SimSensors:
+    """read_sensors() for the virtual robot.
+
+    IR sensors look straight ahead and ``ir_angle`` to either side and
+    trigger within ``ir_range`` of the robot's edge. ``distance`` is the
+    ultrasonic reading in cm, and ``center`` is also set below 30 cm as
+    app.py does.
+    """
+
+    def __init__(self, floor, robot, ir_range=OBSTACLE_RANGE, ir_angle=math.pi / 4,
+                 ultrasonic_range=ULTRASONIC_RANGE):
+        self.floor = floor
+        self.robot = robot
+        self.ir_range = ir_range
+        self.ir_angle = ir_angle
+        self.ultrasonic_range = ultrasonic_range
+        self.reads = 0
+
+    def _sees(self, offset):
+        r = self.robot
+        return self.floor.distance(r.x, r.y, r.heading + offset, r.radius + self.ir_range) is not None
+
+    def read(self):
+        self.reads += 1
+        r = self.robot
+        distance = self.floor.distance(r.x, r.y, r.heading, r.radius + self.ultrasonic_range)
+        distance_cm = None if distance is None else max(distance - r.radius, 0.0) * 100.0
+        return {
+            'left': self._sees(self.ir_angle),
+            'center': self._sees(0.0) or (distance_cm is not None and distance_cm < 30),
+            'right': self._sees(-self.ir_angle),
+            'distance': distance_cm
+        }
+
+class NoCoveragePatrol(SmartPatrol):
+    """SmartPatrol turning on sensors and turn history only, ignoring the coverage map"""
+
+    def _coverage_turn(self):
+        return None
+
+STRATEGIES = {
+    'smart': SmartPatrol,
+    'no_coverage': NoCoveragePatrol
+}
+
+class Simulation:
+    """One patrol strategy on one floor plan, run on virtual time.
+
+    ``strategy`` is SmartPatrol or anything built like it. The patrol runs
+    its real fixed-rate loop in the calling thread; run() ends it once the
+    virtual clock passes the requested duration.
+    """
+
+    def __init__(self, floor, strategy=SmartPatrol, seed=0, slip=0.05, tick=None):
+        self.floor = floor
+        self.clock = SimClock()
+        rng = random.Random(seed)
+        self.robot = SimMotors(floor, self.clock, slip=slip, rng=random.Random(rng.random()))
+        self.sensors = SimSensors(floor, self.robot)
+        self.pose_tracker = PoseTracker(clock=self.clock)
+        self.robot.add_motion_listener(self.pose_tracker.on_motion)
+        options = {} if tick is None else {'tick': tick}
+        self.patrol = strategy(self.robot, self.sensors.read, coverage_map=CoverageMap(clock=self.clock),
+                               pose_tracker=self.pose_tracker, clock=self.clock, sleep=self.clock.sleep,
+                               rng=random.Random(rng.random()), **options)
+        self.visited = np.zeros_like(floor.walls)
+        self.stuck_events = 0
+        self.sim_time = 0.0
+        self.wall_time = 0.0
+        self._state = self.patrol.state
+        self._end = None
+        self.clock.on_advance(self._observe)
+
+    def _observe(self, start, end):
+        row, col = self.floor.cell(self.robot.x, self.robot.y)
+        if 0 <= row < self.floor.rows and 0 <= col < self.floor.cols:
+            self.visited[row, col] = True
+        state = self.patrol.state
+        if state != self._state and state == PatrolState.ESCAPING:
+            self.stuck_events += 1
+        self._state = state
+        if self._end is not None and end >= self._end:
+            self.patrol.is_patrolling = False
+
+    def run(self, duration):
+        """Patrol for duration virtual seconds and return metrics()"""
+        started = time.perf_counter()
+        start = self.clock()
+        self._end = start + duration
+        self.patrol.coverage_map.start_session()
+        self.patrol.is_patrolling = True
+        self.patrol._patrol_loop()
+        self.patrol.stop_patrol()
+        self.sim_time += self.clock() - start
+        self.wall_time += time.perf_counter() - started
+        return self.metrics()
+
+    def metrics(self):
+        x0, y0 = self.floor.start
+        px, py, _ = self.pose_tracker.pose()
+        visited = int(np.count_nonzero(self.visited))
+        return {
+            "sim_seconds": self.sim_time,
+            "wall_seconds": self.wall_time,
+            "speedup": self.sim_time / self.wall_time if self.wall_time else None,
+            "coverage": visited / self.floor.free_cells(),
+            "area_covered_m2": visited * self.floor.cell_size ** 2,
+            "collisions": self.robot.collisions,
+            "wedged_seconds": self.robot.wedged_time,
+            "stuck_events": self.stuck_events,
+            "distance_m": self.robot.distance,
+            "pose_error_m": math.hypot(self.robot.x - x0 - px, self.robot.y - y0 - py),
+            "ticks": self.patrol.ticks
+        }
+
+def compare(floor, strategies, duration, seeds=(0,), **options):
+    """Run each strategy once per seed; return {name: [metrics per seed]}"""
+    return {name: [Simulation(floor, strategy, seed=seed, **options).run(duration) for seed in seeds]
+            for name, strategy in strategies.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SmartPatrol strategies on a simulated floor plan")
+    parser.add_argument('floor_plan', help="Text grid: '#' wall, 'R' start, anything else free")
+    parser.add_argument('--hours', type=float, default=1.0, help="Virtual patrol time per run")
+    parser.add_argument('--strategy', action='append', choices=sorted(STRATEGIES),
+                        help="Strategy to run; repeat to compare (default: all)")
+    parser.add_argument('--seeds', type=int, default=1, help="Runs per strategy, seeded 0..N-1")
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE)
+    parser.add_argument('--slip', type=float, default=0.05, help="Relative wheel slip")
+    args = parser.parse_args(argv)
+
+    # Per-obstacle patrol logging would dominate an accelerated run
+    logging.getLogger('smart_patrol').setLevel(logging.WARNING)
+    floor = FloorPlan.load(args.floor_plan, args.cell_size)
+    names = args.strategy or sorted(STRATEGIES)
+    results = compare(floor, {name: STRATEGIES[name] for name in names}, args.hours * 3600.0,
+                      seeds=range(args.seeds), slip=args.slip)
+
+    columns = ("coverage", "collisions", "wedged_seconds", "stuck_events", "distance_m", "pose_error_m",
+               "speedup")
+    print(f"{'strategy':<14}" + "".join(f"{c:>16}" for c in columns))
+    for name, runs in results.items():
+        means = [sum(run[c] for run in runs) / len(runs) for c in columns]
+        print(f"{name:<14}" + "".join(f"{m:>16.2f}" for m in means))
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+import os
+import math
+import time
+import zlib
+import struct
+import random
+import argparse
+import logging
+import threading
+from collections import deque, namedtuple
+import numpy as np
+from coverage_map import CoverageMap
+from pose import PoseTracker
+from smart_patrol import SmartPatrol
+from patrol_sim import SimClock
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WZTR'
+VERSION = 1
+
+# Header: magic, version, RNG seed, starting pose (x, y, heading), coverage grid
+# size in cells and resolution, then the zlib-compressed visit and obstacle grids
+HEADER = struct.Struct('<4sHQdddIdI')
+
+# Records: a type byte, a timestamp, then the payload
+SENSORS = struct.Struct('<BdBf')  # Sensor flag bits, ultrasonic distance (NaN if none)
+MOTOR = struct.Struct('<BdBff')  # Direction code, speed (NaN for the default), steer
+WHEELS = struct.Struct('<Bdff')  # Executed left and right duty cycles
+END = struct.Struct('<Bd')  # Patrol stopped
+SENSOR_TYPE, MOTOR_TYPE, WHEELS_TYPE, END_TYPE = b'S'[0], b'M'[0], b'W'[0], b'E'[0]
+RECORDS = {SENSOR_TYPE: SENSORS, MOTOR_TYPE: MOTOR, WHEELS_TYPE: WHEELS, END_TYPE: END}
+
+SENSOR_KEYS = ('left', 'center', 'right', 'ir')  # One bit each, plus a presence bit for 'ir'
+HAS_IR, HAS_DISTANCE = 0x10, 0x20
+DIRECTIONS = ('stop', 'forward', 'backward', 'left', 'right')
+
+SensorReading = namedtuple('SensorReading', 'timestamp sensors')
+MotorCommand = namedtuple('MotorCommand', 'timestamp direction speed steer')
+WheelSpeeds = namedtuple('WheelSpeeds', 'timestamp left right')
+PatrolEnd = namedtuple('PatrolEnd', 'timestamp')
+Trace = namedtuple('Trace', 'seed pose grid_cells resolution visits obstacles records')
+
+def _float32(value):
+    """value as it reads back from the trace, so live and replayed commands compare equal"""
+    return struct.unpack('<f', struct.pack('<f', value))[0]
+
+def _command(direction, speed, steer):
+    return (direction, None if speed is None else _float32(speed), _float32(steer))
+
+class RecordingMotors:
+    """motor_control proxy that logs drive() and stop() to a TraceRecorder.
+
+    Everything else, including add_motion_listener(), goes straight to the
+    real motor_control.
+    """
+
+    def __init__(self, recorder, motor_control):
+        self._recorder = recorder
+        self._motor_control = motor_control
+
+    def drive(self, direction, speed=None, steer=0.0):
+        self._recorder.record_command(direction, speed, steer)
+        self._motor_control.drive(direction, speed=speed, steer=steer)
+
+    def stop(self):
+        self._recorder.record_command('stop', None, 0.0)
+        self._motor_control.stop()
+
+    def __getattr__(self, name):
+        return getattr(self._motor_control, name)
+
+class TraceRecorder:
+    """Logs what SmartPatrol sees and does, one binary trace file per patrol.
+
+    Build the patrol on ``recorder.motors`` and ``recorder.read_sensors``;
+    they pass through unchanged while no trace is open. start() opens a
+    trace, snapshots the patrol's pose, coverage map and wheel speeds into it
+    and reseeds the patrol's RNG with a seed stored in the header, so
+    replay() can redo every decision. Records are 9 to 19 bytes; an hour of patrol at 20 Hz
+    takes about 1 MB.
+    """
+
+    def __init__(self, motor_control, read_sensors, directory='traces', clock=time.monotonic):
+        self._read_sensors = read_sensors
+        self.directory = directory
+        self.clock = clock
+        self._motor_control = motor_control
+        self.motors = RecordingMotors(self, motor_control)
+        self.path = None
+        self.records = 0
+        self._patrol = None
+        self._file = None
+        self._lock = threading.Lock()
+        motor_control.add_motion_listener(self._on_motion)
+
+    @property
+    def recording(self):
+        return self._file is not None
+
+    def start(self, patrol, path=None, seed=None):
+        """Open a trace for the patrol that is about to start; returns its path"""
+        if path is None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, time.strftime('patrol-%Y%m%d-%H%M%S.trace'))
+        seed = random.getrandbits(64) if seed is None else seed
+        patrol.rng.seed(seed)
+        x, y, heading = patrol.pose
+        grid = patrol.coverage_map
+        grids = grid.grid()
+        blob = zlib.compress(np.asarray(grids['visits'], dtype=np.int32).tobytes() +
+                             np.asarray(grids['obstacles'], dtype=np.int32).tobytes())
+        # Read outside self._lock: motion listeners take it with the motor lock held
+        left, right = self._motor_control.wheel_speeds()
+        self.stop()
+        with self._lock:
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, seed, x, y, heading, grid.cells, grid.resolution,
+                                         len(blob)))
+            self._file.write(blob)
+            # The wheels may already be turning; replay starts the pose from these
+            self._file.write(WHEELS.pack(WHEELS_TYPE, self.clock(), left, right))
+            self.path = path
+            self.records = 0
+            self._patrol = patrol
+        logger.info(f"Recording patrol trace to {path}")
+        return path
+
+    def stop(self):
+        """Mark the end of the patrol and close the trace"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(END.pack(END_TYPE, self.clock()))
+            self._file.close()
+            self._file = None
+        logger.info(f"Patrol trace closed after {self.records} records")
+
+    def _write(self, record, *values):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(record.pack(*values))
+                self.records += 1
+
+    def read_sensors(self):
+        """read_sensors() wrapper logging each result.
+
+        Readings are stamped with the patrol's tick time, not the time the
+        read returned, since that is the time the tick's decisions use.
+        """
+        sensors = self._read_sensors()
+        if self._file is not None:
+            timestamp = self._patrol.tick_time
+            if timestamp is None:
+                timestamp = self.clock()
+            flags = 0
+            for bit, key in enumerate(SENSOR_KEYS):
+                if sensors.get(key):
+                    flags |= 1 << bit
+            if 'ir' in sensors:
+                flags |= HAS_IR
+            distance = sensors.get('distance')
+            if distance is not None:
+                flags |= HAS_DISTANCE
+            self._write(SENSORS, SENSOR_TYPE, timestamp, flags,
+                        math.nan if distance is None else distance)
+        return sensors
+
+    def record_command(self, direction, speed, steer):
+        self._write(MOTOR, MOTOR_TYPE, self.clock(), DIRECTIONS.index(direction),
+                    math.nan if speed is None else speed, steer)
+
+    def _on_motion(self, timestamp, left, right):
+        self._write(WHEELS, WHEELS_TYPE, timestamp, left, right)
+
+def read_trace(path):
+    """Parse a trace file into a Trace"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, x, y, heading, cells, resolution, blob_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} patrol trace")
+    offset = HEADER.size
+    grids = np.frombuffer(zlib.decompress(data[offset:offset + blob_size]), dtype=np.int32)
+    grids = grids.reshape(2, cells, cells)
+    offset += blob_size
+    records = []
+    while offset < len(data):
+        record = RECORDS.get(data[offset])
+        if record is None:
+            raise ValueError(f"Corrupt trace record at byte {offset} of {path}")
+        if offset + record.size > len(data):
+            logger.warning(f"{path} ends in a partial record")  # Recorder was killed mid-write
+            break
+        values = record.unpack_from(data, offset)
+        offset += record.size
+        if record is SENSORS:
+            _, timestamp, flags, distance = values
+            sensors = {key: bool(flags & (1 << bit)) for bit, key in enumerate(SENSOR_KEYS[:3])}
+            if flags & HAS_IR:
+                sensors['ir'] = bool(flags & (1 << 3))
+            if flags & HAS_DISTANCE:
+                sensors['distance'] = distance
+            records.append(SensorReading(timestamp, sensors))
+        elif record is MOTOR:
+            _, timestamp, code, speed, steer = values
+            records.append(MotorCommand(timestamp, DIRECTIONS[code], None if math.isnan(speed) else speed, steer))
+        elif record is WHEELS:
+            records.append(WheelSpeeds(*values[1:]))
+        else:
+            records.append(PatrolEnd(values[1]))
+    return Trace(seed, (x, y, heading), cells, resolution, grids[0].copy(), grids[1].copy(), records)
+
+class ReplayMotors:
+    """motor_control stand-in for replay: collects commands instead of moving anything"""
+
+    def __init__(self):
+        self.tick = -1  # Index of the sensor reading the current commands follow
+        self.commands = []
+
+    def drive(self, direction, speed=None, steer=0.0):
+        self.commands.append((self.tick,) + _command(direction, speed, steer))
+
+    def stop(self):
+        self.commands.append((self.tick,) + _command('stop', None, 0.0))
+
+    def add_motion_listener(self, callback):
+        pass  # Wheel speeds come from the trace
+
+    def remove_motion_listener(self, callback):
+        pass
+
+def replay(trace, strategy=SmartPatrol):
+    """Feed a trace through a fresh patrol on a virtual clock.
+
+    trace is a path or a Trace. Each sensor reading is replayed as one
+    tick at its recorded time, and recorded wheel speeds drive the pose
+    tracker, so the patrol makes the same decisions it made live. Returns
+    the replayed commands, the recorded ones, the index of the first
+    command where they differ (None if they all match) and the final pose.
+    """
+    if not isinstance(trace, Trace):
+        trace = read_trace(trace)
+    records = trace.records
+    clock = SimClock(records[0].timestamp if records else 0.0)
+    pose_tracker = PoseTracker(clock=clock)
+    pose_tracker.reset(*trace.pose)
+    coverage_map = CoverageMap(size=trace.grid_cells * trace.resolution, resolution=trace.resolution,
+                               clock=clock)
+    coverage_map.visits[:] = trace.visits
+    coverage_map.obstacles[:] = trace.obstacles
+    coverage_map.start_session()
+    motors = ReplayMotors()
+    readings = deque()
+    patrol = strategy(motors, readings.popleft, coverage_map=coverage_map, pose_tracker=pose_tracker,
+                      clock=clock, sleep=clock.sleep, rng=random.Random(trace.seed))
+    patrol.is_patrolling = True
+
+    # Wheel changes are applied by timestamp: the ramp thread can log one
+    # after a tick that ran later than it
+    wheels = deque(sorted((record for record in records if isinstance(record, WheelSpeeds)),
+                          key=lambda record: record.timestamp))
+    recorded = []
+    started = time.perf_counter()
+    for record in records:
+        if isinstance(record, (SensorReading, PatrolEnd)):
+            while wheels and wheels[0].timestamp <= record.timestamp:
+                wheel = wheels.popleft()
+                pose_tracker.on_motion(wheel.timestamp, wheel.left, wheel.right)
+            clock.now = record.timestamp
+        if isinstance(record, SensorReading):
+            motors.tick += 1
+            readings.append(record.sensors)
+            patrol.tick()
+        elif isinstance(record, MotorCommand):
+            recorded.append((motors.tick,) + _command(record.direction, record.speed, record.steer))
+        elif isinstance(record, PatrolEnd):
+            patrol.stop_patrol()
+    elapsed = time.perf_counter() - started
+
+    mismatch = next((i for i, (a, b) in enumerate(zip(motors.commands, recorded)) if a != b), None)
+    if mismatch is None and len(motors.commands) != len(recorded):
+        mismatch = min(len(motors.commands), len(recorded))
+    return {
+        "ticks": motors.tick + 1,
+        "commands": motors.commands,
+        "recorded_commands": recorded,
+        "first_mismatch": mismatch,
+        "pose": pose_tracker.pose(),
+        "wall_seconds": elapsed,
+        "ticks_per_second": (motors.tick + 1) / elapsed if elapsed else None
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded patrol trace through SmartPatrol")
+    parser.add_argument('trace')
+    parser.add_argument('--profile', action='store_true', help="Profile the replay with cProfile")
+    args = parser.parse_args(argv)
+
+    trace = read_trace(args.trace)
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        result = profiler.runcall(replay, trace)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    else:
+        result = replay(trace)
+    logger.info(f"Replayed {result['ticks']} ticks in {result['wall_seconds']:.3f} s")
+    mismatch = result["first_mismatch"]
+    if mismatch is None:
+        logger.info(f"All {len(result['commands'])} motor commands match the recording")
+    else:
+        replayed = result["commands"][mismatch:mismatch + 1]
+        recorded = result["recorded_commands"][mismatch:mismatch + 1]
+        logger.warning(f"Command {mismatch} differs: replayed {replayed}, recorded {recorded}")
+    return result
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import math
+import time
+import threading
+import logging
+import numpy as np
+from config import Config
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PoseTracker:
+    """Dead-reckoning pose (x, y, heading) with covariance from motor commands.
+
+    Register on_motion with motor_control.add_motion_listener(); every
+    executed speed change, including each ramp step and the final stop,
+    arrives with its real timestamp. Between changes the wheel speeds are
+    constant, so the pose is integrated exactly along the arc they describe.
+
+    ``speed`` is the calibrated ground speed in m/s at 100% duty going
+    straight, ``turn_rate`` the spin rate in rad/s at 100% duty turning on
+    the spot. Position uncertainty grows with ``speed_noise`` per metre
+    driven and heading uncertainty with ``turn_noise`` per radian turned.
+    update() can run at control-loop rate: the covariance update works in
+    preallocated arrays.
+    """
+
+    def __init__(self, speed=None, turn_rate=None, speed_noise=0.05, turn_noise=0.1,
+                 clock=time.monotonic):
+        self.speed = Config.POSE_SPEED if speed is None else speed
+        self.turn_rate = Config.POSE_TURN_RATE if turn_rate is None else turn_rate
+        self.speed_noise = speed_noise
+        self.turn_noise = turn_noise
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.distance = 0.0  # Metres driven in total
+        self._v = 0.0  # Current linear speed, m/s
+        self._w = 0.0  # Current turn rate, rad/s (positive is left)
+        self._last_time = None
+        self.covariance = np.zeros((3, 3))
+        self._jacobian = np.eye(3)
+        self._jacobian_t = self._jacobian.T  # View; follows the Jacobian's values
+        self._scratch = np.empty((3, 3))
+
+    def on_motion(self, timestamp, left_duty, right_duty):
+        """Motor listener: integrate up to timestamp, then switch wheel speeds"""
+        with self._lock:
+            self._integrate(timestamp)
+            self._v = self.speed * (left_duty + right_duty) / 200.0
+            self._w = self.turn_rate * (right_duty - left_duty) / 200.0
+
+    def update(self, now=None):
+        """Integrate the current motion up to now"""
+        with self._lock:
+            self._integrate(self.clock() if now is None else now)
+
+    def _integrate(self, now):
+        # Caller holds _lock
+        last = self._last_time
+        if last is not None and now <= last:
+            return
+        self._last_time = now
+        if last is None:
+            return
+        v, w = self._v, self._w
+        if not v and not w:
+            return
+        dt = now - last
+        heading = self.heading
+        if abs(w) < 1e-9:
+            dx = v * dt * math.cos(heading)
+            dy = v * dt * math.sin(heading)
+        else:
+            radius = v / w
+            dx = radius * (math.sin(heading + w * dt) - math.sin(heading))
+            dy = -radius * (math.cos(heading + w * dt) - math.cos(heading))
+
+        # Propagate P = F P F^T + Q, F being the motion Jacobian in the state
+        self._jacobian[0, 2] = -dy
+        self._jacobian[1, 2] = dx
+        P = self.covariance
+        np.matmul(self._jacobian, P, out=self._scratch)
+        np.matmul(self._scratch, self._jacobian_t, out=P)
+        travelled = abs(v) * dt
+        var_d = (self.speed_noise * travelled) ** 2
+        c, s = math.cos(heading), math.sin(heading)
+        P[0, 0] += var_d * c * c
+        P[1, 1] += var_d * s * s
+        P[0, 1] += var_d * c * s
+        P[1, 0] += var_d * c * s
+        P[2, 2] += (self.turn_noise * abs(w) * dt) ** 2
+
+        self.x += dx
+        self.y += dy
+        heading += w * dt
+        self.heading = math.atan2(math.sin(heading), math.cos(heading))
+        self.distance += travelled
+
+    def pose(self, now=None):
+        """Return (x, y, heading) integrated up to now"""
+        with self._lock:
+            self._integrate(self.clock() if now is None else now)
+            return self.x, self.y, self.heading
+
+    @property
+    def moving(self):
+        return bool(self._v or self._w)
+
+    def reset(self, x=0.0, y=0.0, heading=0.0):
+        """Set the pose, e.g. when the robot is placed at a known spot"""
+        with self._lock:
+            self.x, self.y, self.heading = x, y, heading
+            self.covariance.fill(0.0)
+            self._last_time = self.clock()
+
+    def to_dict(self):
+        with self._lock:
+            self._integrate(self.clock())
+            return {
+                "x": self.x,
+                "y": self.y,
+                "heading": self.heading,
+                "covariance": self.covariance.tolist(),
+                "distance": self.distance
+            }
@@ -0,0 +1,151 @@
+import time
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BOX_COLOR = (0, 255, 0)
+
+# Recognizer installed in the worker process by _init_process
+_process_recognize = None
+
+def _init_process(recognize):
+    global _process_recognize
+    _process_recognize = recognize
+
+def _recognize_in_process(frame):
+    return _process_recognize(frame)
+
+class RecognitionWorker:
+    """Runs face recognition off the streaming path on the newest captured frame.
+
+    The worker waits on the FrameBroadcaster like a viewer does, so whenever
+    recognition is slower than the camera it simply skips to the latest frame
+    instead of queueing a backlog. Streams call latest() and overlay whatever
+    was published last without ever waiting for recognition.
+
+    In 'process' mode ``recognize`` runs in a single-worker process pool so
+    dlib work doesn't hold the GIL the stream and Flask threads need; it is
+    pickled once into the worker process, so it must be a module-level
+    function or a functools.partial of one.
+
+    ``gate`` (e.g. MotionDetector.active) is checked before each frame;
+    while it returns False no recognition runs and the overlay is cleared.
+    """
+
+    def __init__(self, broadcaster, recognize, mode='thread', min_interval=0.0, gate=None):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown recognition mode: {mode}")
+        self.broadcaster = broadcaster
+        self.recognize = recognize
+        self.mode = mode
+        self.min_interval = min_interval  # Optional cap on recognition rate
+        self.gate = gate
+        self.running = False
+        self.worker_thread = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._results = []
+        self._results_seq = 0
+        self._results_time = None
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_gated = 0
+        self.last_latency = None
+
+    def start(self):
+        """Start the worker thread (and process pool) if not already running"""
+        if self.running:
+            return False
+        if self.mode == 'process':
+            self._pool = ProcessPoolExecutor(max_workers=1, initializer=_init_process,
+                                             initargs=(self.recognize,))
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._run)
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+        logger.info(f"Recognition worker started ({self.mode} mode)")
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.worker_thread:
+            self.worker_thread.join(timeout=1.0)
+        if self._pool:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        logger.info("Recognition worker stopped")
+
+    def _run(self):
+        seq = 0
+        while self.running:
+            new_seq, frame = self.broadcaster.wait_for_frame(seq, timeout=0.5)
+            if frame is None:
+                continue
+            if seq:
+                self.frames_dropped += new_seq - seq - 1
+            seq = new_seq
+            if self.gate is not None and not self.gate():
+                self.frames_gated += 1
+                if self._results:
+                    self.publish(seq, [])
+                continue
+            start = time.monotonic()
+            try:
+                if self._pool is not None:
+                    results = self._pool.submit(_recognize_in_process, frame).result()
+                else:
+                    results = self.recognize(frame)
+            except Exception as e:
+                logger.error(f"Error in face recognition: {str(e)}")
+                continue
+            latency = time.monotonic() - start
+            self.publish(seq, results, latency)
+            if self.min_interval > latency:
+                time.sleep(self.min_interval - latency)
+
+    def publish(self, seq, results, latency=None):
+        """Replace the published results with those for frame seq"""
+        with self._lock:
+            self._results = list(results)
+            self._results_seq = seq
+            self._results_time = time.time()
+            self.frames_processed += 1
+            self.last_latency = latency
+
+    def latest(self):
+        """Return (seq, results) for the most recently recognised frame"""
+        with self._lock:
+            return self._results_seq, self._results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "frames_processed": self.frames_processed,
+                "frames_dropped": self.frames_dropped,
+                "frames_gated": self.frames_gated,
+                "last_latency": self.last_latency,
+                "results_seq": self._results_seq,
+                "results_time": self._results_time
+            }
+
+def draw_faces(frame, faces):
+    """Return a copy of frame with a labelled box for each face tuple.
+
+    The broadcaster's frame is shared by every viewer and the worker, so the
+    overlay is never drawn in place.
+    """
+    if not faces:
+        return frame
+    image = frame.copy()
+    for face in faces:
+        top, right, bottom, left, name = face[:5]
+        cv2.rectangle(image, (left, top), (right, bottom), BOX_COLOR, 2)
+        cv2.putText(image, name, (left, top - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOX_COLOR, 1)
+    return image
@@ -0,0 +1,106 @@
+import time
+import threading
+import logging
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SensorHub:
+    """Samples all sensors on one background thread into a ring buffer.
+
+    ``read_all`` is a callable returning a dict with one value per channel.
+    ``channels`` maps each channel name to ``bool`` or ``float`` so values
+    can be stored in a float array and handed back with their real type.
+    Readers of the hub (HTTP handlers, the patrol loop) only ever copy from
+    the buffer and never touch the hardware themselves.
+    """
+
+    def __init__(self, read_all, channels, rate_hz=20, capacity=256, clock=time.time):
+        self.read_all = read_all
+        self.channels = dict(channels)
+        self.names = list(self.channels)
+        self.interval = 1.0 / rate_hz
+        self.capacity = capacity
+        self.clock = clock
+        self.running = False
+        self.sample_thread = None
+        self._lock = threading.Lock()
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.full((capacity, len(self.names)), np.nan, dtype=np.float64)
+        self._next = 0  # Slot the next sample is written to
+        self._count = 0  # Number of valid samples, at most capacity
+
+    def start(self):
+        """Take a first sample, then keep sampling on a background thread"""
+        if self.running:
+            return False
+        self.sample()  # So latest() is valid as soon as start() returns
+        self.running = True
+        self.sample_thread = threading.Thread(target=self._sample_loop)
+        self.sample_thread.daemon = True
+        self.sample_thread.start()
+        logger.info("Sensor sampling started")
+        return True
+
+    def stop(self):
+        """Stop the sampling thread"""
+        self.running = False
+        if self.sample_thread:
+            self.sample_thread.join(timeout=1.0)
+        logger.info("Sensor sampling stopped")
+
+    def _sample_loop(self):
+        next_time = self.clock()
+        while self.running:
+            self.sample()
+            # Fixed rate, without drifting by however long the read took
+            next_time += self.interval
+            delay = next_time - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = self.clock()
+
+    def sample(self):
+        """Read every sensor once and append the result to the buffer"""
+        try:
+            reading = self.read_all()
+        except Exception as e:
+            logger.error(f"Error reading sensors: {str(e)}")
+            reading = {}
+        row = [np.nan if reading.get(name) is None else float(reading[name]) for name in self.names]
+        timestamp = self.clock()
+        with self._lock:
+            self._timestamps[self._next] = timestamp
+            self._values[self._next] = row
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _to_python(self, name, value):
+        if np.isnan(value):
+            return None
+        return self.channels[name](value)
+
+    def latest(self):
+        """Return the newest sample as a dict, plus its 'timestamp'"""
+        with self._lock:
+            if not self._count:
+                return dict({name: None for name in self.names}, timestamp=None)
+            idx = (self._next - 1) % self.capacity
+            timestamp = float(self._timestamps[idx])
+            row = self._values[idx].copy()
+        snapshot = {name: self._to_python(name, value) for name, value in zip(self.names, row)}
+        snapshot['timestamp'] = timestamp
+        return snapshot
+
+    def window(self, seconds):
+        """Return (timestamps, {channel: values}) for the last `seconds`, oldest first"""
+        with self._lock:
+            order = (np.arange(self._count) + self._next - self._count) % self.capacity
+            timestamps = self._timestamps[order]
+            values = self._values[order]
+        keep = timestamps >= self.clock() - seconds
+        values = values[keep]
+        return timestamps[keep], {name: values[:, i] for i, name in enumerate(self.names)}
@@ -1,61 +1,242 @@
-import RPi.GPIO as GPIO
+from hardware import GPIO, is_simulated
 import time
 import os
 import glob
-
-GPIO.setmode(GPIO.BCM)
+import threading
+import statistics
+import logging
 
 TRIG_PIN = 29
 ECHO_PIN = 34
 IR_PIN   = 37
 
-GPIO.setup(TRIG_PIN, GPIO.OUT)
-GPIO.setup(ECHO_PIN, GPIO.IN)
-GPIO.setup(IR_PIN, GPIO.IN)
+_setup_lock = threading.Lock()
+_is_setup = False
+
+def setup():
+    """Configure the sensor pins and echo interrupt; safe to call repeatedly.
+
+    Done on first use rather than at import, so the module can be imported
+    without touching hardware.
+    """
+    global _is_setup
+    with _setup_lock:
+        if _is_setup:
+            return
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(TRIG_PIN, GPIO.OUT)
+        GPIO.setup(ECHO_PIN, GPIO.IN)
+        GPIO.setup(IR_PIN, GPIO.IN)
+        GPIO.add_event_detect(ECHO_PIN, GPIO.BOTH, callback=_echo_timer.on_edge)
+        _is_setup = True
 
 # Setup for DS18B20
-os.system('modprobe w1-gpio')
-os.system('modprobe w1-therm')
-base_dir = '/sys/bus/w1/devices/'
-device_folder = glob.glob(base_dir + '28*')[0]
-device_file = device_folder + '/w1_slave'
-
-def read_temperature():
-    """Reads the temperature from the DS18B20 sensor."""
-    with open(device_file, 'r') as f:
-        lines = f.readlines()
-    while lines[0].strip()[-3:] != 'YES':
-        time.sleep(0.2)
+W1_BASE_DIR = '/sys/bus/w1/devices/'
+_w1_loaded = False
+
+def _load_w1_modules():
+    global _w1_loaded
+    if not _w1_loaded and not is_simulated():
+        os.system('modprobe w1-gpio')
+        os.system('modprobe w1-therm')
+    _w1_loaded = True
+
+def find_temperature_device(base_dir=W1_BASE_DIR):
+    """Returns the w1_slave file of the first DS18B20 under base_dir, or None."""
+    if base_dir == W1_BASE_DIR:
+        _load_w1_modules()
+    device_folders = sorted(glob.glob(os.path.join(base_dir, '28*')))
+    if not device_folders:
+        return None
+    return os.path.join(device_folders[0], 'w1_slave')
+
+def read_temperature(device_file=None, max_retries=5, retry_delay=0.2):
+    """Reads the temperature from the DS18B20 sensor.
+
+    Gives up and returns None after max_retries reads without a valid CRC.
+    """
+    if device_file is None:
+        device_file = find_temperature_device()
+        if device_file is None:
+            return None
+    for attempt in range(max_retries):
+        if attempt:
+            time.sleep(retry_delay)
         with open(device_file, 'r') as f:
             lines = f.readlines()
-    equals_pos = lines[1].find('t=')
-    if equals_pos != -1:
-        temp_string = lines[1][equals_pos+2:]
-        temp_c = float(temp_string) / 1000.0
-        return temp_c
+        if len(lines) < 2 or lines[0].strip()[-3:] != 'YES':
+            continue
+        equals_pos = lines[1].find('t=')
+        if equals_pos != -1:
+            temp_string = lines[1][equals_pos+2:]
+            temp_c = float(temp_string) / 1000.0
+            return temp_c
     return None
 
-def read_ultrasonic_distance():
-    """Reads the distance using the ultrasonic sensor."""
-    GPIO.output(TRIG_PIN, True)
-    time.sleep(0.00001)
-    GPIO.output(TRIG_PIN, False)
+class TemperaturePoller:
+    """Reads the DS18B20 on a background thread and caches the last valid value.
+
+    A 1-Wire conversion takes ~750 ms, so callers use latest() instead of
+    reading the sensor inline.
+    """
+
+    def __init__(self, base_dir=W1_BASE_DIR, interval=5.0, max_retries=5, clock=time.time):
+        self.base_dir = base_dir
+        self.interval = interval
+        self.max_retries = max_retries
+        self.clock = clock
+        self.running = False
+        self.poll_thread = None
+        self._stop_event = threading.Event()
+        self._reading = (None, None)  # (temperature, timestamp), swapped as one object
+
+    def start(self):
+        """Start polling if not already running"""
+        if self.running:
+            return False
+        self.running = True
+        self._stop_event.clear()
+        self.poll_thread = threading.Thread(target=self._poll_loop)
+        self.poll_thread.daemon = True
+        self.poll_thread.start()
+        return True
+
+    def stop(self):
+        """Stop polling"""
+        self.running = False
+        self._stop_event.set()
+        if self.poll_thread:
+            self.poll_thread.join(timeout=2.0)
+
+    def _poll_loop(self):
+        while self.running:
+            self.poll_once()
+            self._stop_event.wait(self.interval)
 
-    start_time = time.time()
-    stop_time = time.time()
+    def poll_once(self):
+        """Take one reading; keeps the previous value if this one fails"""
+        try:
+            device_file = find_temperature_device(self.base_dir)
+            temperature = None
+            if device_file is not None:
+                temperature = read_temperature(device_file, self.max_retries)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading temperature: {str(e)}")
+            temperature = None
+        if temperature is not None:
+            self._reading = (temperature, self.clock())
+        return temperature
 
-    while GPIO.input(ECHO_PIN) == 0:
-        start_time = time.time()
-    while GPIO.input(ECHO_PIN) == 1:
-        stop_time = time.time()
+    def latest(self):
+        """Returns (temperature, age in seconds), or (None, None) before the first valid reading"""
+        temperature, timestamp = self._reading
+        if timestamp is None:
+            return None, None
+        return temperature, self.clock() - timestamp
 
-    elapsed = stop_time - start_time
-    distance = (elapsed * 34300) / 2
+# Ultrasonic ranging
+SPEED_OF_SOUND = 34300  # cm/s
+ULTRASONIC_TIMEOUT = 0.03  # s, echo from ~5 m (beyond sensor range) takes ~29 ms
+PING_INTERVAL = 0.06  # s, HC-SR04 needs ~60 ms between pings to avoid stray echoes
+MIN_DISTANCE = 2.0  # cm, HC-SR04 range; echo pulses outside it are noise
+MAX_DISTANCE = 400.0  # cm
+
+class _EchoTimer:
+    """Timestamps the echo pulse from GPIO edge callbacks instead of polling.
+
+    Only edges after arm() count, so a late edge from an earlier ping is
+    ignored. An edge with the pin HIGH is the rise. A callback can run after
+    a short pulse has already ended, though, so with the pin LOW the first
+    edge is taken as the rise and the next as the fall.
+    """
+
+    def __init__(self):
+        self.trigger_ns = None  # When the current ping was armed; None between pings
+        self.rise_ns = None
+        self.fall_ns = None
+        self.done = threading.Event()
+
+    def arm(self):
+        """Start timing a ping; call just before sending its trigger pulse"""
+        self.rise_ns = None
+        self.fall_ns = None
+        self.done.clear()
+        self.trigger_ns = time.perf_counter_ns()
+
+    def disarm(self):
+        self.trigger_ns = None
+
+    def on_edge(self, channel):
+        now = time.perf_counter_ns()
+        trigger_ns = self.trigger_ns
+        if trigger_ns is None or now < trigger_ns or self.done.is_set():
+            return  # Not part of the ping being timed
+        if GPIO.input(channel):
+            self.rise_ns = now  # Pulse still on, so this is the rise, whatever came before
+        elif self.rise_ns is None:
+            self.rise_ns = now  # Pulse already over when this callback ran
+        else:
+            self.fall_ns = now
+            self.done.set()
+
+_echo_timer = _EchoTimer()
+_ping_lock = threading.Lock()  # One ping in flight at a time
+_last_ping = None  # perf_counter() of the last trigger pulse
+
+def read_ultrasonic_distance(timeout=ULTRASONIC_TIMEOUT):
+    """Reads the distance in cm using the ultrasonic sensor.
+
+    The echo pulse is timed from edge interrupts, so the calling thread
+    sleeps instead of spinning. Pings are spaced at least PING_INTERVAL
+    apart, however often this is called. Returns None if no echo arrives
+    in time or it is outside the sensor's MIN_DISTANCE..MAX_DISTANCE range.
+    """
+    global _last_ping
+    setup()
+    with _ping_lock:
+        if _last_ping is not None:
+            wait = PING_INTERVAL - (time.perf_counter() - _last_ping)
+            if wait > 0:
+                time.sleep(wait)
+        _last_ping = time.perf_counter()
+        _echo_timer.arm()
+        try:
+            GPIO.output(TRIG_PIN, True)
+            time.sleep(0.00001)
+            GPIO.output(TRIG_PIN, False)
+
+            if not _echo_timer.done.wait(timeout):
+                return None
+            elapsed = (_echo_timer.fall_ns - _echo_timer.rise_ns) / 1e9
+        finally:
+            _echo_timer.disarm()
+    distance = (elapsed * SPEED_OF_SOUND) / 2
+    if not MIN_DISTANCE <= distance <= MAX_DISTANCE:
+        return None
     return distance
 
+def read_ultrasonic_distance_median(samples=5, interval=PING_INTERVAL, timeout=ULTRASONIC_TIMEOUT):
+    """Takes a burst of pings and returns the median distance, or None if all missed"""
+    readings = []
+    for i in range(samples):
+        if i:
+            time.sleep(interval)
+        distance = read_ultrasonic_distance(timeout)
+        if distance is not None:
+            readings.append(distance)
+    if not readings:
+        return None
+    return statistics.median(readings)
+
 def read_ir_sensor():
     """Checks if the infrared sensor is triggered."""
+    setup()
     return not GPIO.input(IR_PIN)
 
 def cleanup():
+    global _is_setup
+    with _setup_lock:
+        if _is_setup:
+            GPIO.remove_event_detect(ECHO_PIN)
+            _is_setup = False
     GPIO.cleanup()
\ No newline at end of file
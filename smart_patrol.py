@@ -1,9 +1,12 @@
+import math
 import time
 import threading
 import logging
 import random
 from enum import Enum
 from collections import deque
+from coverage_map import CoverageMap
+from pose import PoseTracker
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -16,24 +19,78 @@ class Direction(Enum):
     RIGHT = "right"
     STOP = "stop"
 
+class PatrolState(Enum):
+    IDLE = "idle"
+    FORWARD = "forward"  # Driving, checking the sensors every tick
+    BACKING_UP = "backing_up"  # Short reverse away from an obstacle ahead
+    RETREATING = "retreating"  # Longer reverse when every sensor is blocked
+    TURNING = "turning"  # Turning towards the chosen side
+    ESCAPING = "escaping"  # Long reverse before an escape turn
+
+OBSTACLE_RANGE = 0.3  # Metres ahead at which the sensors report an obstacle
+
+TICK = 0.05  # Seconds per control tick
+BACKUP_TIME = 0.8
+RETREAT_TIME = 1.5
+ESCAPE_BACKUP_TIME = 1.2
+TURN_TIME = 1.0
+CORRECTION_STEER = 0.5  # Arc away from a side wall while driving forward
+CLEAR_RESET_TIME = 1.0  # Seconds of clear driving before the block counter resets
+MAX_RETREATS = 3  # All-blocked retreats in a row before escaping instead
+
 class SmartPatrol:
-    def __init__(self, motor_control, read_sensors):
+    """Obstacle-avoiding patrol run as a state machine on a fixed-rate tick.
+
+    Every tick reads the sensors once and advances the current state. Moves
+    are started with the non-blocking motor_control.drive() and end when
+    their deadline passes, so an obstacle seen while driving forward stops
+    the run on the very next tick and no manoeuvre waits twice. clock, sleep
+    and rng can be replaced for simulation and replay.
+    """
+
+    def __init__(self, motor_control, read_sensors, coverage_map=None, pose_tracker=None,
+                 tick=TICK, clock=time.monotonic, sleep=time.sleep, rng=None):
         self.motor_control = motor_control
         self.read_sensors = read_sensors
+        self.tick_interval = tick
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
         self.is_patrolling = False
         self.patrol_thread = None
-        self.last_turn = None
-        self.consecutive_blocks = 0
         self.move_history = deque(maxlen=10)  # Store last 10 moves for better pattern detection
         self.obstacle_history = deque(maxlen=5)  # Store recent obstacle positions
+        self.coverage_map = coverage_map or CoverageMap()  # Visit counts steer turns to new ground
+        if pose_tracker is None:
+            # Follows every executed motor command, whoever issued it
+            pose_tracker = PoseTracker()
+            motor_control.add_motion_listener(pose_tracker.on_motion)
+        self.pose_tracker = pose_tracker
+        self.ticks = 0
+        self.tick_time = None  # Clock reading the current tick runs at
+        self._pose = pose_tracker.pose()
+        self._reset_session()
+
+    def _reset_session(self):
+        """Forget the previous patrol's decisions; the map and pose are kept"""
+        self.state = PatrolState.IDLE
+        self.last_turn = None
+        self.consecutive_blocks = 0
+        self.retreats = 0  # All-blocked retreats in a row
+        self.move_history.clear()
+        self.obstacle_history.clear()
         self.last_clear_direction = None  # Store the last direction that was clear
-        self.stuck_counter = 0  # Counter for when robot is stuck
-        self.area_coverage = set()  # Track covered areas (simplified)
-        
+        self._deadline = None  # When the current timed state ends
+        self._command = None  # (direction, steer) last sent to the motors
+        self._clear_since = None
+        self._last_position = None
+
     def start_patrol(self):
         """Start the patrol thread if not already running"""
         if not self.is_patrolling:
+            self._reset_session()
             self.is_patrolling = True
+            self.coverage_map.start_session()
             self.patrol_thread = threading.Thread(target=self._patrol_loop)
             self.patrol_thread.daemon = True
             self.patrol_thread.start()
@@ -47,35 +104,162 @@ class SmartPatrol:
         if self.patrol_thread:
             self.patrol_thread.join(timeout=1.0)
         self.motor_control.stop()
+        self.state = PatrolState.IDLE
+        self._command = None
         logger.info("Smart patrol stopped")
 
     def _patrol_loop(self):
-        """Main patrol loop with intelligent navigation"""
+        """Run tick() at a fixed rate until the patrol is stopped"""
+        next_tick = self.clock()
         while self.is_patrolling:
-            sensors = self.read_sensors()
-            
-            # Update obstacle history
-            self.obstacle_history.append(sensors)
-            
-            # Check if we're stuck in a loop
-            if self._is_stuck():
-                self._execute_escape_maneuver()
-                continue
-            
-            if not sensors['center']:  # No obstacle ahead
-                self._move_forward()
-                self.consecutive_blocks = 0
-                self.stuck_counter = 0
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error in patrol tick: {str(e)}")
+                self.motor_control.stop()
+                self._command = None
+            next_tick += self.tick_interval
+            delay = next_tick - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            else:
+                next_tick = self.clock()  # Overran: don't try to catch up
+
+    def tick(self):
+        """Read the sensors once and advance the state machine by one step"""
+        now = self.clock()
+        # Every decision this tick sees this time and the pose at it, so a
+        # recorded tick (patrol_trace.py) replays exactly
+        self.tick_time = now
+        self._pose = self.pose_tracker.pose(now)
+        sensors = self.read_sensors()
+        self.ticks += 1
+        self.obstacle_history.append(sensors)
+        self._map_obstacles(sensors)
+        self._mark_coverage()
+        if self.state == PatrolState.IDLE:
+            self._start_forward(now)
+        handler = {
+            PatrolState.FORWARD: self._tick_forward,
+            PatrolState.BACKING_UP: self._tick_backing_up,
+            PatrolState.RETREATING: self._tick_retreating,
+            PatrolState.TURNING: self._tick_turning,
+            PatrolState.ESCAPING: self._tick_escaping
+        }[self.state]
+        handler(sensors, now)
+
+    # --- States ---
+
+    def _tick_forward(self, sensors, now):
+        if sensors['left'] and sensors['center'] and sensors['right']:
+            logger.info("All IR sensors blocked, executing full retreat")
+            self._enter(PatrolState.RETREATING, Direction.BACKWARD, now, RETREAT_TIME)
+            return
+        if sensors['center']:
+            logger.info("Obstacle detected, executing avoidance maneuver")
+            self.consecutive_blocks += 1
+            self._clear_since = None
+            if self.consecutive_blocks > 3 or self._is_stuck():
+                self._start_escape(now)
             else:
-                self._handle_obstacle(sensors)
-            
-            time.sleep(0.1)  # Small delay to prevent CPU overuse
+                self._enter(PatrolState.BACKING_UP, Direction.BACKWARD, now, BACKUP_TIME)
+            return
+
+        # Clear ahead: arc away from a close side wall instead of stopping to turn
+        steer = 0.0
+        if sensors['left']:
+            steer = CORRECTION_STEER
+        elif sensors['right']:
+            steer = -CORRECTION_STEER
+        self._drive(Direction.FORWARD, steer)
+
+        if self._clear_since is None:
+            self._clear_since = now
+        elif now - self._clear_since >= CLEAR_RESET_TIME:
+            self.consecutive_blocks = 0
+            self.retreats = 0
+
+        # Update last clear direction
+        if not sensors['left']:
+            self.last_clear_direction = Direction.LEFT
+        elif not sensors['right']:
+            self.last_clear_direction = Direction.RIGHT
+
+    def _tick_backing_up(self, sensors, now):
+        if now < self._deadline:
+            return
+        # Choose from what the sensors see now that we have backed away
+        self._start_turn(self._analyze_environment(sensors), now)
+
+    def _tick_retreating(self, sensors, now):
+        if now < self._deadline:
+            return
+        if sensors['left'] and sensors['center'] and sensors['right']:
+            self.retreats += 1
+            if self.retreats >= MAX_RETREATS:
+                self._start_escape(now)
+            else:
+                self._enter(PatrolState.RETREATING, Direction.BACKWARD, now, RETREAT_TIME)
+            return
+        self.consecutive_blocks += 1
+        self._start_turn(self._analyze_environment(sensors), now)
+
+    def _tick_turning(self, sensors, now):
+        if now >= self._deadline:
+            self._start_forward(now)
+            self._tick_forward(sensors, now)
+
+    def _tick_escaping(self, sensors, now):
+        if now < self._deadline:
+            return
+        turn = Direction.LEFT if self._should_turn_left() else Direction.RIGHT
+        # Reset counters
+        self.consecutive_blocks = 0
+        self.retreats = 0
+        self.move_history.clear()  # Clear history to break patterns
+        self._start_turn(turn, now, record=False)
+
+    # --- Transitions ---
+
+    def _enter(self, state, direction, now, duration=None):
+        self.state = state
+        self._deadline = None if duration is None else now + duration
+        self._drive(direction)
+
+    def _start_forward(self, now):
+        # The forward tick decides whether it is clear to actually drive
+        self.state = PatrolState.FORWARD
+        self._deadline = None
+        self._clear_since = None
+
+    def _start_turn(self, turn, now, record=True):
+        self.last_turn = turn
+        if record:
+            self.move_history.append(turn)
+        self._enter(PatrolState.TURNING, turn, now, TURN_TIME)
+
+    def _start_escape(self, now):
+        logger.info("Executing escape maneuver")
+        self._enter(PatrolState.ESCAPING, Direction.BACKWARD, now, ESCAPE_BACKUP_TIME)
+
+    def _drive(self, direction, steer=0.0):
+        """Send a non-blocking move, skipping it if the motors already do that"""
+        command = (direction, steer)
+        if command == self._command:
+            return
+        self._command = command
+        if direction == Direction.STOP:
+            self.motor_control.stop()
+        else:
+            self.motor_control.drive(direction.value, steer=steer)
+
+    # --- Decisions ---
 
     def _is_stuck(self):
         """Check if the robot is stuck in a pattern or loop"""
         if len(self.move_history) < 5:
             return False
-            
+
         # Check for repeated patterns
         recent_moves = list(self.move_history)
         if len(recent_moves) >= 4:
@@ -84,61 +268,18 @@ class SmartPatrol:
                 return True
             if all(move == Direction.RIGHT for move in recent_moves[-4:]):
                 return True
-                
+
         # Check for too many consecutive blocks
         if self.consecutive_blocks > 5:
             return True
-            
+
         # Check if we're making the same turn repeatedly
         if len(self.move_history) >= 3:
             last_three = list(self.move_history)[-3:]
             if all(move == self.last_turn for move in last_three):
                 return True
-                
-        return False
-
-    def _handle_obstacle(self, sensors):
-        """Enhanced obstacle avoidance logic"""
-        logger.info("Obstacle detected, executing avoidance maneuver")
-        
-        # Check if all IR sensors are blocked
-        if sensors['left'] and sensors['center'] and sensors['right']:
-            logger.info("All IR sensors blocked, executing full retreat")
-            self.motor_control.backward(duration=1.5)
-            time.sleep(1.5)
-            # Try again with a different approach
-            return self._handle_obstacle(self.read_sensors())
-        
-        # First backup a bit
-        self.motor_control.backward(duration=0.8)
-        time.sleep(0.8)
-        
-        # Recheck sensors after backing up
-        sensors = self.read_sensors()
-        
-        # Increment blocked counter
-        self.consecutive_blocks += 1
-        
-        # If we're getting blocked too often, try more dramatic maneuvers
-        if self.consecutive_blocks > 3:
-            self._execute_escape_maneuver()
-            return
 
-        # Analyze the environment
-        turn_direction = self._analyze_environment(sensors)
-        
-        # Execute the turn
-        if turn_direction == Direction.LEFT:
-            self.motor_control.turn_left(duration=1.0)
-            self.last_turn = Direction.LEFT
-        else:
-            self.motor_control.turn_right(duration=1.0)
-            self.last_turn = Direction.RIGHT
-        
-        time.sleep(1.0)  # Wait for turn to complete
-        
-        # Add move to history
-        self.move_history.append(turn_direction)
+        return False
 
     def _analyze_environment(self, sensors):
         """Enhanced environment analysis for better decision making"""
@@ -147,105 +288,104 @@ class SmartPatrol:
             return Direction.LEFT
         if sensors['left'] and not sensors['right']:
             return Direction.RIGHT
-            
-        # If both sides are blocked, use history and randomness
+
+        # If both sides are blocked, head for less-visited ground, else use history
         if sensors['left'] and sensors['right']:
-            if self.last_turn and random.random() < 0.7:  # 70% chance to continue same direction
+            preferred = self._coverage_turn()
+            if preferred:
+                return preferred
+            if self.last_turn and self.rng.random() < 0.7:  # 70% chance to continue same direction
                 return self.last_turn
-            return random.choice([Direction.LEFT, Direction.RIGHT])
-            
+            return self.rng.choice([Direction.LEFT, Direction.RIGHT])
+
         # If both sides are clear, use pattern analysis and history
         return self._decide_best_turn()
 
     def _decide_best_turn(self):
-        """Decide the best turn direction based on history and patterns"""
+        """Decide the best turn direction based on coverage, history and patterns"""
+        preferred = self._coverage_turn()
+        if preferred:
+            return preferred
+
         if not self.move_history:
-            return random.choice([Direction.LEFT, Direction.RIGHT])
-            
+            return self.rng.choice([Direction.LEFT, Direction.RIGHT])
+
         # Count recent turns
         recent_moves = list(self.move_history)
         left_turns = sum(1 for move in recent_moves if move == Direction.LEFT)
         right_turns = len(recent_moves) - left_turns
-        
+
         # If we've been turning one way too much, go the other way
         if left_turns > right_turns + 2:
             return Direction.RIGHT
         elif right_turns > left_turns + 2:
             return Direction.LEFT
-            
+
         # If we have a last clear direction, prefer that
         if self.last_clear_direction:
             return self.last_clear_direction
-            
+
         # Otherwise, use randomness with slight bias against last turn
         if self.last_turn == Direction.LEFT:
-            return random.choice([Direction.LEFT, Direction.RIGHT, Direction.RIGHT])
-        return random.choice([Direction.LEFT, Direction.LEFT, Direction.RIGHT])
-
-    def _execute_escape_maneuver(self):
-        """Execute a more complex escape maneuver when stuck"""
-        logger.info("Executing escape maneuver")
-        
-        # Back up more than usual
-        self.motor_control.backward(duration=1.2)
-        time.sleep(1.2)
-        
-        # Choose turn direction based on history
-        if self._should_turn_left():
-            self.motor_control.turn_left(duration=1.0)
-            self.last_turn = Direction.LEFT
-        else:
-            self.motor_control.turn_right(duration=1.0)
-            self.last_turn = Direction.RIGHT
-            
-        time.sleep(1.0)
-        
-        # Reset counters
-        self.consecutive_blocks = 0
-        self.stuck_counter = 0
-        self.move_history.clear()  # Clear history to break patterns
+            return self.rng.choice([Direction.LEFT, Direction.RIGHT, Direction.RIGHT])
+        return self.rng.choice([Direction.LEFT, Direction.LEFT, Direction.RIGHT])
 
     def _should_turn_left(self):
-        """Determine if we should turn left based on history"""
+        """Determine if we should turn left based on coverage and history"""
+        preferred = self._coverage_turn()
+        if preferred:
+            return preferred == Direction.LEFT
+
         if not self.move_history:
-            return random.random() < 0.5
-            
+            return self.rng.random() < 0.5
+
         recent_moves = list(self.move_history)
         left_turns = sum(1 for move in recent_moves if move == Direction.LEFT)
         right_turns = len(recent_moves) - left_turns
-        
+
         if left_turns > right_turns:
             return False
         elif right_turns > left_turns:
             return True
-        return random.random() < 0.5
+        return self.rng.random() < 0.5
 
-    def _move_forward(self):
-        """Move forward with enhanced course corrections"""
-        sensors = self.read_sensors()
-        
-        # Check if all IR sensors are blocked
-        if sensors['left'] and sensors['center'] and sensors['right']:
-            logger.info("All IR sensors blocked during forward movement")
-            self.motor_control.backward(duration=1.5)
-            time.sleep(1.5)
-            return self._handle_obstacle(sensors)
-        
-        # If slightly off-center, make minor corrections
-        if not sensors['center']:
-            if sensors['left']:  # Too close to left wall
-                self.motor_control.turn_right(duration=0.2)
-                time.sleep(0.2)
-            elif sensors['right']:  # Too close to right wall
-                self.motor_control.turn_left(duration=0.2)
-                time.sleep(0.2)
-                
-        # Move forward
-        self.motor_control.forward(duration=1.5)  # Reduced from 3.0 to 1.5 seconds
-        time.sleep(0.2)  # Slightly shorter than movement to allow for overlap
-        
-        # Update last clear direction
-        if not sensors['left']:
-            self.last_clear_direction = Direction.LEFT
-        elif not sensors['right']:
-            self.last_clear_direction = Direction.RIGHT 
\ No newline at end of file
+    def _coverage_turn(self):
+        """Turn towards the less-visited side, or None if neither stands out"""
+        x, y, heading = self._pose
+        preferred = self.coverage_map.preferred_turn(x, y, heading)
+        if preferred == 'left':
+            return Direction.LEFT
+        if preferred == 'right':
+            return Direction.RIGHT
+        return None
+
+    # --- Pose and coverage ---
+
+    @property
+    def pose(self):
+        """Estimated x, y (metres) and heading (radians)"""
+        return self.pose_tracker.pose()
+
+    def _mark_coverage(self):
+        """Mark the ground covered since the last tick"""
+        x, y, _ = self._pose
+        if self._last_position is not None:
+            self.coverage_map.mark_path(self._last_position[0], self._last_position[1], x, y)
+        else:
+            self.coverage_map.mark_visit(x, y)
+        self._last_position = (x, y)
+
+    def _map_obstacles(self, sensors):
+        """Put whatever the sensors currently see onto the coverage map, once per sighting"""
+        x, y, heading = self._pose
+        for key, offset in (('center', 0.0), ('left', math.pi / 4), ('right', -math.pi / 4)):
+            if sensors.get(key):
+                self.coverage_map.mark_obstacle(x, y, heading + offset, OBSTACLE_RANGE, sensor=key)
+            else:
+                self.coverage_map.end_sighting(key)
+
+    def coverage_stats(self):
+        """Coverage map stats plus the current pose estimate"""
+        stats = self.coverage_map.stats()
+        stats["pose"] = self.pose_tracker.to_dict()
+        return stats
@@ -1,10 +1,19 @@
 from flask import Flask, render_template, Response, jsonify, request, session, redirect, url_for
 import cv2
 import logging
+import math
 import os
-import RPi.GPIO as GPIO
+from hardware import GPIO
 import time
 from smart_patrol import SmartPatrol
+from patrol_trace import TraceRecorder
+from pose import PoseTracker
+from sensor_hub import SensorHub
+from config import Config
+from camera_stream import FrameBroadcaster, JpegCache, StreamController, stream_mjpeg
+from motion import MotionDetector
+from event_stream import StatusPublisher, sse_events
+from clip_recorder import ClipRecorder
 from functools import wraps
 
 # Set up logging first
@@ -22,6 +31,7 @@ IR_RIGHT = 24   # GPIO24 - free
 
 # Setup IR sensors
 def setup_ir_sensors():
+    GPIO.setmode(GPIO.BCM)
     GPIO.setup(IR_LEFT, GPIO.IN)
     GPIO.setup(IR_CENTER, GPIO.IN)
     GPIO.setup(IR_RIGHT, GPIO.IN)
@@ -35,6 +45,11 @@ def read_ir_sensors():
     }
 
 import motor_control
+from motor_executor import MotorExecutor
+
+# Manual moves run on the executor thread so requests return immediately
+motor_executor = MotorExecutor(motor_control)
+motor_executor.start()
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # Required for session management
@@ -55,8 +70,43 @@ use_picamera = False
 # Initialize IR sensors
 setup_ir_sensors()
 
-# Initialize smart patrol
-smart_patrol = SmartPatrol(motor_control, read_ir_sensors)
+# Sample the IR sensors in the background; handlers and patrol read snapshots
+sensor_hub = SensorHub(read_ir_sensors, {'left': bool, 'center': bool, 'right': bool},
+                       rate_hz=Config.SENSOR_SAMPLE_HZ, capacity=Config.SENSOR_BUFFER_SIZE)
+sensor_hub.start()
+
+# Dead-reckoned pose from every executed motor command
+pose_tracker = PoseTracker()
+motor_control.add_motion_listener(pose_tracker.on_motion)
+
+# Initialize smart patrol, optionally recording each session for offline replay
+patrol_trace = None
+if Config.PATROL_TRACE_DIR:
+    patrol_trace = TraceRecorder(motor_control, sensor_hub.latest, directory=Config.PATROL_TRACE_DIR)
+    smart_patrol = SmartPatrol(patrol_trace.motors, patrol_trace.read_sensors, pose_tracker=pose_tracker)
+else:
+    smart_patrol = SmartPatrol(motor_control, sensor_hub.latest, pose_tracker=pose_tracker)
+
+def pose_state():
+    x, y, heading = pose_tracker.pose()
+    # Centimetre / degree resolution so the event stream isn't flooded
+    return {"x": round(x, 2), "y": round(y, 2), "heading": round(math.degrees(heading))}
+
+def sensor_state():
+    snapshot = sensor_hub.latest()
+    snapshot.pop('timestamp', None)
+    return snapshot
+
+def patrol_state():
+    return {
+        "is_patrolling": smart_patrol.is_patrolling,
+        "state": smart_patrol.state.value,
+        "consecutive_blocks": smart_patrol.consecutive_blocks
+    }
+
+# One poll loop feeds every /events dashboard from the in-memory snapshots
+status_publisher = StatusPublisher({'sensors': sensor_state, 'patrol': patrol_state, 'pose': pose_state})
+status_publisher.start()
 
 def init_camera():
     global camera, use_picamera
@@ -81,34 +131,41 @@ def init_camera():
             logger.error(f"Failed to initialize USB webcam: {str(e)}")
             raise
 
-def gen_frames():
-    global camera, running
-    while running:
-        try:
-            if use_picamera:
-                # Use PiCamera2
-                frame = camera.capture_array()
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    continue
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                # Use USB webcam
-                success, frame = camera.read()
-                if not success:
-                    logger.error("Failed to capture frame from camera.")
-                    break
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    continue
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        except Exception as e:
-            logger.error(f"Error capturing frame: {str(e)}")
+def read_camera_frame():
+    """Grab one frame from whichever camera init_camera() opened"""
+    if use_picamera:
+        # Use PiCamera2
+        return camera.capture_array()
+    # Use USB webcam
+    success, frame = camera.read()
+    # FrameBroadcaster logs and backs off on failed reads
+    return frame if success else None
+
+# Cheap motion score on every captured frame; gates the expensive stages
+motion_detector = MotionDetector(min_score=Config.MOTION_MIN_SCORE, hold=Config.MOTION_HOLD)
+
+# One capture thread shared by every /video_feed client
+broadcaster = FrameBroadcaster(read_camera_frame, motion_detector=motion_detector)
+jpeg_cache = JpegCache()
+
+# Keeps a few seconds of encoded frames in memory and writes a clip to disk
+# when an IR sensor fires or motion is seen
+clip_recorder = ClipRecorder(broadcaster, jpeg_cache, clip_dir=Config.CLIP_DIR,
+                             pre_roll=Config.CLIP_PRE_ROLL, post_roll=Config.CLIP_POST_ROLL,
+                             fps=Config.CLIP_FPS, triggers=[
+                                 ('ir', lambda: any(sensor_hub.latest()[side]
+                                                    for side in ('left', 'center', 'right'))),
+                                 ('motion', motion_detector.active)
+                             ])
+
+def live_frames():
+    for seq, frame in broadcaster.frames():
+        if not running:
             break
+        yield seq, frame
+
+def gen_frames(controller):
+    return stream_mjpeg(live_frames(), jpeg_cache, controller, motion=motion_detector)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -137,7 +194,30 @@ def index():
 @app.route('/video_feed')
 @login_required
 def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Optional ?quality=&scale=&max_fps=&adaptive=1 per client
+    controller = StreamController.from_request_args(request.args)
+    return Response(gen_frames(controller), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_feed/stats')
+@login_required
+def video_feed_stats():
+    return jsonify({"status": "ok", "stream": jpeg_cache.stats()})
+
+@app.route('/clips')
+@login_required
+def list_clips():
+    return jsonify({"status": "ok", "clips": clip_recorder.clips(), "stats": clip_recorder.stats()})
+
+@app.route('/clips/trigger', methods=['POST'])
+@login_required
+def trigger_clip():
+    clip_recorder.trigger(request.form.get('reason', 'manual'))
+    return jsonify({"status": "ok", "recording": clip_recorder.recording})
+
+@app.route('/motion')
+@login_required
+def motion_status():
+    return jsonify({"status": "ok", "motion": motion_detector.stats()})
 
 @app.route('/move', methods=['POST'])
 @login_required
@@ -145,9 +225,11 @@ def move():
     try:
         direction = request.form.get('direction', 'stop')
         duration = float(request.form.get('duration', 1.0))
+        speed = int(request.form.get('speed', motor_control.DEFAULT_SPEED))
+        steer = float(request.form.get('steer', 0.0))  # -1..1, arcs forward/backward moves
 
-        # Read IR sensors before moving
-        ir_data = read_ir_sensors()
+        # Check the latest IR snapshot before moving
+        ir_data = sensor_hub.latest()
         
         # Basic collision avoidance
         if direction == 'forward' and ir_data['center']:
@@ -157,32 +239,42 @@ def move():
         elif direction == 'right' and ir_data['right']:
             return jsonify({"status": "blocked", "message": "Obstacle detected on right", "sensors": ir_data}), 400
 
-        if direction == 'forward':
-            motor_control.forward(duration=duration)
-        elif direction == 'backward':
-            motor_control.backward(duration=duration)
-        elif direction == 'left':
-            motor_control.turn_left(duration=duration)
-        elif direction == 'right':
-            motor_control.turn_right(duration=duration)
+        # Queue the move; a new command or stop preempts the running one
+        if direction in ('forward', 'backward', 'left', 'right'):
+            command_id = motor_executor.submit(direction, speed, duration, steer=steer)
         else:
-            motor_control.stop()
+            command_id = motor_executor.stop()
         
         # Return both movement status and sensor data
         return jsonify({
             "status": "ok", 
             "direction": direction,
-            "sensors": read_ir_sensors()
+            "command_id": command_id,
+            "sensors": sensor_hub.latest()
         })
     except Exception as e:
         logger.error(f"Error in move command: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/move/status')
+@login_required
+def move_status():
+    command_id = request.args.get('id', type=int)
+    command = motor_executor.status(command_id)
+    if command_id is not None and command is None:
+        return jsonify({"status": "error", "message": "Unknown command id"}), 404
+    return jsonify({"status": "ok", "command": command})
+
+@app.route('/motors/stats')
+@login_required
+def motor_stats():
+    return jsonify({"status": "ok", "motors": motor_control.gpio_stats()})
+
 @app.route('/sensors')
 @login_required
 def get_sensors():
     try:
-        sensor_data = read_ir_sensors()
+        sensor_data = sensor_hub.latest()
         return jsonify({
             "status": "ok",
             "sensors": sensor_data
@@ -191,38 +283,70 @@ def get_sensors():
         logger.error(f"Error reading sensors: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/events')
+@login_required
+def events():
+    return Response(sse_events(status_publisher), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/patrol', methods=['POST'])
 @login_required
 def patrol():
     try:
         action = request.form.get('action', 'start')
         if action == 'start':
+            if patrol_trace and not smart_patrol.is_patrolling:
+                patrol_trace.start(smart_patrol)
             if smart_patrol.start_patrol():
                 return jsonify({"status": "ok", "message": "Smart patrol started"})
             else:
                 return jsonify({"status": "error", "message": "Patrol already running"}), 400
         else:
             smart_patrol.stop_patrol()
+            if patrol_trace:
+                patrol_trace.stop()
             return jsonify({"status": "ok", "message": "Smart patrol stopped"})
     except Exception as e:
         logger.error(f"Error in patrol command: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/pose')
+@login_required
+def pose():
+    return jsonify({"status": "ok", "pose": pose_tracker.to_dict()})
+
+@app.route('/patrol/coverage')
+@login_required
+def patrol_coverage():
+    coverage = smart_patrol.coverage_stats()
+    if request.args.get('grid', '0') in ('1', 'true', 'yes'):
+        coverage.update(smart_patrol.coverage_map.grid())
+    return jsonify({"status": "ok", "coverage": coverage})
+
 def cleanup():
     global running, camera
     running = False
+    clip_recorder.stop()
+    broadcaster.stop()
     if camera:
         if use_picamera:
             camera.stop()
         else:
             camera.release()
     smart_patrol.stop_patrol()  # Stop patrol if running
+    if patrol_trace:
+        patrol_trace.stop()
+    status_publisher.stop()
+    sensor_hub.stop()
+    motor_executor.shutdown()
     motor_control.cleanup()
     GPIO.cleanup()
 
 if __name__ == '__main__':
     try:
         init_camera()  # Initialize camera before starting the app
+        broadcaster.start()
+        clip_recorder.start()
         # Enable threading and allow external access
         app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
     except KeyboardInterrupt:
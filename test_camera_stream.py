@@ -0,0 +1,249 @@
+import unittest
+import threading
+import time
+import numpy as np
+from camera_stream import (FrameBroadcaster, JpegCache, StreamController, multipart_chunks, stream_mjpeg,
+                           IDLE_QUALITY)
+
+class CountingCamera:
+    """Fake camera that returns an increasing integer as the frame"""
+    def __init__(self, fps=200):
+        self.reads = 0
+        self.delay = 1.0 / fps
+        self.lock = threading.Lock()
+
+    def read(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.reads += 1
+            return self.reads
+
+class TestFrameBroadcaster(unittest.TestCase):
+    def setUp(self):
+        self.camera = CountingCamera()
+        self.broadcaster = FrameBroadcaster(self.camera.read)
+        self.broadcaster.start()
+
+    def tearDown(self):
+        self.broadcaster.stop()
+
+    def test_start_is_idempotent(self):
+        """Test starting twice does not spawn a second capture thread"""
+        self.assertFalse(self.broadcaster.start())
+
+    def test_viewers_share_one_capture(self):
+        """Test several viewers do not multiply camera reads"""
+        results = {}
+
+        def viewer(idx):
+            seen = []
+            for seq, frame in self.broadcaster.frames():
+                seen.append(frame)
+                if len(seen) == 10:
+                    break
+            results[idx] = seen
+
+        threads = [threading.Thread(target=viewer, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5.0)
+
+        self.assertEqual(len(results), 4)
+        # Every frame a viewer saw came from the single shared sequence
+        for seen in results.values():
+            self.assertEqual(seen, sorted(seen))
+        # Four viewers of ten frames each would have needed 40 reads if
+        # each had its own capture loop
+        self.assertLess(max(max(seen) for seen in results.values()), 40)
+
+    def test_slow_viewer_drops_to_latest(self):
+        """Test a slow viewer skips stale frames instead of queueing them"""
+        frames = self.broadcaster.frames()
+        first_seq, _ = next(frames)
+        time.sleep(0.1)
+        second_seq, _ = next(frames)
+        self.assertGreater(second_seq - first_seq, 1)
+
+    def test_failed_reads_back_off_and_log_once(self):
+        """Test a dead camera is retried ever more slowly with one error, then one recovery line"""
+        self.broadcaster.stop()
+        plugged = [False]
+        reads = []
+
+        def read():
+            reads.append(time.monotonic())
+            if not plugged[0]:
+                raise IOError("camera unplugged")
+            return 1
+
+        broadcaster = FrameBroadcaster(read, retry_delay=0.01, max_retry_delay=0.08,
+                                       failure_log_interval=0.15)
+        with self.assertLogs('camera_stream', level='INFO') as logs:
+            broadcaster.start()
+            time.sleep(0.4)
+            failed = len(reads)
+            plugged[0] = True
+            self.assertEqual(broadcaster.wait_for_frame(timeout=1.0)[1], 1)
+            broadcaster.stop()
+        self.assertLess(failed, 10)  # 40 at a fixed 0.01 s retry
+        self.assertGreater(reads[failed - 1] - reads[failed - 2], 0.07)
+        errors = [line for line in logs.output if line.startswith('ERROR')]
+        self.assertEqual(len(errors), 1)
+        self.assertIn('camera unplugged', errors[0])
+        self.assertTrue(any('still failing' in line for line in logs.output))
+        self.assertEqual(sum('recovered' in line for line in logs.output), 1)
+        self.assertEqual(broadcaster.failed_reads, 0)
+
+    def test_wait_for_frame_timeout(self):
+        """Test waiting returns no frame once capture has stopped"""
+        self.broadcaster.stop()
+        seq, frame = self.broadcaster.latest()
+        self.assertEqual(self.broadcaster.wait_for_frame(seq, timeout=0.1), (seq, None))
+
+class TestJpegCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = JpegCache(max_entries=2)
+        self.frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def test_encodes_each_frame_once(self):
+        """Test every viewer gets the same bytes object for a frame"""
+        first = self.cache.get(1, self.frame)
+        for _ in range(3):
+            self.assertIs(self.cache.get(1, self.frame), first)
+        self.assertTrue(first.startswith(b'\xff\xd8'))  # JPEG SOI marker
+        self.assertEqual(self.cache.stats(), {
+            "frames_encoded": 1,
+            "frames_served": 4,
+            "encodes_saved": 3
+        })
+
+    def test_old_entries_are_evicted(self):
+        """Test the cache only keeps the newest frames"""
+        for seq in range(1, 4):
+            self.cache.get(seq, self.frame)
+        self.cache.get(1, self.frame)
+        self.assertEqual(self.cache.stats()["frames_encoded"], 4)
+
+    def test_multipart_chunks_do_not_copy(self):
+        """Test the JPEG payload is passed through untouched"""
+        jpeg = self.cache.get(1, self.frame)
+        header, payload, footer = multipart_chunks(jpeg)
+        self.assertIs(payload, jpeg)
+        self.assertTrue(header.startswith(b'--frame'))
+
+    def test_scaled_frames_are_cached_separately(self):
+        """Test each quality/scale setting is its own cache entry"""
+        full = self.cache.get(1, self.frame)
+        small = self.cache.get(1, self.frame, quality=50, scale=0.5)
+        self.assertIsNot(full, small)
+        self.assertIs(self.cache.get(1, self.frame, quality=50, scale=0.5), small)
+        self.assertEqual(self.cache.stats()["frames_encoded"], 2)
+
+    def test_variants_are_cached_separately(self):
+        """Test an annotated copy of a frame never gets the raw frame's JPEG"""
+        annotated = self.frame.copy()
+        annotated[10:20, 10:20] = 255
+        raw = self.cache.get(1, self.frame, quality=70)
+        drawn = self.cache.get(1, annotated, quality=70, variant='annotated')
+        self.assertNotEqual(raw, drawn)
+        self.assertIs(self.cache.get(1, self.frame, quality=70), raw)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestStreamController(unittest.TestCase):
+    def test_max_fps_skips_frames(self):
+        """Test max_fps limits how often frames are sent"""
+        controller = StreamController(max_fps=10)
+        sent = [controller.should_send(t * 0.02) for t in range(10)]
+        self.assertEqual(sent.count(True), 2)
+        self.assertEqual(controller.frames_skipped, 8)
+
+    def test_fixed_mode_ignores_slow_writes(self):
+        """Test non-adaptive streams keep the requested settings"""
+        controller = StreamController(quality=70, scale=0.5)
+        for _ in range(10):
+            controller.record_write(1.0)
+        self.assertEqual((controller.quality, controller.scale), (70, 0.5))
+
+    def test_adaptive_steps_down_and_recovers(self):
+        """Test slow writes lower quality then resolution, fast writes restore them"""
+        controller = StreamController(adaptive=True, write_budget=0.1)
+        for _ in range(20):
+            controller.record_write(0.5)
+        self.assertEqual(controller.quality, StreamController.QUALITY_STEPS[-1])
+        self.assertEqual(controller.scale, StreamController.SCALE_STEPS[-1])
+        # Saturated link: frames are spaced out beyond the write time
+        self.assertTrue(controller.should_send(0.0))
+        self.assertFalse(controller.should_send(0.5))
+
+        for _ in range(40):
+            controller.record_write(0.0)
+        self.assertEqual((controller.quality, controller.scale), (95, 1.0))
+
+    def test_stream_measures_write_time(self):
+        """Test the stream feeds time spent at its yields back to the controller"""
+        clock = FakeClock()
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+        def camera_frames():
+            for seq in range(1, 1000):
+                clock.now += 1.0 / 30
+                yield seq, frame
+
+        controller = StreamController(adaptive=True, write_budget=0.1)
+        stream = stream_mjpeg(camera_frames(), JpegCache(), controller, clock)
+        for _ in range(30):
+            next(stream)
+            clock.now += 0.2  # Every chunk takes a long time to write
+        self.assertLess(controller.quality, 95)
+        self.assertGreater(controller.frames_skipped, 0)
+
+    def test_idle_scene_caps_quality(self):
+        """Test frames are encoded at IDLE_QUALITY while no motion is seen"""
+        class Motion:
+            moving = False
+            def active(self):
+                return self.moving
+
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        motion = Motion()
+        cache = JpegCache()
+        seen = []
+        original_get = cache.get
+        def recording_get(seq, frame, quality=95, scale=1.0, variant='raw'):
+            seen.append(quality)
+            return original_get(seq, frame, quality, scale, variant)
+        cache.get = recording_get
+
+        stream = stream_mjpeg(((seq, frame) for seq in range(1, 10)), cache,
+                              StreamController(), motion=motion)
+        next(stream)
+        motion.moving = True
+        for _ in range(3):
+            next(stream)
+        self.assertEqual(seen, [IDLE_QUALITY, 95])
+
+    def test_motion_detector_runs_on_capture_thread(self):
+        """Test the broadcaster scores frames before publishing them"""
+        scored = []
+        class Motion:
+            def update(self, frame):
+                scored.append(frame)
+
+        camera = CountingCamera()
+        broadcaster = FrameBroadcaster(camera.read, motion_detector=Motion())
+        broadcaster.start()
+        try:
+            seq, frame = broadcaster.wait_for_frame(0)
+            self.assertIn(frame, scored)
+        finally:
+            broadcaster.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import json
+import tempfile
+import numpy as np
+from camera_stream import JpegCache
+from clip_recorder import ClipRecorder
+
+class IdleBroadcaster:
+    """No camera: frames are fed to the recorder by the test"""
+    def frames(self):
+        return iter(())
+
+class TestClipRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = [0.0]
+        self.motion = [False]
+        self.recorder = ClipRecorder(IdleBroadcaster(), JpegCache(), clip_dir=self.tmp.name,
+                                     pre_roll=1.0, post_roll=1.0, fps=8, max_clip=3.0,
+                                     triggers=[('motion', lambda: self.motion[0])],
+                                     clock=lambda: self.now[0])
+        self.recorder.start()
+        self.seq = 0
+
+    def tearDown(self):
+        self.recorder.stop()
+        self.tmp.cleanup()
+
+    def feed(self, seconds):
+        """Feed frames at 8 fps (exact binary steps) for the given number of seconds"""
+        for _ in range(int(round(seconds * 8))):
+            self.seq += 1
+            self.now[0] += 0.125
+            frame = np.full((24, 32, 3), self.seq % 256, dtype=np.uint8)
+            self.recorder.add_frame(self.seq, frame)
+
+    def test_no_disk_io_without_events(self):
+        """Test frames only fill the bounded pre-roll buffer"""
+        self.feed(5.0)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        self.assertEqual(self.recorder.stats()["buffered_frames"], 8)
+
+    def test_clip_has_pre_and_post_roll(self):
+        """Test a clip holds the pre-roll, then post-roll frames after the event"""
+        self.feed(2.0)
+        self.recorder.trigger('ir')
+        self.assertTrue(self.recorder.recording)
+        self.feed(2.0)
+        self.assertFalse(self.recorder.recording)
+        self.recorder.stop()
+        [clip] = self.recorder.clips()
+        self.assertEqual(clip["reasons"], ['ir'])
+        # 1 s of pre-roll plus 1 s of post-roll at 8 fps
+        self.assertEqual(clip["frames"], 16)
+        with open(clip["path"], 'rb') as f:
+            self.assertEqual(f.read().count(b'\xff\xd8'), 16)  # JPEG start markers
+        with open(os.path.splitext(clip["path"])[0] + '.json') as f:
+            self.assertEqual(json.load(f)["frames"], 16)
+
+    def test_polled_trigger_extends_clip_up_to_max(self):
+        """Test continuous motion keeps one clip open until max_clip"""
+        self.motion[0] = True
+        self.feed(5.0)
+        self.motion[0] = False
+        self.feed(2.0)
+        self.recorder.stop()
+        clips = self.recorder.clips()
+        self.assertGreaterEqual(len(clips), 2)
+        self.assertEqual(clips[0]["reasons"], ['motion'])
+        self.assertLessEqual(clips[0]["frames"], 8 * 4)
+
+    def test_full_writer_queue_drops_frames(self):
+        """Test a stalled writer drops frames instead of blocking"""
+        self.recorder.stop()
+        recorder = ClipRecorder(IdleBroadcaster(), JpegCache(), clip_dir=self.tmp.name,
+                                queue_size=4, clock=lambda: self.now[0])
+        recorder.trigger('manual')  # Writer thread not started: nothing drains the queue
+        for seq in range(1, 10):
+            self.now[0] += 0.1
+            recorder.add_frame(seq, np.zeros((24, 32, 3), dtype=np.uint8))
+        self.assertGreater(recorder.stats()["frames_dropped"], 0)
+
+    def test_full_writer_queue_never_blocks_triggers(self):
+        """Test clips still open and close while the writer queue is full of frames"""
+        self.recorder.stop()
+        recorder = ClipRecorder(IdleBroadcaster(), JpegCache(), clip_dir=self.tmp.name,
+                                post_roll=0.5, queue_size=4, clock=lambda: self.now[0])
+        for seq in range(1, 40):  # Writer thread not started: each trigger would block on put()
+            self.now[0] += 0.1
+            if seq % 10 == 0:
+                recorder.trigger('manual')
+            recorder.add_frame(seq, np.zeros((24, 32, 3), dtype=np.uint8))
+        self.assertEqual(recorder.stats()["clips"], 3)
+        recorder.start()
+        recorder.stop()
+        self.assertEqual(len(recorder.clips()), 3)
+        self.assertTrue(all(clip["frames"] <= 4 for clip in recorder.clips()))
+
+if __name__ == '__main__':
+    unittest.main()
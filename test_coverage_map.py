@@ -0,0 +1,113 @@
+import unittest
+import math
+from coverage_map import CoverageMap
+from smart_patrol import SmartPatrol, Direction
+from pose import PoseTracker
+
+class DriveMotors:
+    """Fake motor_control that reports each drive()/stop() to a pose tracker on a fake clock"""
+    DUTIES = {'forward': (1.0, 1.0), 'backward': (-1.0, -1.0), 'left': (-1.0, 1.0), 'right': (1.0, -1.0)}
+
+    def __init__(self, tracker, clock):
+        self.tracker = tracker
+        self.clock = clock
+
+    def drive(self, direction, speed=None, steer=0.0):
+        left, right = self.DUTIES[direction]
+        self.tracker.on_motion(self.clock[0], 100.0 * left * (1.0 + min(steer, 0.0)),
+                               100.0 * right * (1.0 - max(steer, 0.0)))
+
+    def stop(self):
+        self.tracker.on_motion(self.clock[0], 0.0, 0.0)
+
+    def add_motion_listener(self, callback):
+        pass
+
+class TestCoverageMap(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.map = CoverageMap(size=4.0, resolution=0.5, clock=lambda: self.now[0])
+
+    def test_cell_lookup(self):
+        """Test world points map to grid cells around the centre"""
+        self.assertEqual(self.map.cells, 8)
+        self.assertEqual(self.map.cell(0.1, 0.1), (3, 4))
+        self.assertEqual(self.map.cell(-0.1, -0.1), (4, 3))
+        self.assertIsNone(self.map.cell(2.5, 0.0))
+
+    def test_visits_count_cell_entries(self):
+        """Test staying inside a cell counts once and a path marks each cell"""
+        self.map.mark_visit(0.1, 0.1)
+        self.map.mark_visit(0.2, 0.1)
+        self.assertEqual(self.map.stats()["cells_visited"], 1)
+        self.map.mark_path(0.1, 0.1, 1.6, 0.1)
+        self.assertEqual(self.map.stats()["cells_visited"], 4)
+        self.assertEqual(int(self.map.visits.sum()), 4)
+
+    def test_preferred_turn_avoids_visited_side(self):
+        """Test the less-visited side wins and a tie gives no preference"""
+        self.assertIsNone(self.map.preferred_turn(0.0, 0.0, 0.0))
+        self.map.mark_path(0.1, 0.1, 0.1, 1.4)  # Walk up the left side
+        self.assertEqual(self.map.preferred_turn(0.1, 0.0, 0.0), 'right')
+
+    def test_obstacles_discourage_direction(self):
+        """Test an obstacle seen on one side makes the other preferable"""
+        self.map.mark_obstacle(0.0, 0.0, -math.pi / 2, 0.6)
+        self.assertEqual(self.map.preferred_turn(0.0, 0.0, 0.0), 'left')
+
+    def test_obstacles_count_sightings(self):
+        """Test an obstacle kept in view counts once per sensor until the sighting ends"""
+        for _ in range(20):
+            self.map.mark_obstacle(0.0, 0.0, 0.0, 0.6, sensor='center')
+        self.map.mark_obstacle(0.0, 0.0, 0.0, 0.6, sensor='left')
+        self.assertEqual(int(self.map.obstacles.sum()), 2)
+        self.map.end_sighting('center')
+        self.map.mark_obstacle(0.0, 0.0, 0.0, 0.6, sensor='center')
+        self.assertEqual(int(self.map.obstacles.sum()), 3)
+
+    def test_coverage_per_minute(self):
+        """Test new area covered during the session is reported per minute"""
+        self.map.mark_visit(-1.9, -1.9)  # Before the session
+        self.map.start_session()
+        self.map.mark_path(0.1, 0.1, 1.9, 0.1)
+        self.now[0] = 30.0
+        stats = self.map.stats()
+        self.assertAlmostEqual(stats["coverage_per_minute_m2"], 4 * 0.25 / 0.5)
+        self.assertEqual(stats["area_covered_m2"], 5 * 0.25)
+
+class TestPatrolCoverage(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.tracker = PoseTracker(speed=0.25, turn_rate=math.pi / 2, clock=lambda: self.now[0])
+        self.motors = DriveMotors(self.tracker, self.now)
+        self.patrol = SmartPatrol(self.motors, lambda: {'left': False, 'center': False, 'right': False},
+                                  pose_tracker=self.tracker, clock=lambda: self.now[0])
+
+    def test_ticks_update_pose_and_map(self):
+        """Test driving on the tick advances the pose and marks the path"""
+        for _ in range(40):
+            self.patrol.tick()
+            self.now[0] += 0.05
+        x, y, heading = self.patrol.pose
+        self.assertAlmostEqual(x, 0.5, places=2)
+        self.assertGreater(self.patrol.coverage_stats()["cells_visited"], 1)
+
+    def test_obstacle_in_view_is_mapped_once(self):
+        """Test dwelling in front of an obstacle doesn't keep adding hits"""
+        blocked = {'left': False, 'center': True, 'right': False}
+        for _ in range(40):
+            self.patrol._map_obstacles(blocked)
+        self.assertEqual(int(self.patrol.coverage_map.obstacles.sum()), 1)
+        self.patrol._map_obstacles({'left': False, 'center': False, 'right': False})
+        self.patrol._map_obstacles(blocked)
+        self.assertEqual(int(self.patrol.coverage_map.obstacles.sum()), 2)
+
+    def test_turn_choice_favours_new_ground(self):
+        """Test an open junction is resolved towards the unvisited side"""
+        self.patrol.coverage_map.mark_path(0.0, 0.1, 0.0, 1.5)  # Left already patrolled
+        sensors = {'left': False, 'center': True, 'right': False}
+        for _ in range(10):
+            self.assertEqual(self.patrol._analyze_environment(sensors), Direction.RIGHT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from enroll import enroll, encode_parallel
+from face_store import FaceEncodingStore, FAILED
+
+def fake_encodings(path):
+    """Stands in for face_recognition: the file holds the number of faces"""
+    with open(path) as f:
+        count = int(f.read())
+    seed = sum(map(ord, os.path.basename(path)))
+    return [np.full(128, seed, dtype=np.float64)] * count
+
+def broken_encodings(path):
+    raise IOError("cannot decode image")
+
+class TestEnroll(unittest.TestCase):
+    def setUp(self):
+        self.known_faces = tempfile.mkdtemp()
+        self.add_image('alice', 'a1.jpg', 1)
+        self.add_image('alice', 'a2.jpg', 1)
+        self.add_image('bob', 'b1.jpg', 1)
+        self.add_image('bob', 'empty.jpg', 0)
+        self.add_image('bob', 'group.jpg', 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.known_faces)
+
+    def add_image(self, name, filename, faces):
+        os.makedirs(os.path.join(self.known_faces, name), exist_ok=True)
+        with open(os.path.join(self.known_faces, name, filename), 'w') as f:
+            f.write(str(faces))
+
+    def test_enroll_skips_ambiguous_images(self):
+        """Test images with zero or several faces are skipped and counted"""
+        progress = []
+        summary = enroll(self.known_faces, workers=2, encode=fake_encodings,
+                         progress=lambda *args: progress.append(args))
+        self.assertEqual(summary["encoded"], 3)
+        self.assertEqual(summary["no_face"], 1)
+        self.assertEqual(summary["multiple_faces"], 1)
+        self.assertEqual(summary["faces"], 3)
+        self.assertEqual(summary["people"], 2)
+        self.assertEqual(sorted(done for done, *_ in progress), [1, 2, 3, 4, 5])
+
+    def test_store_matches_serial_order(self):
+        """Test parallel results land in the store in scan order"""
+        enroll(self.known_faces, workers=3, encode=fake_encodings, progress=None)
+        matrix, entries = FaceEncodingStore(os.path.join(self.known_faces, '.encodings')).load()
+        names = [entry["name"] for entry in entries if entry["row"] is not None]
+        self.assertEqual(names, ['alice', 'alice', 'bob'])
+        expected = fake_encodings(os.path.join(self.known_faces, 'bob', 'b1.jpg'))[0]
+        np.testing.assert_allclose(matrix[2], expected)
+
+    def test_rerun_only_encodes_changes(self):
+        """Test a second run reuses the store and rebuild re-encodes all"""
+        enroll(self.known_faces, encode=fake_encodings, progress=None)
+        self.add_image('carol', 'c1.jpg', 1)
+        summary = enroll(self.known_faces, encode=fake_encodings, progress=None)
+        self.assertEqual(summary["added"], 1)
+        self.assertEqual(summary["encoded"], 1)
+        summary = enroll(self.known_faces, encode=fake_encodings, progress=None, rebuild=True)
+        self.assertEqual(summary["added"], 6)
+
+    def test_encode_failures_are_counted(self):
+        """Test an image that fails to decode doesn't abort enrollment"""
+        path = os.path.join(self.known_faces, 'alice', 'a1.jpg')
+        encodings, summary = encode_parallel([path], workers=1, encode=broken_encodings)
+        self.assertIs(encodings[0], FAILED)
+        self.assertEqual(summary["failed"], 1)
+
+    def test_failed_images_are_retried(self):
+        """Test a failure isn't cached, so the next run encodes the image again"""
+        summary = enroll(self.known_faces, encode=broken_encodings, progress=None)
+        self.assertEqual(summary["failed"], 5)
+        self.assertEqual(summary["faces"], 0)
+        summary = enroll(self.known_faces, encode=fake_encodings, progress=None)
+        self.assertEqual(summary["added"], 5)
+        self.assertEqual(summary["faces"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import json
+import threading
+import time
+from event_stream import StatusPublisher, format_sse, sse_events
+
+def parse_sse(chunk):
+    """Return (event, data) for one formatted event"""
+    lines = chunk.strip().split('\n')
+    return lines[0][len('event: '):], json.loads(lines[1][len('data: '):])
+
+class TestStatusPublisher(unittest.TestCase):
+    def setUp(self):
+        self.reads = 0
+        self.sensors = {'center': False}
+        self.patrol = {'is_patrolling': False}
+
+        def read_sensors():
+            self.reads += 1
+            return dict(self.sensors)
+
+        self.publisher = StatusPublisher({'sensors': read_sensors, 'patrol': lambda: dict(self.patrol)},
+                                         interval=0.01)
+
+    def tearDown(self):
+        self.publisher.stop()
+
+    def test_only_changes_bump_version(self):
+        """Test unchanged snapshots publish nothing"""
+        self.assertTrue(self.publisher.poll())
+        self.assertFalse(self.publisher.poll())
+        self.sensors['center'] = True
+        self.assertTrue(self.publisher.poll())
+        version, changes = self.publisher.wait_for_change(1, timeout=0)
+        self.assertEqual(version, 2)
+        self.assertEqual(changes, {'sensors': {'center': True}})
+
+    def test_stream_sends_state_then_changes(self):
+        """Test a stream starts with the full state and then pushes changes quickly"""
+        self.publisher.start()
+        stream = sse_events(self.publisher, heartbeat=1.0)
+        event, data = parse_sse(next(stream))
+        self.assertEqual(event, 'status')
+        self.assertEqual(set(data), {'sensors', 'patrol'})
+
+        timer = threading.Timer(0.05, lambda: self.patrol.update(is_patrolling=True))
+        timer.start()
+        start = time.monotonic()
+        event, data = parse_sse(next(stream))
+        self.assertEqual(data, {'patrol': {'is_patrolling': True}})
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_many_streams_share_one_poll_loop(self):
+        """Test sources are read by the poll loop, not per stream"""
+        self.publisher.start()
+        streams = [sse_events(self.publisher, heartbeat=0.05) for _ in range(10)]
+        for stream in streams:
+            next(stream)
+        time.sleep(0.1)
+        # ~10 polls in 0.1 s at 100 Hz, however many streams are open
+        self.assertLess(self.reads, 30)
+
+    def test_heartbeat_when_idle(self):
+        """Test a quiet stream sends keepalive comments"""
+        self.publisher.start()
+        stream = sse_events(self.publisher, heartbeat=0.05)
+        next(stream)
+        self.assertEqual(next(stream), ": keepalive\n\n")
+
+    def test_failing_source_is_skipped(self):
+        """Test one broken source doesn't stop the others"""
+        def broken():
+            raise IOError("sensor gone")
+        publisher = StatusPublisher({'broken': broken, 'patrol': lambda: {'ok': True}})
+        self.assertTrue(publisher.poll())
+        self.assertEqual(publisher.snapshot()[1], {'patrol': {'ok': True}})
+
+    def test_format(self):
+        self.assertEqual(format_sse('status', {'a': 1}), 'event: status\ndata: {"a": 1}\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
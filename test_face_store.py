@@ -0,0 +1,278 @@
+import unittest
+import os
+import pickle
+import tempfile
+import numpy as np
+from face_store import (FaceEncodingStore, FaceGallery, GalleryWatcher, scan_images, single_face, FAILED,
+                        RETRY_DELAY)
+
+class TestFaceEncodingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.faces_dir = os.path.join(self.tmp.name, 'known_faces')
+        self.store = FaceEncodingStore(os.path.join(self.tmp.name, 'cache'))
+        self.encoded = []
+        self.add_image('alice', 'a1.jpg', b'alice one')
+        self.add_image('alice', 'a2.png', b'alice two')
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.add_image('bob', 'notes.txt', b'not an image')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_image(self, name, filename, data):
+        person_dir = os.path.join(self.faces_dir, name)
+        os.makedirs(person_dir, exist_ok=True)
+        with open(os.path.join(person_dir, filename), 'wb') as f:
+            f.write(data)
+
+    def fake_encode_many(self, paths):
+        """Derive a deterministic encoding from the file size; 'noface' files have none"""
+        self.encoded.extend(os.path.basename(path) for path in paths)
+        encodings = []
+        for path in paths:
+            if 'noface' in path:
+                encodings.append(None)
+            elif 'broken' in path:
+                encodings.append(FAILED)
+            else:
+                encodings.append(np.full(128, os.path.getsize(path), dtype=np.float64))
+        return encodings
+
+    def test_scan_images(self):
+        """Test only images inside person directories are listed"""
+        paths = [image["path"] for image in scan_images(self.faces_dir)]
+        self.assertEqual(paths, [os.path.join('alice', 'a1.jpg'),
+                                 os.path.join('alice', 'a2.png'),
+                                 os.path.join('bob', 'b1.jpg')])
+
+    def test_first_sync_encodes_everything(self):
+        """Test an empty store encodes every image once"""
+        matrix, names, changes = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(matrix.shape, (3, 128))
+        self.assertEqual(names, ['alice', 'alice', 'bob'])
+        self.assertEqual(changes["added"], 3)
+        self.assertEqual(sorted(self.encoded), ['a1.jpg', 'a2.png', 'b1.jpg'])
+
+    def test_second_sync_is_memory_mapped(self):
+        """Test an unchanged directory loads from the store without encoding"""
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.encoded.clear()
+        matrix, names, changes = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, [])
+        self.assertIsInstance(matrix, np.memmap)
+        self.assertEqual(changes["unchanged"], 3)
+        self.assertEqual(matrix[2, 0], len(b'bob'))
+
+    def test_only_new_changed_and_removed_images_are_processed(self):
+        """Test incremental sync re-encodes only what changed on disk"""
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.encoded.clear()
+        self.add_image('carol', 'c1.jpg', b'carol')
+        self.add_image('bob', 'b1.jpg', b'bob, retaken')
+        os.remove(os.path.join(self.faces_dir, 'alice', 'a2.png'))
+
+        matrix, names, changes = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(sorted(self.encoded), ['b1.jpg', 'c1.jpg'])
+        self.assertEqual(changes, {"added": 1, "changed": 1, "removed": 1, "unchanged": 1, "failed": 0})
+        self.assertEqual(names, ['alice', 'bob', 'carol'])
+        self.assertEqual(list(matrix[:, 0]), [len(b'alice one'), len(b'bob, retaken'), len(b'carol')])
+
+    def test_images_without_faces_are_remembered(self):
+        """Test an image with no face is not re-encoded on the next sync"""
+        self.add_image('bob', 'noface.jpg', b'empty corridor')
+        matrix, names, _ = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(len(names), 3)
+        self.encoded.clear()
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, [])
+
+    def test_failed_images_are_retried(self):
+        """Test a failed image is retried after the backoff or once the file changes"""
+        now = [0.0]
+        self.store.clock = lambda: now[0]
+        self.add_image('bob', 'broken.jpg', b'truncated')
+        matrix, names, changes = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(changes["failed"], 1)
+        self.assertEqual(len(names), 3)
+        self.encoded.clear()
+        updates = self.store.updates
+        _, _, changes = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, [])  # Unchanged and still backing off
+        self.assertEqual(changes["failed"], 1)
+        now[0] = RETRY_DELAY
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, ['broken.jpg'])
+        self.assertEqual(self.store.updates, updates)  # Only failures: store not rewritten
+        now[0] = RETRY_DELAY + 1.0  # Backoff has doubled...
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, ['broken.jpg'])
+        self.add_image('bob', 'broken.jpg', b'truncated again')  # ...but a new file is tried at once
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(self.encoded, ['broken.jpg', 'broken.jpg'])
+
+    def test_single_face_rule(self):
+        """Test only an image with exactly one face is enrolled"""
+        face = np.zeros(128)
+        self.assertIs(single_face([face], 'a.jpg')[0], face)
+        self.assertEqual(single_face([], 'a.jpg'), (None, "no_face"))
+        self.assertEqual(single_face([face, face], 'a.jpg'), (None, "multiple_faces"))
+
+    def test_unwritable_store_still_returns_encodings(self):
+        """Test a store that cannot be written is skipped with the encodings kept in memory"""
+        blocker = os.path.join(self.tmp.name, 'read_only')
+        with open(blocker, 'w') as f:
+            f.write('not a directory')  # Any write below it fails, even as root
+        store = FaceEncodingStore(os.path.join(blocker, 'cache'))
+        with self.assertLogs('face_store', level='WARNING'):
+            matrix, names, changes = store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(names, ['alice', 'alice', 'bob'])
+        self.assertEqual(matrix.shape, (3, 128))
+        self.assertEqual(changes["added"], 3)
+
+    def test_corrupt_store_is_rebuilt(self):
+        """Test an unreadable index falls back to a full encode"""
+        self.store.sync(self.faces_dir, self.fake_encode_many)
+        with open(self.store.index_path, 'w') as f:
+            f.write('{not json')
+        self.encoded.clear()
+        matrix, names, _ = self.store.sync(self.faces_dir, self.fake_encode_many)
+        self.assertEqual(len(self.encoded), 3)
+        self.assertEqual(matrix.shape, (3, 128))
+
+class TestFaceGallery(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.known = rng.normal(size=(50, 128)) * 0.1
+        self.names = [f"person{i}" for i in range(50)]
+        self.gallery = FaceGallery(self.known, self.names)
+
+    def test_matrix_is_contiguous_float32(self):
+        """Test known encodings are held as one float32 block"""
+        self.assertEqual(self.gallery.encodings.dtype, np.float32)
+        self.assertTrue(self.gallery.encodings.flags['C_CONTIGUOUS'])
+
+    def test_distances_match_direct_computation(self):
+        """Test the batched distances agree with a per-pair norm"""
+        faces = self.known[[3, 7]] + 0.01
+        expected = np.linalg.norm(faces[:, None, :] - self.known[None, :, :], axis=2)
+        np.testing.assert_allclose(self.gallery.distances(faces), expected, atol=1e-4)
+
+    def test_match_returns_closest_not_first(self):
+        """Test the best match wins even when an earlier face is also in tolerance"""
+        known = np.zeros((2, 128))
+        known[1, 0] = 0.1
+        gallery = FaceGallery(known, ['first', 'closest'])
+        face = np.zeros(128)
+        face[0] = 0.09
+        [(name, distance)] = gallery.match([face], tolerance=0.6)
+        self.assertEqual(name, 'closest')
+        self.assertAlmostEqual(distance, 0.01, places=4)
+
+    def test_unknown_and_empty(self):
+        """Test far faces are Unknown and an empty gallery matches nobody"""
+        far = np.full(128, 5.0)
+        self.assertEqual(self.gallery.match([far])[0][0], "Unknown")
+        empty = FaceGallery(np.empty((0, 128)), [])
+        self.assertEqual(empty.match([far]), [("Unknown", None)])
+        self.assertEqual(self.gallery.match([]), [])
+
+def size_encodings(paths):
+    """Module-level encode_many so the watcher can be pickled"""
+    return [np.full(128, os.path.getsize(path), dtype=np.float64) for path in paths]
+
+class TestGalleryWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.faces_dir = os.path.join(self.tmp.name, 'known_faces')
+        self.now = [0.0]
+        self.watcher = GalleryWatcher(self.faces_dir, size_encodings, interval=2.0,
+                                      clock=lambda: self.now[0])
+        self.add_image('alice', 'a1.jpg', b'alice')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_image(self, name, filename, data):
+        person_dir = os.path.join(self.faces_dir, name)
+        os.makedirs(person_dir, exist_ok=True)
+        with open(os.path.join(person_dir, filename), 'wb') as f:
+            f.write(data)
+
+    def test_swaps_gallery_on_change_only(self):
+        """Test a new person appears after a check and nothing reloads otherwise"""
+        first = self.watcher.current()
+        self.assertEqual(first.names, ['alice'])
+        self.assertFalse(self.watcher.check())
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.gallery.names, ['alice', 'bob'])
+        self.assertEqual(first.names, ['alice'])  # Old readers keep their gallery
+        self.assertEqual(self.watcher.version, 2)
+        self.assertEqual(self.watcher.last_changes["added"], 1)
+        self.assertEqual(self.watcher.last_changes["unchanged"], 1)
+
+    def test_removed_images_leave_gallery(self):
+        """Test deleting an image drops it from the gallery"""
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.watcher.check()
+        os.remove(os.path.join(self.faces_dir, 'alice', 'a1.jpg'))
+        self.watcher.check()
+        self.assertEqual(self.watcher.gallery.names, ['bob'])
+
+    def test_failed_image_is_retried_on_next_check(self):
+        """Test a check after a failed encode tries the image again"""
+        failing = [True]
+        self.watcher.encode_many = lambda paths: [FAILED if failing[0] else encoding
+                                                  for encoding in size_encodings(paths)]
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.watcher.check()
+        self.assertEqual(self.watcher.gallery.names, [])
+        failing[0] = False
+        self.assertFalse(self.watcher.check())  # Backing off
+        self.now[0] = RETRY_DELAY
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.watcher.gallery.names, ['alice', 'bob'])
+
+    def test_unreadable_image_does_not_reload_every_check(self):
+        """Test a permanently failing image neither rewrites the store nor swaps the gallery"""
+        encoded = []
+
+        def encode_many(paths):
+            encoded.extend(paths)
+            return [FAILED if 'corrupt' in path else encoding
+                    for path, encoding in zip(paths, size_encodings(paths))]
+
+        self.watcher.encode_many = encode_many
+        self.add_image('bob', 'corrupt.jpg', b'garbage')
+        self.assertTrue(self.watcher.check())
+        store_mtime = os.stat(self.watcher.store.index_path).st_mtime_ns
+        for _ in range(5):
+            self.now[0] += 2.0
+            self.assertFalse(self.watcher.check())
+        self.now[0] += RETRY_DELAY
+        self.assertFalse(self.watcher.check())  # Retried once, failed again
+        self.assertEqual(self.watcher.version, 1)
+        self.assertEqual(len([path for path in encoded if 'corrupt' in path]), 2)
+        self.assertEqual(os.stat(self.watcher.store.index_path).st_mtime_ns, store_mtime)
+        self.assertEqual(self.watcher.gallery.names, ['alice'])
+
+    def test_current_checks_when_interval_elapsed(self):
+        """Test current() rechecks only once the interval has passed"""
+        self.watcher.current()
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.now[0] = 1.0
+        self.assertEqual(len(self.watcher.current()), 1)
+        self.now[0] = 2.5
+        self.assertEqual(len(self.watcher.current()), 2)
+
+    def test_pickled_copy_keeps_watching(self):
+        """Test a copy sent to a worker process can reload on its own"""
+        watcher = GalleryWatcher(self.faces_dir, size_encodings, interval=0.0)
+        watcher.current()
+        copy = pickle.loads(pickle.dumps(watcher))
+        self.add_image('bob', 'b1.jpg', b'bob')
+        self.assertEqual(len(copy.current()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
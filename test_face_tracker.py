@@ -0,0 +1,94 @@
+import unittest
+import functools
+import pickle
+import numpy as np
+from face_tracker import FaceTracker, box_iou, track_faces
+
+def make_frame(top, left, size=60, height=240, width=320):
+    """Grey frame with a textured square standing in for a face"""
+    frame = np.full((height, width, 3), 90, dtype=np.uint8)
+    rng = np.random.default_rng(1)
+    patch = rng.integers(0, 255, size=(size, size, 1), dtype=np.uint8)
+    frame[top:top + size, left:left + size] = patch
+    return frame
+
+class FakeRecognizer:
+    """Reports the square as 'alice' wherever it currently is"""
+    def __init__(self):
+        self.position = (50, 50)
+        self.calls = 0
+
+    def __call__(self, frame):
+        self.calls += 1
+        top, left = self.position
+        return [(top, left + 60, top + 60, left, 'alice', 0.3)]
+
+class TestFaceTracker(unittest.TestCase):
+    def setUp(self):
+        self.recognizer = FakeRecognizer()
+        self.tracker = FaceTracker(self.recognizer, detect_every=5)
+
+    def test_box_iou(self):
+        """Test IoU of identical, disjoint and half-overlapping boxes"""
+        self.assertEqual(box_iou((0, 10, 10, 0), (0, 10, 10, 0)), 1.0)
+        self.assertEqual(box_iou((0, 10, 10, 0), (20, 30, 30, 20)), 0.0)
+        self.assertAlmostEqual(box_iou((0, 10, 10, 0), (0, 15, 10, 5)), 1 / 3)
+
+    def test_recognizes_only_every_n_frames(self):
+        """Test full recognition is skipped on intermediate frames"""
+        for _ in range(10):
+            faces = self.tracker.update(make_frame(50, 50))
+        self.assertEqual(self.recognizer.calls, 2)
+        self.assertEqual(faces, [(50, 110, 110, 50, 'alice')])
+
+    def test_follows_moving_face_between_recognitions(self):
+        """Test the box moves with the face and keeps its name and id"""
+        self.tracker.update(make_frame(50, 50))
+        track_id = self.tracker.tracks[0].id
+        for step in range(1, 4):
+            faces = self.tracker.update(make_frame(50 + 4 * step, 50 + 6 * step))
+        top, right, bottom, left, name = faces[0]
+        self.assertLessEqual(abs(top - 62), 2)
+        self.assertLessEqual(abs(left - 68), 2)
+        self.assertEqual(name, 'alice')
+        self.assertEqual(self.recognizer.calls, 1)
+
+        # The next recognition keeps the same track id for the same face
+        self.recognizer.position = (62, 68)
+        self.tracker.update(make_frame(62, 68))
+        self.tracker.update(make_frame(62, 68))
+        self.assertEqual(self.recognizer.calls, 2)
+        self.assertEqual(self.tracker.tracks[0].id, track_id)
+
+    def test_lost_track_triggers_recognition(self):
+        """Test a face that disappears forces recognition on the next frame"""
+        self.tracker.update(make_frame(50, 50))
+        empty = np.full((240, 320, 3), 90, dtype=np.uint8)
+        self.recognizer.position = (50, 50)
+        self.tracker.update(empty)  # Tracking fails here
+        self.assertEqual(self.recognizer.calls, 1)
+        self.tracker.update(empty)
+        self.assertEqual(self.recognizer.calls, 2)
+
+def fixed_faces(frame, name):
+    """Module-level recognizer, so partials of it pickle"""
+    return [(50, 110, 110, 50, name)]
+
+class TestTrackFaces(unittest.TestCase):
+    def test_keeps_one_tracker_per_recognizer(self):
+        """Test track_faces tracks between recognitions like a FaceTracker would"""
+        recognizer = FakeRecognizer()
+        recognize = functools.partial(track_faces, recognizer, detect_every=5)
+        for _ in range(10):
+            faces = recognize(make_frame(50, 50))
+        self.assertEqual(recognizer.calls, 2)
+        self.assertEqual(faces, [(50, 110, 110, 50, 'alice')])
+
+    def test_partial_pickles_for_process_mode(self):
+        """Test the recognizer a process-mode RecognitionWorker is given survives pickling"""
+        recognize = pickle.loads(pickle.dumps(
+            functools.partial(track_faces, functools.partial(fixed_faces, name='bob'))))
+        self.assertEqual(recognize(make_frame(50, 50)), [(50, 110, 110, 50, 'bob')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -61,6 +61,23 @@ class TestFaceRecognition(unittest.TestCase):
                 self.assertIsInstance(face[3], int)  # left
                 self.assertIsInstance(face[4], str)  # name
 
+    def test_identify_faces_downscaled(self):
+        """Test detection on a downscaled frame returns full-resolution boxes"""
+        known_encodings, known_names = load_known_faces(self.test_dir)
+
+        for filename, test_image in self.test_images:
+            height, width = test_image.shape[:2]
+            full = identify_faces(test_image, known_encodings, known_names)
+            scaled = identify_faces(test_image, known_encodings, known_names, detection_scale=0.5)
+
+            self.assertGreater(len(scaled), 0, f"No faces found in {filename} at half scale")
+            for (top, right, bottom, left, name) in scaled:
+                self.assertTrue(0 <= top < bottom <= height)
+                self.assertTrue(0 <= left < right <= width)
+            # Boxes should land close to the full-resolution ones
+            if full:
+                self.assertLess(abs(scaled[0][0] - full[0][0]), height * 0.1)
+
     def test_identify_faces_no_faces(self):
         """Test face identification with no faces in frame"""
         # Load known faces
@@ -0,0 +1,60 @@
+import unittest
+import hardware
+from hardware import SimulatedGPIO, is_simulated
+import sensors
+
+class TestSimulatedGPIO(unittest.TestCase):
+    def setUp(self):
+        self.gpio = SimulatedGPIO()
+        self.gpio.setmode(SimulatedGPIO.BCM)
+
+    def test_outputs_are_recorded(self):
+        """Test single and batched writes land in the output log"""
+        self.gpio.setup([4, 17], SimulatedGPIO.OUT)
+        self.gpio.output(4, SimulatedGPIO.HIGH)
+        self.gpio.output([4, 17], [SimulatedGPIO.LOW, SimulatedGPIO.HIGH])
+        self.assertEqual(self.gpio.output_calls, 2)
+        self.assertEqual([(pin, level) for _, pin, level in self.gpio.output_log],
+                         [(4, 1), (4, 0), (17, 1)])
+        self.assertEqual(self.gpio.levels[17], SimulatedGPIO.HIGH)
+
+    def test_scripted_inputs(self):
+        """Test inputs follow set_input and input scripts"""
+        self.gpio.setup(15, SimulatedGPIO.IN)
+        self.assertEqual(self.gpio.gpio_function(15), SimulatedGPIO.IN)
+        self.gpio.set_input(15, 1)
+        self.assertEqual(self.gpio.input(15), 1)
+        self.gpio.input_script(15, lambda: False)
+        self.assertEqual(self.gpio.input(15), 0)
+
+    def test_edge_callbacks(self):
+        """Test edge detection fires only for the requested transitions"""
+        edges = []
+        self.gpio.setup(24, SimulatedGPIO.IN)
+        self.gpio.add_event_detect(24, SimulatedGPIO.RISING, callback=edges.append)
+        self.gpio.set_input(24, 1)
+        self.gpio.set_input(24, 1)  # No transition
+        self.gpio.set_input(24, 0)  # Falling edge, not watched
+        self.assertEqual(edges, [24])
+
+    def test_pwm_duty_cycle(self):
+        """Test PWM duty cycle changes are visible on the pin bank"""
+        pwm = self.gpio.PWM(18, 1000)
+        pwm.start(0)
+        pwm.ChangeDutyCycle(40)
+        self.assertEqual(self.gpio.duty_cycles[18], 40)
+
+class TestSimulatedSensors(unittest.TestCase):
+    @unittest.skipUnless(is_simulated(), "Needs the simulated GPIO backend")
+    def test_ultrasonic_against_simulated_echo(self):
+        """Test edge-timed ranging measures a simulated echo"""
+        distance = [50.0]
+        hardware.GPIO.simulate_ultrasonic(sensors.TRIG_PIN, sensors.ECHO_PIN, lambda: distance[0])
+        reading = sensors.read_ultrasonic_distance_median(samples=5, interval=0, timeout=0.1)
+        self.assertAlmostEqual(reading, 50.0, delta=5.0)
+
+        distance[0] = None  # Nothing in range: no echo
+        self.assertIsNone(sensors.read_ultrasonic_distance(timeout=0.05))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from motion import MotionDetector
+
+def still_frame():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[:, :320] = 80  # Some static structure
+    return frame
+
+class TestMotionDetector(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.detector = MotionDetector(hold=1.0, clock=lambda: self.now[0])
+
+    def test_still_scene_scores_zero(self):
+        """Test identical frames give no motion once the hold expires"""
+        for _ in range(5):
+            self.assertEqual(self.detector.update(still_frame()), 0.0)
+        self.now[0] = 1.5
+        self.assertFalse(self.detector.active())
+
+    def test_moving_object_scores_and_holds(self):
+        """Test a new object raises the score and keeps the gate open for hold seconds"""
+        self.detector.update(still_frame())
+        self.now[0] = 5.0
+        self.assertFalse(self.detector.active())
+        frame = still_frame()
+        frame[100:300, 400:560] = 255
+        score = self.detector.update(frame)
+        self.assertGreater(score, 0.05)
+        self.assertTrue(self.detector.active())
+        self.now[0] = 5.9
+        self.assertTrue(self.detector.active())
+        self.now[0] = 6.1
+        self.assertFalse(self.detector.active())
+
+    def test_small_noise_is_ignored(self):
+        """Test sensor noise below the threshold doesn't count as motion"""
+        self.detector.update(still_frame())
+        noisy = still_frame().astype(np.int16) + np.random.RandomState(0).randint(-5, 6, (480, 640, 3))
+        self.assertEqual(self.detector.update(noisy.clip(0, 255).astype(np.uint8)), 0.0)
+
+    def test_analyses_downscaled_frame(self):
+        """Test the background is kept at the reduced width"""
+        self.detector.update(still_frame())
+        self.assertEqual(self.detector._background.shape, (120, 160))
+        self.assertEqual(self.detector.stats()["frames_analyzed"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
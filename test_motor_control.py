@@ -1,4 +1,7 @@
 import unittest
+import time
+from unittest.mock import patch
+import motor_control
 from motor_control import forward, backward
 
 class TestMotorControl(unittest.TestCase):
@@ -10,5 +13,73 @@ class TestMotorControl(unittest.TestCase):
         # Implement a test for the backward function
         self.assertIsNone(backward(50, 1))  # Example assertion
 
+    @patch('motor_control.GPIO.output')
+    def test_direction_change_is_one_batched_write(self, mock_output):
+        """Test a move sets all changed pins in a single GPIO.output call"""
+        motor_control.drive('forward')
+        mock_output.reset_mock()
+
+        motor_control.drive('backward')
+        self.assertEqual(mock_output.call_count, 1)
+        pins, levels = mock_output.call_args[0]
+        self.assertEqual(len(pins), 8)  # Every IN pin flips
+        self.assertEqual(len(levels), 8)
+
+    @patch('motor_control.GPIO.output')
+    def test_unchanged_pins_are_skipped(self, mock_output):
+        """Test repeating a move writes nothing and stop only writes what changed"""
+        motor_control.drive('forward')
+        mock_output.reset_mock()
+        writes_before = motor_control.gpio_stats()["gpio_writes"]
+
+        motor_control.drive('forward')
+        mock_output.assert_not_called()
+
+        motor_control.stop()
+        pins, levels = mock_output.call_args[0]
+        # Going from forward to stop only drops the four IN1 pins
+        self.assertEqual(sorted(pins), sorted(IN1 for IN1, IN2 in motor_control.MOTOR_PINS))
+        self.assertEqual(motor_control.gpio_stats()["gpio_writes"], writes_before + 1)
+
+    def test_side_speeds(self):
+        """Test speed and steer map to per-side duty cycles"""
+        self.assertEqual(motor_control.side_speeds(), (100.0, 100.0))
+        self.assertEqual(motor_control.side_speeds(60), (60.0, 60.0))
+        self.assertEqual(motor_control.side_speeds(60, steer=0.5), (60.0, 30.0))
+        self.assertEqual(motor_control.side_speeds(60, steer=-1.0), (0.0, 60.0))
+        self.assertEqual(motor_control.side_speeds(150), (100.0, 100.0))
+
+    def test_speed_ramps_up_and_stops_immediately(self):
+        """Test acceleration is ramped but stopping cuts power at once"""
+        motor_control.stop()
+        motor_control.drive('forward', speed=80, steer=0.5)
+        state = motor_control.motor_state()
+        self.assertEqual(state["target_duty"], [80.0, 40.0, 80.0, 40.0])
+        self.assertLess(max(state["duty"]), 80.0)
+
+        time.sleep(motor_control.RAMP_TIME + 0.1)
+        self.assertEqual(motor_control.motor_state()["duty"], [80.0, 40.0, 80.0, 40.0])
+
+        motor_control.stop()
+        self.assertEqual(motor_control.motor_state()["duty"], [0.0, 0.0, 0.0, 0.0])
+
+    def test_motion_listener_sees_signed_side_duty(self):
+        """Test listeners get every speed change, ramp steps included, with a timestamp"""
+        events = []
+        listener = lambda timestamp, left, right: events.append((timestamp, left, right))
+        motor_control.stop()
+        motor_control.add_motion_listener(listener)
+        try:
+            motor_control.drive('left', speed=60)
+            time.sleep(motor_control.RAMP_TIME + 0.1)
+            motor_control.stop()
+        finally:
+            motor_control.remove_motion_listener(listener)
+        self.assertGreater(len(events), 3)  # Ramp steps are reported too
+        self.assertIn((-60.0, 60.0), [(left, right) for _, left, right in events])
+        self.assertEqual(events[-1][1:], (0.0, 0.0))
+        timestamps = [timestamp for timestamp, _, _ in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
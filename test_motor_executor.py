@@ -0,0 +1,86 @@
+import unittest
+import time
+from motor_executor import MotorExecutor
+
+class RecordingMotors:
+    """Stands in for motor_control and records every call"""
+    def __init__(self):
+        self.calls = []
+
+    def drive(self, direction, speed=None, steer=0.0):
+        if direction == 'stop':
+            self.stop()
+        else:
+            self.calls.append(direction)
+
+    def stop(self):
+        self.calls.append('stop')
+
+class TestMotorExecutor(unittest.TestCase):
+    def setUp(self):
+        self.motors = RecordingMotors()
+        self.executor = MotorExecutor(self.motors, tick=0.01)
+        self.executor.start()
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def wait_for_state(self, command_id, state, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.executor.status(command_id)['state'] == state:
+                return True
+            time.sleep(0.005)
+        return False
+
+    def test_submit_returns_immediately(self):
+        """Test a long move does not block the caller"""
+        start = time.monotonic()
+        command_id = self.executor.submit('forward', duration=5.0)
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertTrue(self.wait_for_state(command_id, 'running'))
+        self.assertEqual(self.executor.status()['id'], command_id)
+
+    def test_move_stops_after_duration(self):
+        """Test the motors are stopped when a move's time is up"""
+        command_id = self.executor.submit('backward', duration=0.05)
+        self.assertTrue(self.wait_for_state(command_id, 'done'))
+        self.assertEqual(self.motors.calls, ['backward', 'stop'])
+        self.assertIsNone(self.executor.status())
+
+    def test_stop_preempts_running_move(self):
+        """Test stop interrupts a move well before its duration"""
+        command_id = self.executor.submit('forward', duration=5.0)
+        self.assertTrue(self.wait_for_state(command_id, 'running'))
+        start = time.monotonic()
+        stop_id = self.executor.stop()
+        self.assertTrue(self.wait_for_state(command_id, 'preempted'))
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(self.executor.status(stop_id)['state'], 'done')
+        self.assertEqual(self.motors.calls[-1], 'stop')
+
+    def test_new_command_preempts_and_cancels_queue(self):
+        """Test a preempting command replaces the running and queued ones"""
+        first = self.executor.submit('forward', duration=5.0)
+        queued = self.executor.submit('left', duration=5.0, preempt=False)
+        self.assertTrue(self.wait_for_state(first, 'running'))
+        latest = self.executor.submit('right', duration=5.0)
+        self.assertTrue(self.wait_for_state(latest, 'running'))
+        self.assertEqual(self.executor.status(first)['state'], 'preempted')
+        self.assertEqual(self.executor.status(queued)['state'], 'cancelled')
+        self.assertNotIn('left', self.motors.calls)
+
+    def test_queued_command_runs_after_current(self):
+        """Test preempt=False waits for the running move to finish"""
+        first = self.executor.submit('forward', duration=0.05)
+        second = self.executor.submit('left', duration=0.05, preempt=False)
+        self.assertTrue(self.wait_for_state(second, 'done'))
+        self.assertEqual(self.executor.status(first)['state'], 'done')
+        self.assertEqual(self.motors.calls, ['forward', 'stop', 'left', 'stop'])
+
+    def test_unknown_command_id(self):
+        """Test status of an unknown id is None"""
+        self.assertIsNone(self.executor.status(12345))
+
+if __name__ == '__main__':
+    unittest.main()
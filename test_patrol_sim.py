@@ -0,0 +1,94 @@
+import unittest
+import math
+from patrol_sim import FloorPlan, SimClock, SimMotors, SimSensors, Simulation, NoCoveragePatrol, compare
+
+ROOM = """
+##########
+#........#
+#...R....#
+#........#
+##########
+"""
+
+class TestFloorPlan(unittest.TestCase):
+    def setUp(self):
+        self.floor = FloorPlan.from_text(ROOM, cell_size=0.5)
+
+    def test_parse(self):
+        """Test walls, the start cell and the world frame"""
+        self.assertEqual((self.floor.rows, self.floor.cols), (5, 10))
+        self.assertEqual(self.floor.start, (2.25, 1.25))
+        self.assertEqual(self.floor.free_cells(), 24)
+        self.assertTrue(self.floor.blocked(0.2, 1.0))
+        self.assertFalse(self.floor.blocked(1.0, 1.0))
+        self.assertTrue(self.floor.blocked(-1.0, 1.0))  # Off the grid
+
+    def test_ray_distance(self):
+        """Test rays stop at the first wall and give up beyond their range"""
+        x, y = self.floor.start
+        self.assertAlmostEqual(self.floor.distance(x, y, 0.0, 10.0), 4.5 - x)
+        self.assertAlmostEqual(self.floor.distance(x, y, math.pi / 2, 10.0), 2.0 - y)
+        self.assertAlmostEqual(self.floor.distance(x, y, math.pi, 10.0), x - 0.5)
+        self.assertIsNone(self.floor.distance(x, y, 0.0, 1.0))
+
+class TestSimRobot(unittest.TestCase):
+    def setUp(self):
+        self.floor = FloorPlan.from_text(ROOM, cell_size=0.5)
+        self.clock = SimClock()
+        self.robot = SimMotors(self.floor, self.clock, speed=0.25, turn_rate=math.pi / 2, slip=0.0)
+        self.motions = []
+        self.robot.add_motion_listener(lambda *args: self.motions.append(args))
+
+    def test_timed_move_runs_on_virtual_time(self):
+        """Test a timed move advances the clock, moves the robot and reports to listeners"""
+        self.robot.forward(duration=2.0)
+        self.assertEqual(self.clock(), 2.0)
+        self.assertAlmostEqual(self.robot.x, 2.75)
+        self.assertEqual(self.motions, [(0.0, 100.0, 100.0), (2.0, 0.0, 0.0)])
+        self.robot.turn_left(duration=1.0)
+        self.assertAlmostEqual(self.robot.heading, math.pi / 2)
+
+    def test_wall_stops_robot_once(self):
+        """Test driving into a wall holds the robot there and counts one collision"""
+        self.robot.forward(duration=20.0)
+        self.assertLess(self.robot.x, 4.5 - self.robot.radius + 1e-9)
+        self.assertEqual(self.robot.collisions, 1)
+        self.assertGreater(self.robot.wedged_time, 10.0)
+
+    def test_sensors_see_wall(self):
+        """Test IR and ultrasonic readings near a wall"""
+        sensors = SimSensors(self.floor, self.robot)
+        reading = sensors.read()
+        self.assertFalse(reading['center'])
+        self.assertAlmostEqual(reading['distance'], (4.5 - 2.25 - self.robot.radius) * 100.0)
+        self.robot.forward(duration=7.6)
+        reading = sensors.read()
+        self.assertTrue(reading['center'])
+        self.assertLess(reading['distance'], 30)
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.floor = FloorPlan.from_text(ROOM, cell_size=0.5)
+
+    def test_runs_faster_than_real_time(self):
+        """Test a patrol runs its real loop on virtual time and reports metrics"""
+        metrics = Simulation(self.floor, seed=1).run(300.0)
+        self.assertAlmostEqual(metrics["sim_seconds"], 300.0, delta=0.1)
+        self.assertGreater(metrics["speedup"], 20)
+        self.assertEqual(metrics["ticks"], 6000)
+        self.assertGreater(metrics["coverage"], 0.3)
+        self.assertGreater(metrics["distance_m"], 10.0)
+
+    def test_same_seed_same_run(self):
+        """Test runs are reproducible from the seed"""
+        first = Simulation(self.floor, seed=3).run(120.0)
+        second = Simulation(self.floor, seed=3).run(120.0)
+        for key in ("coverage", "collisions", "stuck_events", "distance_m", "pose_error_m"):
+            self.assertEqual(first[key], second[key])
+
+    def test_compare_strategies(self):
+        results = compare(self.floor, {'no_coverage': NoCoveragePatrol}, 30.0, seeds=(0, 1))
+        self.assertEqual(len(results['no_coverage']), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+from coverage_map import CoverageMap
+from pose import PoseTracker
+from smart_patrol import SmartPatrol
+from patrol_sim import FloorPlan, SimClock, SimMotors, SimSensors
+from patrol_trace import (TraceRecorder, read_trace, replay, SensorReading, MotorCommand, WheelSpeeds,
+                          PatrolEnd)
+
+ROOM = """
+############
+#..........#
+#...R......#
+#.....##...#
+#..........#
+############
+"""
+
+class TestTraceRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.floor = FloorPlan.from_text(ROOM, cell_size=0.5)
+        self.clock = SimClock(100.0)
+        self.robot = SimMotors(self.floor, self.clock, slip=0.05)
+        self.sensors = SimSensors(self.floor, self.robot)
+        self.recorder = TraceRecorder(self.robot, self.sensors.read, directory=self.dir, clock=self.clock)
+        self.tracker = PoseTracker(clock=self.clock)
+        self.robot.add_motion_listener(self.tracker.on_motion)
+        self.patrol = SmartPatrol(self.recorder.motors, self.recorder.read_sensors,
+                                  coverage_map=CoverageMap(clock=self.clock), pose_tracker=self.tracker,
+                                  clock=self.clock, sleep=self.clock.sleep)
+
+    def tearDown(self):
+        self.recorder.stop()
+        shutil.rmtree(self.dir)
+
+    def patrol_for(self, seconds):
+        """Run the patrol as start_patrol/stop_patrol would, on the simulator clock"""
+        path = self.recorder.start(self.patrol)
+        self.patrol._reset_session()
+        self.patrol.coverage_map.start_session()
+        for _ in range(int(seconds / self.patrol.tick_interval)):
+            self.patrol.tick()
+            self.clock.sleep(self.patrol.tick_interval)
+        self.patrol.stop_patrol()
+        self.recorder.stop()
+        return path
+
+    def test_passes_through_when_not_recording(self):
+        """Test the wrappers work and write nothing until start()"""
+        self.assertIn('center', self.recorder.read_sensors())
+        self.recorder.motors.drive('forward')
+        self.assertEqual(self.robot.left, 100.0)
+        self.assertFalse(self.recorder.recording)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_trace_round_trip(self):
+        """Test every reading, command and wheel change is read back"""
+        path = self.patrol_for(5.0)
+        trace = read_trace(path)
+        readings = [r for r in trace.records if isinstance(r, SensorReading)]
+        self.assertEqual(len(readings), 100)
+        self.assertEqual(readings[0].timestamp, 100.0)
+        self.assertEqual(set(readings[0].sensors), {'left', 'center', 'right', 'distance'})
+        commands = [r for r in trace.records if isinstance(r, MotorCommand)]
+        self.assertEqual(commands[0].direction, 'forward')
+        self.assertIsNone(commands[0].speed)
+        self.assertEqual(commands[-1].direction, 'stop')
+        self.assertTrue(any(isinstance(r, WheelSpeeds) for r in trace.records))
+        self.assertIsInstance(trace.records[-1], PatrolEnd)
+        # Compact: well under 20 bytes per record
+        self.assertLess(os.path.getsize(path), 20 * len(trace.records) + 200)
+
+    def test_replay_reproduces_decisions(self):
+        """Test a replay makes exactly the recorded motor commands, session after session"""
+        self.patrol_for(60.0)
+        path = self.patrol_for(60.0)  # Starts from the first session's map and pose
+        result = replay(path)
+        self.assertEqual(result["ticks"], 1200)
+        self.assertGreater(len(result["commands"]), 10)
+        self.assertIsNone(result["first_mismatch"])
+        self.assertEqual(result["commands"], result["recorded_commands"])
+        self.assertEqual(replay(path)["commands"], result["commands"])
+
+    def test_start_records_wheels_already_turning(self):
+        """Test a trace started while moving replays the pose from the actual wheel speeds"""
+        self.robot.drive('forward')
+        path = self.patrol_for(20.0)
+        trace = read_trace(path)
+        self.assertEqual(trace.records[0], WheelSpeeds(100.0, 100.0, 100.0))
+        result = replay(trace)
+        self.assertIsNone(result["first_mismatch"])
+        for replayed, live in zip(result["pose"], self.tracker.pose()):
+            self.assertAlmostEqual(replayed, live, places=6)
+
+    def test_wheel_records_apply_in_timestamp_order(self):
+        """Test a wheel change logged after a later tick still drives the pose from its own time"""
+        trace = read_trace(self.patrol_for(30.0))
+        expected = replay(trace)
+        records = trace.records
+        index = next(i for i, r in enumerate(records) if i and isinstance(r, WheelSpeeds))
+        late = records.pop(index)
+        after = next(i for i in range(index, len(records)) if isinstance(records[i], SensorReading))
+        records.insert(after + 1, late)  # As if the ramp thread was preempted before logging it
+        result = replay(trace)
+        self.assertEqual(result["commands"], expected["commands"])
+        self.assertEqual(result["pose"], expected["pose"])
+
+    def test_slow_reads_replay_exactly(self):
+        """Test readings carry the tick's time even when the read itself takes a while"""
+        read = self.sensors.read
+        tick_times = []
+
+        def slow_read():
+            tick_times.append(self.clock())
+            self.clock.sleep(0.013)  # Time passes, and the robot moves, during the read
+            return read()
+
+        self.recorder._read_sensors = slow_read
+        path = self.patrol_for(60.0)
+        trace = read_trace(path)
+        times = [r.timestamp for r in trace.records if isinstance(r, SensorReading)]
+        self.assertEqual(len(times), len(tick_times))
+        self.assertEqual({live - read for live, read in zip(times, tick_times)}, {0.0})
+        result = replay(trace)
+        self.assertGreater(len(result["commands"]), 10)
+        self.assertIsNone(result["first_mismatch"])
+
+    def test_replay_reports_divergence(self):
+        """Test a difference from the recording is pinpointed"""
+        trace = read_trace(self.patrol_for(30.0))
+        index = next(i for i, r in enumerate(trace.records)
+                     if isinstance(r, MotorCommand) and r.direction == 'backward')
+        trace.records[index] = trace.records[index]._replace(direction='right')
+        result = replay(trace)
+        self.assertIsNotNone(result["first_mismatch"])
+        self.assertEqual(result["recorded_commands"][result["first_mismatch"]][1], 'right')
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.dir, 'bogus.trace')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            read_trace(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import math
+from pose import PoseTracker
+
+class TestPoseTracker(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.tracker = PoseTracker(speed=0.5, turn_rate=2.0, clock=lambda: self.now[0])
+
+    def drive(self, left, right, start, stop):
+        self.tracker.on_motion(start, left, right)
+        self.tracker.on_motion(stop, 0.0, 0.0)
+
+    def test_straight_line_from_timestamps(self):
+        """Test distance comes from the real start/stop times, not the requested duration"""
+        self.tracker.on_motion(0.0, 0.0, 0.0)
+        self.drive(100.0, 100.0, 1.0, 3.0)
+        self.now[0] = 10.0  # Stopped: no further movement
+        x, y, heading = self.tracker.pose()
+        self.assertAlmostEqual(x, 1.0)
+        self.assertAlmostEqual(y, 0.0)
+        self.assertAlmostEqual(self.tracker.distance, 1.0)
+
+    def test_spin_and_backward(self):
+        """Test a left spin turns in place and backward drives along the new heading"""
+        self.drive(-100.0, 100.0, 0.0, math.pi / 4)  # 2 rad/s for pi/4 s
+        self.assertAlmostEqual(self.tracker.heading, math.pi / 2)
+        self.assertAlmostEqual(self.tracker.x, 0.0)
+        self.drive(-50.0, -50.0, 1.0, 3.0)
+        x, y, _ = self.tracker.pose(3.0)
+        self.assertAlmostEqual(x, 0.0)
+        self.assertAlmostEqual(y, -0.5)
+
+    def test_arc_matches_small_steps(self):
+        """Test exact arc integration agrees with many small control-loop updates"""
+        self.drive(50.0, 100.0, 0.0, 2.0)
+        stepped = PoseTracker(speed=0.5, turn_rate=2.0)
+        stepped.on_motion(0.0, 50.0, 100.0)
+        for i in range(1, 2001):
+            stepped.update(i * 0.001)
+        for a, b in zip(self.tracker.pose(2.0), stepped.pose(2.0)):
+            self.assertAlmostEqual(a, b, places=6)
+
+    def test_covariance_grows_only_while_moving(self):
+        """Test uncertainty grows with motion and is kept in the same arrays"""
+        covariance, scratch = self.tracker.covariance, self.tracker._scratch
+        self.drive(100.0, 100.0, 0.0, 2.0)
+        variance = self.tracker.covariance[0, 0]
+        self.assertGreater(variance, 0.0)
+        self.tracker.update(5.0)
+        self.assertEqual(self.tracker.covariance[0, 0], variance)
+        self.drive(-100.0, 100.0, 5.0, 6.0)
+        self.drive(100.0, 100.0, 6.0, 8.0)
+        # Heading uncertainty from the turn spreads into sideways position
+        self.assertGreater(self.tracker.covariance[1, 1], 0.0)
+        self.assertIs(self.tracker.covariance, covariance)
+        self.assertIs(self.tracker._scratch, scratch)
+
+    def test_reset(self):
+        self.drive(100.0, 100.0, 0.0, 1.0)
+        self.now[0] = 1.0
+        self.tracker.reset(2.0, 3.0, 1.0)
+        self.assertEqual(self.tracker.pose(), (2.0, 3.0, 1.0))
+        self.assertFalse(self.tracker.covariance.any())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import time
+import itertools
+import numpy as np
+from camera_stream import FrameBroadcaster
+from recognition_worker import RecognitionWorker, draw_faces
+
+def frame_source(delay=0.005):
+    """Capture callable producing frames whose pixels hold their frame number"""
+    counter = itertools.count(1)
+    def capture():
+        time.sleep(delay)
+        return np.full((48, 64, 3), next(counter) % 256, dtype=np.uint8)
+    return capture
+
+def slow_recognize(frame):
+    """Pretend recognition: slow, and labels the face with the frame value"""
+    time.sleep(0.05)
+    return [(10, 30, 30, 10, str(int(frame[0, 0, 0])))]
+
+class TestRecognitionWorker(unittest.TestCase):
+    def setUp(self):
+        self.broadcaster = FrameBroadcaster(frame_source())
+        self.broadcaster.start()
+
+    def tearDown(self):
+        self.broadcaster.stop()
+
+    def wait_for_results(self, worker, count, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if worker.stats()["frames_processed"] >= count:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_slow_recognition_drops_to_newest_frame(self):
+        """Test a slow recognizer skips frames instead of falling behind"""
+        worker = RecognitionWorker(self.broadcaster, slow_recognize)
+        worker.start()
+        try:
+            self.assertTrue(self.wait_for_results(worker, 3))
+            stats = worker.stats()
+            self.assertGreater(stats["frames_dropped"], 0)
+            seq, results = worker.latest()
+            # Results always describe a recent frame, not a queued old one
+            self.assertLessEqual(self.broadcaster.seq - seq, 20)
+            self.assertEqual(len(results), 1)
+        finally:
+            worker.stop()
+
+    def test_latest_does_not_wait_for_recognition(self):
+        """Test readers get the last published results immediately"""
+        worker = RecognitionWorker(self.broadcaster, slow_recognize)
+        worker.start()
+        try:
+            start = time.monotonic()
+            seq, results = worker.latest()
+            self.assertLess(time.monotonic() - start, 0.01)
+            self.assertEqual((seq, results), (0, []))
+        finally:
+            worker.stop()
+
+    def test_process_mode(self):
+        """Test recognition in a worker process publishes results"""
+        worker = RecognitionWorker(self.broadcaster, slow_recognize, mode='process')
+        worker.start()
+        try:
+            self.assertTrue(self.wait_for_results(worker, 1, timeout=10.0))
+            self.assertEqual(len(worker.latest()[1]), 1)
+        finally:
+            worker.stop()
+
+    def test_gate_skips_recognition(self):
+        """Test no recognition runs while the gate is closed"""
+        calls = []
+        def recognize(frame):
+            calls.append(frame)
+            return []
+        open_gate = [False]
+        worker = RecognitionWorker(self.broadcaster, recognize, gate=lambda: open_gate[0])
+        worker.start()
+        try:
+            time.sleep(0.1)
+            self.assertEqual(calls, [])
+            self.assertGreater(worker.stats()["frames_gated"], 0)
+            open_gate[0] = True
+            self.assertTrue(self.wait_for_results(worker, 1))
+        finally:
+            worker.stop()
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            RecognitionWorker(self.broadcaster, slow_recognize, mode='gpu')
+
+class TestDrawFaces(unittest.TestCase):
+    def test_draws_on_copy(self):
+        """Test the shared frame is left untouched"""
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        annotated = draw_faces(frame, [(10, 30, 30, 10, "Alice")])
+        self.assertFalse(frame.any())
+        self.assertTrue(annotated.any())
+        self.assertIs(draw_faces(frame, []), frame)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import time
+from sensor_hub import SensorHub
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class TestSensorHub(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.reading = {'center': False, 'distance': 50.0}
+        self.reads = 0
+        self.hub = SensorHub(self.read_all, {'center': bool, 'distance': float},
+                             capacity=4, clock=self.clock)
+
+    def read_all(self):
+        self.reads += 1
+        return dict(self.reading)
+
+    def test_latest_before_any_sample(self):
+        """Test an empty hub reports no values"""
+        self.assertEqual(self.hub.latest(), {'center': None, 'distance': None, 'timestamp': None})
+
+    def test_latest_keeps_channel_types(self):
+        """Test snapshots hand back bools and floats, not raw array values"""
+        self.hub.sample()
+        snapshot = self.hub.latest()
+        self.assertIs(snapshot['center'], False)
+        self.assertEqual(snapshot['distance'], 50.0)
+        self.assertEqual(snapshot['timestamp'], 100.0)
+
+    def test_missing_reading_is_none(self):
+        """Test a failed reading is reported as None"""
+        self.reading['distance'] = None
+        self.hub.sample()
+        self.assertIsNone(self.hub.latest()['distance'])
+
+    def test_latest_does_not_read_hardware(self):
+        """Test snapshots come from the buffer only"""
+        self.hub.sample()
+        for _ in range(10):
+            self.hub.latest()
+        self.assertEqual(self.reads, 1)
+
+    def test_ring_buffer_wraps(self):
+        """Test the buffer keeps only the newest samples, oldest first"""
+        for i in range(6):
+            self.reading['distance'] = float(i)
+            self.clock.now += 1.0
+            self.hub.sample()
+        timestamps, values = self.hub.window(60)
+        self.assertEqual(list(values['distance']), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(list(timestamps), [103.0, 104.0, 105.0, 106.0])
+
+    def test_window_filters_by_age(self):
+        """Test window only returns samples from the last n seconds"""
+        for i in range(4):
+            self.reading['distance'] = float(i)
+            self.clock.now += 1.0
+            self.hub.sample()
+        timestamps, values = self.hub.window(1.5)
+        self.assertEqual(list(values['distance']), [2.0, 3.0])
+
+    def test_background_sampling(self):
+        """Test the sampling thread keeps the buffer fresh"""
+        hub = SensorHub(self.read_all, {'center': bool, 'distance': float}, rate_hz=200)
+        hub.start()
+        try:
+            self.assertIsNotNone(hub.latest()['timestamp'])
+            time.sleep(0.1)
+            self.assertGreater(self.reads, 5)
+        finally:
+            hub.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+import sensors
+from hardware import SimulatedGPIO
+from sensors import find_temperature_device, read_temperature, TemperaturePoller
+
+GOOD_READING = ("72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n"
+                "72 01 4b 46 7f ff 0e 10 57 t=23125\n")
+BAD_CRC_READING = ("72 01 4b 46 7f ff 0e 10 57 : crc=57 NO\n"
+                   "72 01 4b 46 7f ff 0e 10 57 t=23125\n")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTemperature(unittest.TestCase):
+    def setUp(self):
+        # Fake /sys/bus/w1/devices tree with one DS18B20
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base_dir = self.tmp.name
+        device_dir = os.path.join(self.base_dir, '28-000005e2fdc3')
+        os.mkdir(device_dir)
+        self.device_file = os.path.join(device_dir, 'w1_slave')
+        self.write_reading(GOOD_READING)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_reading(self, text):
+        with open(self.device_file, 'w') as f:
+            f.write(text)
+
+    def test_find_device(self):
+        """Test the DS18B20 is found under an injected base directory"""
+        self.assertEqual(find_temperature_device(self.base_dir), self.device_file)
+
+    def test_find_device_missing(self):
+        """Test a tree without sensors returns None instead of raising"""
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertIsNone(find_temperature_device(empty))
+
+    def test_read_temperature(self):
+        """Test a valid reading is converted to degrees C"""
+        self.assertAlmostEqual(read_temperature(self.device_file), 23.125)
+
+    def test_read_temperature_gives_up(self):
+        """Test a CRC that never says YES fails after bounded retries"""
+        self.write_reading(BAD_CRC_READING)
+        self.assertIsNone(read_temperature(self.device_file, max_retries=3, retry_delay=0))
+
+    def test_poller_caches_last_valid_reading(self):
+        """Test the poller keeps the last good value and reports its age"""
+        clock = FakeClock()
+        poller = TemperaturePoller(base_dir=self.base_dir, max_retries=1, clock=clock)
+        self.assertEqual(poller.latest(), (None, None))
+
+        poller.poll_once()
+        clock.now = 7.0
+        self.write_reading(BAD_CRC_READING)
+        self.assertIsNone(poller.poll_once())
+
+        temperature, age = poller.latest()
+        self.assertAlmostEqual(temperature, 23.125)
+        self.assertEqual(age, 7.0)
+
+class TestUltrasonic(unittest.TestCase):
+    def setUp(self):
+        # Fresh pin bank so echo hooks from other tests don't answer our pings
+        self.gpio = SimulatedGPIO()
+        patches = [mock.patch.object(sensors, 'GPIO', self.gpio), mock.patch.object(sensors, '_is_setup', False)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.distance = [50.0]
+        self.gpio.simulate_ultrasonic(sensors.TRIG_PIN, sensors.ECHO_PIN, lambda: self.distance[0])
+
+    def test_reads_distance(self):
+        """Test an echo is timed from its edges"""
+        # Median of a burst, so one ping stretched by a thread switch can't fail the test
+        reading = sensors.read_ultrasonic_distance_median(samples=5, interval=0, timeout=0.1)
+        self.assertAlmostEqual(reading, 50.0, delta=10.0)
+
+    def test_timeout_returns_none(self):
+        """Test a missing echo gives up after the timeout"""
+        self.distance[0] = None
+        self.assertIsNone(sensors.read_ultrasonic_distance(timeout=0.02))
+
+    def test_short_pulse_with_late_callbacks(self):
+        """Test a pulse that has ended before either callback runs is still timed"""
+        self.gpio.input_script(sensors.ECHO_PIN, lambda: False)  # Pin already LOW in both callbacks
+        self.distance[0] = 5.0
+        reading = sensors.read_ultrasonic_distance(timeout=0.1)
+        self.assertIsNotNone(reading)
+        self.assertGreater(reading, 0.0)
+
+    def test_out_of_range_pulses_are_rejected(self):
+        """Test echo pulses shorter or longer than the sensor's range read None"""
+        self.distance[0] = 0.5
+        self.assertIsNone(sensors.read_ultrasonic_distance(timeout=0.1))
+        self.distance[0] = 450.0
+        self.assertIsNone(sensors.read_ultrasonic_distance(timeout=0.1))
+
+    def test_edges_outside_a_ping_are_ignored(self):
+        """Test a late edge from an earlier ping doesn't start the next measurement"""
+        timer = sensors._EchoTimer()
+        timer.on_edge(sensors.ECHO_PIN)  # Not armed: left over from a timed-out ping
+        self.assertIsNone(timer.rise_ns)
+        timer.arm()
+        timer.on_edge(sensors.ECHO_PIN)  # Stray falling edge, pin LOW
+        stray = timer.rise_ns
+        self.gpio.set_input(sensors.ECHO_PIN, self.gpio.HIGH)  # Real echo: pin reads HIGH
+        timer.on_edge(sensors.ECHO_PIN)
+        self.assertGreater(timer.rise_ns, stray)
+        self.gpio.set_input(sensors.ECHO_PIN, self.gpio.LOW)
+        timer.on_edge(sensors.ECHO_PIN)
+        self.assertTrue(timer.done.is_set())
+        timer.disarm()
+        timer.on_edge(sensors.ECHO_PIN)
+        self.assertTrue(timer.done.is_set())
+
+    def test_pings_are_spaced(self):
+        """Test back-to-back reads still leave PING_INTERVAL between trigger pulses"""
+        self.distance[0] = None
+        for _ in range(3):
+            sensors.read_ultrasonic_distance(timeout=0.001)
+        triggers = [when for when, channel, level in self.gpio.output_log
+                    if channel == sensors.TRIG_PIN and level == self.gpio.HIGH]
+        self.assertEqual(len(triggers), 3)
+        for earlier, later in zip(triggers, triggers[1:]):
+            self.assertGreaterEqual(later - earlier, sensors.PING_INTERVAL - 0.001)
+
+    def test_median_skips_misses(self):
+        """Test the burst median ignores missed pings and is None if all miss"""
+        readings = iter([None, 10.0, 50.0, 12.0, None])
+        with mock.patch.object(sensors, 'read_ultrasonic_distance', lambda timeout: next(readings)):
+            self.assertEqual(sensors.read_ultrasonic_distance_median(samples=5, interval=0), 12.0)
+        with mock.patch.object(sensors, 'read_ultrasonic_distance', lambda timeout: None):
+            self.assertIsNone(sensors.read_ultrasonic_distance_median(samples=3, interval=0))
+
+if __name__ == '__main__':
+    unittest.main()
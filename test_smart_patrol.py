@@ -0,0 +1,143 @@
+import unittest
+import math
+import time
+from smart_patrol import (SmartPatrol, Direction, PatrolState, BACKUP_TIME, TURN_TIME,
+                          RETREAT_TIME, ESCAPE_BACKUP_TIME, MAX_RETREATS, CORRECTION_STEER)
+from pose import PoseTracker
+
+SIDE_DUTIES = {
+    'forward': (1.0, 1.0),
+    'backward': (-1.0, -1.0),
+    'left': (-1.0, 1.0),
+    'right': (1.0, -1.0)
+}
+
+class DriveMotors:
+    """Fake motor_control for drive()/stop() that reports to a pose tracker on a fake clock"""
+    def __init__(self, tracker, clock):
+        self.tracker = tracker
+        self.clock = clock
+        self.commands = []
+
+    def drive(self, direction, speed=None, steer=0.0):
+        self.commands.append((direction, steer))
+        left, right = SIDE_DUTIES[direction]
+        self.tracker.on_motion(self.clock[0], 100.0 * left * (1.0 + min(steer, 0.0)),
+                               100.0 * right * (1.0 - max(steer, 0.0)))
+
+    def stop(self):
+        self.commands.append(('stop', 0.0))
+        self.tracker.on_motion(self.clock[0], 0.0, 0.0)
+
+    def add_motion_listener(self, callback):
+        pass
+
+CLEAR = {'left': False, 'center': False, 'right': False}
+
+class TestSmartPatrol(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.sensors = dict(CLEAR)
+        self.tracker = PoseTracker(speed=0.25, turn_rate=math.pi / 2, clock=lambda: self.now[0])
+        self.motors = DriveMotors(self.tracker, self.now)
+        self.patrol = SmartPatrol(self.motors, lambda: dict(self.sensors), pose_tracker=self.tracker,
+                                  clock=lambda: self.now[0], sleep=self.advance)
+
+    def advance(self, seconds):
+        self.now[0] += seconds
+
+    def run_for(self, seconds):
+        """Tick at the patrol rate for seconds of fake time"""
+        for _ in range(int(round(seconds / self.patrol.tick_interval))):
+            self.patrol.tick()
+            self.advance(self.patrol.tick_interval)
+
+    def time_in_state(self, state):
+        """Tick until the patrol leaves state; return the fake time that took"""
+        start = self.now[0]
+        while self.patrol.state == state:
+            self.advance(self.patrol.tick_interval)
+            self.patrol.tick()
+        return self.now[0] - start
+
+    def test_obstacle_stops_forward_on_next_tick(self):
+        """Test an obstacle ahead aborts the forward run within one tick"""
+        self.run_for(0.5)
+        self.assertEqual(self.motors.commands, [('forward', 0.0)])
+        self.sensors['center'] = True
+        self.sensors['right'] = True
+        self.patrol.tick()
+        self.assertEqual(self.patrol.state, PatrolState.BACKING_UP)
+        self.assertEqual(self.motors.commands[-1], ('backward', 0.0))
+        self.assertEqual(self.patrol.consecutive_blocks, 1)
+
+    def test_backup_turn_forward_sequence(self):
+        """Test backing up and turning take their set times, then forward resumes"""
+        self.sensors.update(center=True, right=True)
+        self.patrol.tick()
+        self.sensors.update(CLEAR, right=True)
+        self.assertAlmostEqual(self.time_in_state(PatrolState.BACKING_UP), BACKUP_TIME, delta=0.06)
+        self.assertEqual(self.patrol.state, PatrolState.TURNING)
+        self.assertEqual(self.patrol.last_turn, Direction.LEFT)
+        self.assertEqual(list(self.patrol.move_history), [Direction.LEFT])
+        self.assertAlmostEqual(self.time_in_state(PatrolState.TURNING), TURN_TIME, delta=0.06)
+        self.assertEqual(self.patrol.state, PatrolState.FORWARD)
+        self.assertEqual([c[0] for c in self.motors.commands], ['backward', 'left', 'forward'])
+        self.assertAlmostEqual(self.patrol.pose[2], math.pi / 2, delta=0.1)
+
+    def test_side_obstacle_steers_away(self):
+        """Test a blocked side arcs the forward run away from it without stopping"""
+        self.patrol.tick()
+        self.sensors['left'] = True
+        self.patrol.tick()
+        self.assertEqual(self.patrol.state, PatrolState.FORWARD)
+        self.assertEqual(self.motors.commands[-1], ('forward', CORRECTION_STEER))
+
+    def test_all_blocked_retries_are_bounded(self):
+        """Test repeated full retreats give way to an escape manoeuvre"""
+        self.sensors.update(left=True, center=True, right=True)
+        self.patrol.tick()
+        self.assertEqual(self.patrol.state, PatrolState.RETREATING)
+        elapsed = self.time_in_state(PatrolState.RETREATING)
+        self.assertAlmostEqual(elapsed, MAX_RETREATS * RETREAT_TIME, delta=MAX_RETREATS * 0.06)
+        self.assertEqual(self.patrol.state, PatrolState.ESCAPING)
+        self.assertAlmostEqual(self.time_in_state(PatrolState.ESCAPING), ESCAPE_BACKUP_TIME, delta=0.06)
+        self.assertEqual(self.patrol.state, PatrolState.TURNING)
+        self.assertEqual(self.patrol.retreats, 0)
+
+    def test_repeated_blocks_escape(self):
+        """Test a fourth block in a row escapes instead of backing up again"""
+        self.patrol.consecutive_blocks = 3
+        self.sensors['center'] = True
+        self.patrol.tick()
+        self.assertEqual(self.patrol.state, PatrolState.ESCAPING)
+
+    def test_clear_driving_resets_blocks(self):
+        """Test the block counter resets only after driving clear for a while"""
+        self.patrol.consecutive_blocks = 2
+        self.run_for(0.5)
+        self.assertEqual(self.patrol.consecutive_blocks, 2)
+        self.run_for(1.0)
+        self.assertEqual(self.patrol.consecutive_blocks, 0)
+
+    def test_ticks_never_block(self):
+        """Test tick() returns at once; timed states use deadlines, not sleeps"""
+        self.sensors['center'] = True
+        start = time.monotonic()
+        for _ in range(50):
+            self.patrol.tick()
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.now[0], 0.0)
+
+    def test_loop_runs_at_fixed_rate(self):
+        """Test the patrol thread ticks on the injected clock and stops the motors"""
+        patrol = SmartPatrol(self.motors, lambda: dict(CLEAR), pose_tracker=self.tracker, tick=0.01)
+        patrol.start_patrol()
+        time.sleep(0.1)
+        patrol.stop_patrol()
+        self.assertGreater(patrol.ticks, 3)
+        self.assertEqual(self.motors.commands[-1], ('stop', 0.0))
+        self.assertEqual(patrol.state, PatrolState.IDLE)
+
+if __name__ == '__main__':
+    unittest.main()